@@ -0,0 +1,196 @@
+import gzip
+import json
+import datetime
+from pathlib import Path
+
+from django.apps import apps
+from django.db import models, transaction
+
+from .utils import PreciseJSONEncoder
+
+
+def get_archive_dir(root, model):
+    return Path(root) / model._meta.label_lower
+
+
+def _get_m2m_fields(model):
+    return [
+        field for field in model._meta.many_to_many
+        if field.remote_field.through._meta.auto_created
+    ]
+
+
+def _get_m2m_values(field, pks):
+    through = field.remote_field.through
+    values = {}
+    rows = through._default_manager.filter(**{
+        field.m2m_field_name() + "__in": pks,
+    }).order_by("pk").values_list(
+        field.m2m_field_name() + "_id",
+        field.m2m_reverse_field_name() + "_id",
+    )
+    for pk, related_pk in rows:
+        values.setdefault(pk, []).append(related_pk)
+    return values
+
+
+def archive_queryset(queryset, datetime_field, root, batch_size=1000):
+    """
+    Переносит строки queryset в сжатые gzip файлы JSON Lines
+    root/<app_label.model>/<ГГГГ-ММ>.jsonl.gz по месяцу
+    значения поля datetime_field (UTC) и удаляет их из таблицы.
+    Строки обрабатываются пачками по первичному ключу: пачка
+    дописывается в архив отдельным сегментом gzip и только после
+    этого удаляется короткой транзакцией, поэтому блокировки
+    таблицы не держатся дольше обработки одной пачки.
+    Возвращает количество перенесённых строк
+    """
+    model = queryset.model
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    pk_attname = model._meta.pk.attname
+    m2m_fields = _get_m2m_fields(model)
+    archive_dir = get_archive_dir(root, model)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archived = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by("pk")
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        rows = list(batch.values(*attnames)[:batch_size])
+        if not rows:
+            return archived
+        pks = [row[pk_attname] for row in rows]
+        for field in m2m_fields:
+            m2m_values = _get_m2m_values(field, pks)
+            for row in rows:
+                row[field.name] = m2m_values.get(row[pk_attname], [])
+        months = {}
+        for row in rows:
+            month = row[datetime_field].astimezone(datetime.timezone.utc)
+            months.setdefault(month.strftime("%Y-%m"), []).append(row)
+        for month, month_rows in months.items():
+            path = archive_dir / ("%s.jsonl.gz" % month)
+            with gzip.open(path, "at", encoding="utf-8") as archive:
+                for row in month_rows:
+                    archive.write(
+                        json.dumps(
+                            {
+                                "model": model._meta.label_lower,
+                                "fields": row,
+                            },
+                            cls=PreciseJSONEncoder,
+                            ensure_ascii=False,
+                        ) + "\n"
+                    )
+        with transaction.atomic(using=queryset.db):
+            model._base_manager.using(queryset.db).filter(
+                pk__in=pks,
+            ).delete()
+        archived += len(rows)
+        last_pk = pks[-1]
+
+
+def iter_archive(path):
+    """
+    Построчно читает архив, не распаковывая его целиком.
+    Возвращает пары (модель, словарь значений столбцов)
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield apps.get_model(record["model"]), record["fields"]
+
+
+def _drop_missing_relations(model, rows):
+    """
+    Обнуляет ссылки на удалённые с момента архивации объекты.
+    Строки с обязательными ссылками на удалённые объекты
+    не могут быть восстановлены и отбрасываются
+    """
+    for field in model._meta.concrete_fields:
+        if not isinstance(field, models.ForeignKey):
+            continue
+        related_pks = {
+            row[field.attname] for row in rows
+            if row[field.attname] is not None
+        }
+        if not related_pks:
+            continue
+        existing = set(
+            field.related_model._base_manager.filter(
+                pk__in=related_pks,
+            ).values_list("pk", flat=True)
+        )
+        missing = related_pks - existing
+        if not missing:
+            continue
+        if field.null:
+            for row in rows:
+                if row[field.attname] in missing:
+                    row[field.attname] = None
+        else:
+            rows = [
+                row for row in rows
+                if row[field.attname] not in missing
+            ]
+    return rows
+
+
+def _restore_batch(model, rows):
+    rows = _drop_missing_relations(model, rows)
+    m2m_values = {
+        field: {
+            row[model._meta.pk.attname]: row.pop(field.name, [])
+            for row in rows
+        }
+        for field in _get_m2m_fields(model)
+    }
+    with transaction.atomic():
+        # Повторное восстановление не создаёт дубликатов
+        model._base_manager.bulk_create(
+            [model(**row) for row in rows],
+            ignore_conflicts=True,
+        )
+        for field, values in m2m_values.items():
+            through = field.remote_field.through
+            existing = set(
+                field.related_model._base_manager.filter(
+                    pk__in={pk for pks in values.values() for pk in pks},
+                ).values_list("pk", flat=True)
+            )
+            through._default_manager.bulk_create(
+                [
+                    through(**{
+                        field.m2m_field_name() + "_id": pk,
+                        field.m2m_reverse_field_name() + "_id": related_pk,
+                    })
+                    for pk, related_pks in values.items()
+                    for related_pk in related_pks
+                    if related_pk in existing
+                ],
+                ignore_conflicts=True,
+            )
+    return len(rows)
+
+
+def restore_archive(path, batch_size=1000):
+    """
+    Загружает строки архива обратно в таблицы пачками по batch_size.
+    Строки, уже присутствующие в таблице, пропускаются.
+    Возвращает количество обработанных строк
+    """
+    restored = 0
+    batches = {}
+    for model, row in iter_archive(path):
+        batch = batches.setdefault(model, [])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            restored += _restore_batch(model, batch)
+            batches[model] = []
+    for model, batch in batches.items():
+        if batch:
+            restored += _restore_batch(model, batch)
+    return restored
@@ -0,0 +1,90 @@
+import datetime
+
+from django.apps import apps
+from django.db.models import Max
+from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+
+from changelog.mixins import ChangeLogMixin
+from changelog.models import ChangeLog, ChangeLogSnapshot, SNAPSHOT_DELAY
+
+
+class Command(BaseCommand):
+    help = """
+    Saves full snapshots of objects whose models use ChangeLogMixin.
+    Snapshots bound the number of changes replayed to reconstruct
+    the state of an object at a given moment, so the command should
+    run periodically. By default only the objects changed since
+    the previous snapshot of their model are saved. Snapshots are
+    taken as of --delay minutes ago and rebuilt from the changelog,
+    because changelog rows are written after their transaction
+    commits and a snapshot of the current state could miss changes
+    that are still in flight
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model", action="append", dest="models",
+            help="model label (app_label.ModelName), may be repeated",
+        )
+        parser.add_argument(
+            "--all", action="store_true",
+            help="save snapshots of all objects",
+        )
+        parser.add_argument(
+            "--delay", type=int,
+            help="minutes between the snapshot moment and now "
+                 "(%s by default)" % (SNAPSHOT_DELAY.seconds // 60),
+            default=SNAPSHOT_DELAY.seconds // 60
+        )
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="snapshots inserted by one query (1000 by default)",
+            default=1000
+        )
+
+    def get_models(self, labels):
+        if not labels:
+            return [
+                model for model in apps.get_models()
+                if issubclass(model, ChangeLogMixin)
+            ]
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError("Unknown model %s" % label)
+            if not issubclass(model, ChangeLogMixin):
+                raise CommandError("%s does not use ChangeLogMixin" % label)
+            models.append(model)
+        return models
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size should be positive")
+        if kwargs["delay"] < 0:
+            raise CommandError("Delay should not be negative")
+        moment = timezone.now() - datetime.timedelta(minutes=kwargs["delay"])
+        for model in self.get_models(kwargs["models"]):
+            label = model._meta.label
+            queryset = model._default_manager.all()
+            last_snapshot = ChangeLogSnapshot.objects.filter(
+                model=label,
+            ).aggregate(last=Max("snapshot_datetime"))["last"]
+            if last_snapshot is not None and not kwargs["all"]:
+                queryset = queryset.filter(
+                    pk__in=ChangeLog.objects.filter(
+                        model=label,
+                        change_datetime__gt=last_snapshot,
+                        change_datetime__lte=moment,
+                    ).values("model_pk")
+                )
+            count = ChangeLogSnapshot.objects.take(
+                model,
+                queryset,
+                batch_size,
+                moment,
+            )
+            self.stdout.write("%s: %s snapshots saved" % (label, count))
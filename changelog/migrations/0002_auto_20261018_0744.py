@@ -0,0 +1,17 @@
+# Generated by Django 3.1.3 on 2026-10-17 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changelog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['model', 'model_pk', 'change_datetime'], name='changelog_model_pk_dt_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:10
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changelog', '0002_auto_20261018_0744'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changelog',
+            name='post_change',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Измененные данные в формате JSON'),
+        ),
+        migrations.AlterField(
+            model_name='changelog',
+            name='prev_change',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Данные до изменения в формате JSON'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:18
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changelog', '0003_auto_20261018_0810'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_datetime', models.DateTimeField(verbose_name='Дата и время снимка')),
+                ('model', models.CharField(max_length=255, verbose_name='Имя модели объекта')),
+                ('model_pk', models.IntegerField(verbose_name='Первичный ключ объекта')),
+                ('state', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Состояние объекта в формате JSON')),
+            ],
+            options={
+                'verbose_name': 'Снимок состояния',
+                'verbose_name_plural': 'Снимки состояний',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changelogsnapshot',
+            index=models.Index(fields=['model', 'model_pk', '-snapshot_datetime'], name='changelog_snapshot_pk_dt_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('changelog', '0004_auto_20261018_0818'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='actor',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Инициатор изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['actor', '-change_datetime', '-id'], name='changelog_actor_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['action', '-change_datetime', '-id'], name='changelog_action_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['model', '-change_datetime', '-id'], name='changelog_model_dt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['-change_datetime', '-id'], name='changelog_dt_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:22
+
+from django.db import migrations, transaction
+
+
+BATCH_SIZE = 5000
+
+
+def fill_actor(apps, schema_editor):
+    """
+    Заполняет инициатора изменения первым пользователем из changed_by.
+    Записи обновляются пачками по первичному ключу, каждая пачка
+    фиксируется отдельной транзакцией
+    """
+    ChangeLog = apps.get_model("changelog", "ChangeLog")
+    through = ChangeLog.changed_by.through
+    last_pk = 0
+    while True:
+        pks = list(
+            ChangeLog.objects.filter(pk__gt=last_pk).order_by("pk")
+            .values_list("pk", flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            break
+        actors = {}
+        links = through.objects.filter(changelog_id__in=pks)\
+            .order_by("pk").values_list("changelog_id", "user_id")
+        for changelog_id, user_id in links:
+            actors.setdefault(changelog_id, user_id)
+        objs = [
+            ChangeLog(pk=pk, actor_id=user_id)
+            for pk, user_id in actors.items()
+        ]
+        with transaction.atomic():
+            ChangeLog.objects.bulk_update(objs, ["actor"])
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    # Каждая пачка фиксируется отдельно, чтобы не держать
+    # блокировки всего журнала изменений до конца миграции
+    atomic = False
+
+    dependencies = [
+        ('changelog', '0005_auto_20261018_0821'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_actor, migrations.RunPython.noop),
+    ]
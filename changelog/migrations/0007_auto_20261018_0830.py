@@ -0,0 +1,27 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('changelog', '0006_auto_20261018_0822'),
+    ]
+
+    # Django 3.1 не поддерживает индексы по выражениям в Meta.indexes.
+    # Индекс находит переносы записей main.MovementEntry из списка
+    # для MovementList.get_entries_at
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE INDEX changelog_moved_from_idx
+            ON changelog_changelog (
+                (prev_change -> 'movement_list_id'),
+                change_datetime
+            )
+            WHERE model = 'main.MovementEntry'
+            """,
+            "DROP INDEX changelog_moved_from_idx",
+        ),
+    ]
@@ -1,51 +1,120 @@
 from typing import Union
 
-from django.db import models
-from django.contrib.auth import get_user_model
+from django.db import models, DEFAULT_DB_ALIAS
 
 from .models import ChangeLog
 from .utils import ChangeMeta
+from .writer import changelog_writer
+
+
+# Действия, для которых сохраняются только изменённые столбцы
+DELTA_ACTIONS = (
+    ChangeMeta.UPDATE_ACTION,
+    ChangeMeta.DELETE_ACTION,
+    ChangeMeta.RESTORE_ACTION,
+)
 
 
 class ChangeLogMixin(models.Model):
     """
-    Миксин для автоматического создания исторических записей
+    Миксин для автоматического создания исторических записей.
+    Исходные значения сохраняются только для столбцов модели
+    (attname, без загрузки связанных объектов) и только
+    у объектов, загруженных из базы данных.
+    Столбцы changelog_exclude в историю не попадают
     """
 
+    changelog_exclude = ()
+
     class Meta:
         abstract = True
 
-    def __init__(self, *args, **kwargs):
-        super(ChangeLogMixin, self).__init__(*args, **kwargs)
-        self._original_values = {
-            field.name: getattr(self, field.name)
-            for field in self._meta.get_fields()
+    @classmethod
+    def get_changelog_attnames(cls) -> list:
+        return [
+            field.attname for field in cls._meta.concrete_fields
+            if field.attname not in cls.changelog_exclude
+        ]
+
+    @classmethod
+    def log_created(cls, objs, user, comment=""):
+        """
+        Создаёт записи о создании объектов objs, например,
+        после bulk_create, двумя запросами INSERT
+        """
+        return ChangeLog.objects.bulk_log(
+            user,
+            cls,
+            ChangeMeta.CREATE_ACTION,
+            [(obj.pk, {}, obj.get_changelog_state()) for obj in objs],
+            comment,
+        )
+
+    def get_changelog_state(self) -> dict:
+        """
+        Возвращает значения загруженных столбцов объекта
+        """
+        return {
+            name: self.__dict__[name]
+            for name in self.get_changelog_attnames()
+            if name in self.__dict__
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # field_names - имена столбцов (attname) в порядке values,
+        # отложенные поля имеют значение DEFERRED и не сохраняются
+        instance._original_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if value is not models.DEFERRED and
+            name not in cls.changelog_exclude
         }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None:
+            names = [
+                name for name in self.get_changelog_attnames()
+                if name in self.__dict__
+            ]
+        else:
+            names = [
+                self._meta.get_field(name).attname for name in fields
+            ]
+            names = [
+                name for name in names
+                if name not in self.changelog_exclude
+            ]
+        original_values = self.__dict__.setdefault("_original_values", {})
+        for name in names:
+            original_values[name] = self.__dict__[name]
+
+    def _get_original_values(self) -> dict:
+        return self.__dict__.get("_original_values", {})
 
     def _get_delta_names(self) -> list:
         """
-        Возвращает имена измененных полей
+        Возвращает имена (attname) измененных столбцов
         """
         names = []
-        for field in self._meta.get_fields():
-            name = field.name
-            original = self._original_values[name]
-            actual = getattr(self, name)
-            if actual != original:
+        for name, original in self._get_original_values().items():
+            if name in self.__dict__ and self.__dict__[name] != original:
                 names.append(name)
         return names
 
     def _get_changes(self, delta_names: list) -> dict:
         """
-        Возвращает значение затронутых полей до и после изменений
+        Возвращает значение затронутых столбцов до и после изменений
         """
+        original_values = self._get_original_values()
         prev = {}
         post = {}
         for name in delta_names:
-            original = self._original_values[name]
-            actual = getattr(self, name)
-            prev[name] = original
-            post[name] = actual
+            prev[name] = original_values[name]
+            post[name] = self.__dict__[name]
         delta = {
             "prev_change": prev,
             "post_change": post,
@@ -56,57 +125,51 @@ class ChangeLogMixin(models.Model):
         """
         Обновляет оригинальные значения на новые
         """
+        original_values = self._get_original_values()
         for name in delta_names:
-            self._original_values[name] = getattr(self, name)
-
-    def _create_history_entry(self, meta: ChangeMeta):
-        meta_dict = meta.get()
-        log = ChangeLog.objects.create(
-            change_datetime=meta_dict["change_datetime"],
-            changed_by=meta_dict["change_by"],
-            action=meta_dict["action"],
-            model=meta_dict["model"],
-            model_pk=["model_pk"],
-            prev_change=meta.get_prev_change_json(),
-            post_change=meta.get_post_change_json(),
-            comment=meta_dict["comment"],
-        )
-        return log
+            original_values[name] = self.__dict__[name]
 
-    def _history_dispatch(self, meta: ChangeMeta) -> Union[ChangeLog, None]:
+    def _create_history_entry(self, meta: ChangeMeta) -> ChangeMeta:
+        """
+        Передаёт запись в буфер, который создаст её
+        после фиксации текущей транзакции
+        """
+        changelog_writer.add(meta, using=self._state.db or DEFAULT_DB_ALIAS)
+        return meta
+
+    def _history_dispatch(self, meta: ChangeMeta) -> Union[ChangeMeta, None]:
         """
         Выбор метода для действия
         """
-        if meta.action == ChangeMeta.UPDATE_ACTION:
+        if meta.action == ChangeMeta.CREATE_ACTION:
+            meta.post_change = self.get_changelog_state()
+            self._original_values = dict(meta.post_change)
+            return self._create_history_entry(meta)
+        elif meta.action in DELTA_ACTIONS:
             delta = self._get_delta_names()
             changes = self._get_changes(delta)
             self._update_original_values(delta)
             meta.prev_change = changes["prev_change"]
             meta.post_change = changes["post_change"]
             return self._create_history_entry(meta)
-        elif meta.action == ChangeMeta.CREATE_ACTION:
-            return self._create_history_entry(meta)
-        elif meta.action == ChangeMeta.DELETE_ACTION:
-            return self._create_history_entry(meta)
-        elif meta.action == ChangeMeta.RESTORE_ACTION:
-            return self._create_history_entry(meta)
         return None
 
     def make_history(
         self,
-        user: get_user_model(),
+        user,
         action=ChangeMeta.CREATE_ACTION,
         comment=""
-    ) -> Union[ChangeLog, None]:
+    ) -> Union[ChangeMeta, None]:
         """
-        Создаёт историческую запись ChangeLog
-        в зависимости от типа действия
+        Создаёт историческую запись ChangeLog в зависимости
+        от типа действия. Запись создаётся после фиксации
+        транзакции, возвращается её описание ChangeMeta
         """
         meta = ChangeMeta(
             action=action,
             changed_by=user,
-            model=self._meta.model,
-            model_pk=self._meta.pk,
+            model=self._meta.label,
+            model_pk=self.pk,
             comment=comment
         )
         return self._history_dispatch(meta)
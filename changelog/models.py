@@ -1,5 +1,10 @@
+import datetime
+
+from django.conf import settings
 from django.db import models
-from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 from .utils import ChangeMeta
 
@@ -11,6 +16,30 @@ ACTIONS = (
     (ChangeMeta.RESTORE_ACTION, "Восстановление"),
 )
 
+# Записи журнала вставляются после фиксации транзакции, а время изменения
+# в них задаётся раньше, поэтому снимки делаются на момент, отстоящий
+# от текущего на это время: к нему все изменения уже записаны в журнал
+SNAPSHOT_DELAY = datetime.timedelta(hours=1)
+
+
+def get_model_label(model):
+    if isinstance(model, str):
+        return model
+    return model._meta.label
+
+
+def to_python_state(model, state):
+    """
+    Приводит значения из JSON к типам полей модели
+    """
+    for name, value in state.items():
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        state[name] = field.to_python(value)
+    return state
+
 
 class ChangeLogManager(models.Manager):
     """
@@ -18,13 +47,154 @@ class ChangeLogManager(models.Manager):
     Модифицирует метод создания объекта
     """
 
-    def get_model_changelogs(self, model: models.Model, model_pk: int):
+    def get_model_changelogs(self, model, model_pk: int):
         """
         Возвращает объект Queryset содержащий исторические записи
-        ChangeLog для модели model по первичному ключу model_pk
+        ChangeLog для модели model (класс или метка 'app.Model')
+        по первичному ключу model_pk в порядке внесения изменений
         """
-        queryset = self.filter(model=model)
+        queryset = self.filter(model=get_model_label(model))
         queryset = queryset.filter(model_pk=model_pk)
+        return queryset.order_by("change_datetime", "pk")
+
+    def states_at(self, model, model_pks, moment) -> dict:
+        """
+        Восстанавливает состояния объектов модели model с первичными
+        ключами model_pks на момент moment. Состояние строится от
+        ближайшего снимка ChangeLogSnapshot не позже moment применением
+        последующих изменений, поэтому количество обрабатываемых
+        записей ограничено периодом между снимками.
+        Возвращает словарь {первичный ключ: {attname: значение}},
+        объекты, которых на момент moment не существовало
+        или история которых неизвестна, в словарь не попадают
+        """
+        label = get_model_label(model)
+        model_pks = set(model_pks)
+        states = {}
+        since = {}
+        snapshots = ChangeLogSnapshot.objects.get_latest(
+            label,
+            model_pks,
+            moment,
+        )
+        for snapshot in snapshots:
+            states[snapshot.model_pk] = dict(snapshot.state)
+            since[snapshot.model_pk] = snapshot.snapshot_datetime
+        logs = self.filter(model=label, change_datetime__lte=moment)
+        without_snapshot = model_pks - set(since)
+        if since:
+            # Для объектов со снимком нужны только изменения после него
+            logs = logs.filter(
+                models.Q(model_pk__in=without_snapshot) |
+                models.Q(
+                    model_pk__in=since,
+                    change_datetime__gt=min(since.values()),
+                )
+            )
+        else:
+            logs = logs.filter(model_pk__in=model_pks)
+        logs = logs.order_by("change_datetime", "pk").values_list(
+            "model_pk", "change_datetime", "action", "post_change"
+        )
+        for model_pk, change_datetime, action, post_change in logs:
+            if model_pk in since and change_datetime <= since[model_pk]:
+                continue
+            if action == ChangeMeta.CREATE_ACTION:
+                states[model_pk] = dict(post_change or {})
+            elif model_pk in states:
+                states[model_pk].update(post_change or {})
+        if not isinstance(model, str):
+            for state in states.values():
+                to_python_state(model, state)
+        return states
+
+    def state_at(self, model, model_pk: int, moment):
+        """
+        Возвращает состояние объекта на момент moment или None
+        """
+        return self.states_at(model, [model_pk], moment).get(model_pk)
+
+    def search(self, actor=None, action=None, model=None,
+               start=None, end=None):
+        """
+        Возвращает записи журнала изменений, отобранные по инициатору
+        actor, действию action, модели model и полуинтервалу времени
+        [start, end). Каждому сочетанию фильтров соответствует
+        составной индекс, заканчивающийся полями сортировки
+        (change_datetime, id), поэтому страницы журнала выбираются
+        по индексу без сортировки всех подходящих записей
+        """
+        queryset = self.all()
+        if actor is not None:
+            queryset = queryset.filter(actor=actor)
+        if action:
+            queryset = queryset.filter(action=action)
+        if model:
+            queryset = queryset.filter(model=get_model_label(model))
+        if start is not None:
+            queryset = queryset.filter(change_datetime__gte=start)
+        if end is not None:
+            queryset = queryset.filter(change_datetime__lt=end)
+        return queryset.select_related("actor").order_by(
+            "-change_datetime",
+            "-pk",
+        )
+
+    def bulk_create_from_meta(self, metas, using=None):
+        """
+        Создаёт исторические записи по последовательности ChangeMeta.
+        Записи и их связи с пользователями вставляются
+        двумя запросами INSERT
+        """
+        metas = [meta.get() for meta in metas]
+        logs = self.db_manager(using).bulk_create([
+            self.model(
+                change_datetime=meta["change_datetime"],
+                actor_id=getattr(meta["changed_by"], "pk", None),
+                action=meta["action"],
+                model=meta["model"],
+                model_pk=meta["model_pk"],
+                prev_change=meta["prev_change"],
+                post_change=meta["post_change"],
+                comment=meta["comment"],
+            )
+            for meta in metas
+        ])
+        field = self.model._meta.get_field("changed_by")
+        through = field.remote_field.through
+        through.objects.db_manager(using).bulk_create([
+            through(**{
+                field.m2m_field_name() + "_id": log.pk,
+                field.m2m_reverse_field_name() + "_id":
+                    meta["changed_by"].pk,
+            })
+            for log, meta in zip(logs, metas)
+            if meta["changed_by"] is not None and
+            meta["changed_by"].pk is not None
+        ])
+        return logs
+
+    def bulk_log(self, user, model, action, changes, comment=""):
+        """
+        Создаёт исторические записи об одном действии action пользователя
+        user над несколькими объектами модели model.
+        changes - последовательность кортежей
+        (первичный ключ, данные до изменения, данные после изменения)
+        """
+        change_datetime = timezone.now()
+        return self.bulk_create_from_meta([
+            ChangeMeta(
+                changed_by=user,
+                model=model._meta.label,
+                model_pk=model_pk,
+                action=action,
+                comment=comment,
+                prev_changes=prev_change,
+                post_changes=post_change,
+                change_datetime=change_datetime,
+            )
+            for model_pk, prev_change, post_change in changes
+        ])
 
 
 class ChangeLog(models.Model):
@@ -37,14 +207,49 @@ class ChangeLog(models.Model):
         ordering = ("change_datetime",)
         verbose_name = "Историческая запись"
         verbose_name_plural = "Исторические записи"
+        indexes = [
+            models.Index(
+                fields=["model", "model_pk", "change_datetime"],
+                name="changelog_model_pk_dt_idx",
+            ),
+            # Индексы журнала изменений: фильтр и порядок страниц
+            models.Index(
+                fields=["actor", "-change_datetime", "-id"],
+                name="changelog_actor_dt_idx",
+            ),
+            models.Index(
+                fields=["action", "-change_datetime", "-id"],
+                name="changelog_action_dt_idx",
+            ),
+            models.Index(
+                fields=["model", "-change_datetime", "-id"],
+                name="changelog_model_dt_idx",
+            ),
+            models.Index(
+                fields=["-change_datetime", "-id"],
+                name="changelog_dt_idx",
+            ),
+        ]
 
     objects = ChangeLogManager()
 
     change_datetime = models.DateTimeField("Дата и время изменения")
     changed_by = models.ManyToManyField(
-        get_user_model(),
+        settings.AUTH_USER_MODEL,
         verbose_name="Кем изменено"
     )
+    # Основной инициатор изменения из changed_by. Хранится в самой
+    # записи, чтобы отбор по пользователю не требовал соединения
+    # с промежуточной таблицей
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name="Инициатор изменения",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+        db_index=False,
+    )
     action = models.CharField("Тип изменения", choices=ACTIONS, max_length=10)
     model = models.CharField("Имя модели изменяемого объекта", max_length=255)
     model_pk = models.IntegerField("Первичный ключ изменяемого объекта")
@@ -52,11 +257,13 @@ class ChangeLog(models.Model):
         "Данные до изменения в формате JSON",
         blank=True,
         null=True,
+        encoder=DjangoJSONEncoder,
     )
     post_change = models.JSONField(
         "Измененные данные в формате JSON",
         blank=True,
         null=True,
+        encoder=DjangoJSONEncoder,
     )
     comment = models.TextField(
         "Текстовый комментарий",
@@ -68,4 +275,142 @@ class ChangeLog(models.Model):
         """
         Возвращает строку содержащую дату и время в формате '%d.%m.%Y %H:%M:%S'
         """
-        return self.datetime.strftime("%d.%m.%Y %H:%M:%S")
+        return timezone.localtime(self.change_datetime).strftime(
+            "%d.%m.%Y %H:%M:%S"
+        )
+
+    def get_changed_fields(self):
+        """
+        Возвращает имена изменённых полей через запятую
+        """
+        return ", ".join(sorted(self.post_change or {}))
+
+
+class ChangeLogSnapshotManager(models.Manager):
+
+    def get_latest(self, model, model_pks, moment):
+        """
+        Возвращает для каждого из объектов model_pks
+        последний снимок, сделанный не позже moment
+        """
+        queryset = self.filter(
+            model=get_model_label(model),
+            model_pk__in=model_pks,
+            snapshot_datetime__lte=moment,
+        )
+        queryset = queryset.order_by("model_pk", "-snapshot_datetime")
+        return queryset.distinct("model_pk")
+
+    def take_at(self, model, model_pks, moment):
+        """
+        Сохраняет снимки состояний объектов модели model с первичными
+        ключами model_pks на момент moment, восстановленных по истории
+        изменений, например, перед переносом истории до moment в архив.
+        Возвращает количество сохранённых снимков
+        """
+        label = get_model_label(model)
+        states = ChangeLog.objects.states_at(label, model_pks, moment)
+        snapshots = self.bulk_create([
+            self.model(
+                model=label,
+                model_pk=model_pk,
+                snapshot_datetime=moment,
+                state=state,
+            )
+            for model_pk, state in states.items()
+        ])
+        return len(snapshots)
+
+    def _take_batch(self, model, rows, moment):
+        label = get_model_label(model)
+        pk_attname = model._meta.pk.attname
+        current = {row[pk_attname]: row for row in rows}
+        states = ChangeLog.objects.states_at(label, current, moment)
+        # Для объектов, история создания которых неизвестна,
+        # изменения после moment отменяются в текущем состоянии
+        unknown = {
+            model_pk: dict(row) for model_pk, row in current.items()
+            if model_pk not in states
+        }
+        later = ChangeLog.objects.filter(
+            model=label,
+            model_pk__in=unknown,
+            change_datetime__gt=moment,
+        ).order_by("-change_datetime", "-pk").values_list(
+            "model_pk", "action", "prev_change"
+        )
+        for model_pk, action, prev_change in later:
+            if model_pk not in unknown:
+                continue
+            if action == ChangeMeta.CREATE_ACTION:
+                # Объект создан после moment
+                del unknown[model_pk]
+            else:
+                unknown[model_pk].update(prev_change or {})
+        states.update(unknown)
+        snapshots = self.bulk_create([
+            self.model(
+                model=label,
+                model_pk=model_pk,
+                snapshot_datetime=moment,
+                state=state,
+            )
+            for model_pk, state in states.items()
+        ])
+        return len(snapshots)
+
+    def take(self, model, queryset=None, batch_size=1000, moment=None):
+        """
+        Сохраняет снимки состояний объектов queryset модели model,
+        использующей ChangeLogMixin, на момент moment (по умолчанию
+        SNAPSHOT_DELAY назад). Состояния восстанавливаются по истории
+        изменений: снимок текущего состояния не содержал бы изменений
+        ещё не зафиксированных транзакций, а их записи журнала с более
+        ранним временем изменения затем не применялись бы к снимку.
+        Объекты читаются и снимки вставляются пачками по batch_size.
+        Возвращает количество сохранённых снимков
+        """
+        if queryset is None:
+            queryset = model._default_manager.all()
+        if moment is None:
+            moment = timezone.now() - SNAPSHOT_DELAY
+        attnames = model.get_changelog_attnames()
+        rows = queryset.order_by().values(*attnames).iterator(batch_size)
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count += self._take_batch(model, batch, moment)
+                batch = []
+        if batch:
+            count += self._take_batch(model, batch, moment)
+        return count
+
+
+class ChangeLogSnapshot(models.Model):
+    """
+    Полное состояние объекта на момент snapshot_datetime.
+    Снимки ограничивают количество изменений, которые нужно применить
+    для восстановления состояния объекта на заданный момент
+    """
+
+    class Meta:
+        verbose_name = "Снимок состояния"
+        verbose_name_plural = "Снимки состояний"
+        indexes = [
+            models.Index(
+                fields=["model", "model_pk", "-snapshot_datetime"],
+                name="changelog_snapshot_pk_dt_idx",
+            ),
+        ]
+
+    objects = ChangeLogSnapshotManager()
+
+    snapshot_datetime = models.DateTimeField("Дата и время снимка")
+    model = models.CharField("Имя модели объекта", max_length=255)
+    model_pk = models.IntegerField("Первичный ключ объекта")
+    state = models.JSONField(
+        "Состояние объекта в формате JSON",
+        encoder=DjangoJSONEncoder,
+    )
@@ -0,0 +1,71 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from main.models import FacilityObject, MovementList
+from ..models import ChangeLog
+from ..utils import ChangeMeta
+from .utils import run_commit_hooks
+
+
+class ChangeLogMixinTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.scheduled = timezone.now()
+        MovementList.objects.bulk_create([
+            MovementList(
+                facility=cls.facility,
+                scheduled_datetime=cls.scheduled,
+            )
+            for _ in range(1000)
+        ])
+
+    def test_instantiation_does_not_query(self):
+        with self.assertNumQueries(1):
+            movement_lists = list(MovementList.objects.all())
+        self.assertEqual(len(movement_lists), 1000)
+        movement_list = movement_lists[0]
+        self.assertEqual(movement_list._state.fields_cache, {})
+        self.assertEqual(
+            set(movement_list._original_values),
+            {field.attname for field in MovementList._meta.concrete_fields},
+        )
+
+    def test_deferred_fields_are_not_loaded(self):
+        movement_list = MovementList.objects.only("pk", "place").first()
+        with self.assertNumQueries(0):
+            self.assertEqual(movement_list._get_delta_names(), [])
+        self.assertEqual(set(movement_list._original_values), {"id", "place"})
+
+    def test_update_delta(self):
+        movement_list = MovementList.objects.first()
+        movement_list.place = "Аэропорт"
+        movement_list.scheduled_datetime += datetime.timedelta(hours=1)
+        movement_list.make_history(None, ChangeMeta.UPDATE_ACTION)
+        run_commit_hooks()
+        log = ChangeLog.objects.get()
+        self.assertEqual(log.model, "main.MovementList")
+        self.assertEqual(log.model_pk, movement_list.pk)
+        self.assertEqual(set(log.prev_change), {"place", "scheduled_datetime"})
+        self.assertEqual(log.prev_change["place"], "")
+        self.assertEqual(log.post_change["place"], "Аэропорт")
+        self.assertEqual(
+            movement_list.make_history(
+                None,
+                ChangeMeta.UPDATE_ACTION,
+            ).prev_change,
+            {},
+        )
+
+    def test_refresh_from_db_updates_snapshot(self):
+        movement_list = MovementList.objects.first()
+        MovementList.objects.filter(pk=movement_list.pk).update(place="Порт")
+        movement_list.refresh_from_db(fields=["place"])
+        self.assertEqual(movement_list._original_values["place"], "Порт")
+        self.assertEqual(movement_list._get_delta_names(), [])
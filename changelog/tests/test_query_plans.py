@@ -0,0 +1,40 @@
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import ChangeLog
+from ..utils import ChangeMeta
+
+
+class ChangeLogIndexesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ChangeLog.objects.bulk_create([
+            ChangeLog(
+                change_datetime=timezone.now(),
+                action=ChangeMeta.UPDATE_ACTION,
+                model="main.MovementList",
+                model_pk=pk,
+            )
+            for pk in range(500)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE changelog_changelog")
+
+    def test_model_changelogs_lookup(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = ChangeLog.objects.filter(
+            model="main.MovementList",
+            model_pk=42,
+            change_datetime__lte=timezone.now(),
+        ).order_by("change_datetime").explain()
+        self.assertIn("changelog_model_pk_dt_idx", plan)
+
+    def test_actor_lookup(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = ChangeLog.objects.search(actor=1).explain()
+        self.assertIn("changelog_actor_dt_idx", plan)
+        self.assertNotIn("Sort", plan)
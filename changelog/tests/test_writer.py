@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from ..models import ChangeLog
+from ..utils import ChangeMeta
+from ..writer import changelog_writer
+from .utils import run_commit_hooks
+
+
+class ChangeLogWriterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+
+    def add(self, model_pk):
+        changelog_writer.add(ChangeMeta(
+            changed_by=self.user,
+            model="main.MovementList",
+            model_pk=model_pk,
+            action=ChangeMeta.UPDATE_ACTION,
+            prev_changes={"place": ""},
+            post_changes={"place": "Порт"},
+        ))
+
+    def test_records_are_written_on_commit(self):
+        for pk in range(300):
+            self.add(pk)
+        self.assertFalse(ChangeLog.objects.exists())
+        with self.assertNumQueries(4):
+            run_commit_hooks()
+        self.assertEqual(ChangeLog.objects.count(), 300)
+        self.assertEqual(
+            ChangeLog.objects.filter(changed_by=self.user).count(),
+            300,
+        )
+        log = ChangeLog.objects.first()
+        self.assertEqual(log.post_change, {"place": "Порт"})
+
+    def test_rolled_back_records_are_dropped(self):
+        self.add(1)
+        try:
+            with transaction.atomic():
+                self.add(2)
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            self.add(3)
+        self.add(4)
+        run_commit_hooks()
+        self.assertEqual(
+            sorted(ChangeLog.objects.values_list("model_pk", flat=True)),
+            [1, 3, 4],
+        )
+
+    def test_batches_are_released(self):
+        self.add(1)
+        self.assertEqual(len(changelog_writer._local.batches["default"]), 1)
+        run_commit_hooks()
+        # Выполненный пакет удаляет себя сам
+        self.assertEqual(changelog_writer._local.batches["default"], {})
+        try:
+            with transaction.atomic():
+                self.add(2)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(changelog_writer._get_batches("default"), {})
@@ -0,0 +1,13 @@
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+def run_commit_hooks(using=DEFAULT_DB_ALIAS):
+    """
+    Выполняет обработчики transaction.on_commit текущей транзакции.
+    TestCase выполняет каждый тест в транзакции, которая
+    откатывается, поэтому сами они не вызываются
+    """
+    connection = connections[using]
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
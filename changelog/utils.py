@@ -1,9 +1,22 @@
 import json
+import datetime
 
 from django.utils import timezone
 from django.core.serializers.json import DjangoJSONEncoder
 
 
+class PreciseJSONEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder отбрасывает микросекунды у даты и времени.
+    Этот кодировщик сохраняет значения точно
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
 class ChangeMeta:
     """
     Мета информация о изменении
@@ -0,0 +1,82 @@
+import threading
+
+from django.db import transaction, DEFAULT_DB_ALIAS
+
+from .models import ChangeLog
+from .utils import ChangeMeta
+
+
+class ChangeLogBatch:
+    """
+    Исторические записи, ожидающие фиксации транзакции.
+    Объект регистрируется в transaction.on_commit и при вызове
+    записывает накопленные записи в базу данных
+    """
+
+    def __init__(self, using, batches=None, key=None):
+        self.using = using
+        self.records = []
+        self.batches = batches
+        self.key = key
+
+    def __call__(self):
+        # Выполненный пакет больше не принимает записи
+        if self.batches is not None and\
+                self.batches.get(self.key) is self:
+            del self.batches[self.key]
+        records, self.records = self.records, []
+        if records:
+            with transaction.atomic(using=self.using):
+                ChangeLog.objects.bulk_create_from_meta(records, self.using)
+
+
+class ChangeLogWriter:
+    """
+    Буферизованная запись истории изменений.
+    Записи, добавленные внутри транзакции, накапливаются и создаются
+    двумя запросами INSERT после её фиксации. При откате транзакции
+    или точки сохранения Django отбрасывает зарегистрированный
+    обработчик, и накопленные в нём записи не создаются.
+    Вне транзакции запись создаётся сразу
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _get_batches(self, using):
+        """
+        Возвращает пакеты, ожидающие фиксации транзакции.
+        Пакеты, отброшенные Django при откате, удаляются, поэтому
+        словарь не растёт в долгоживущем потоке
+        """
+        if not hasattr(self._local, "batches"):
+            self._local.batches = {}
+        batches = self._local.batches.setdefault(using, {})
+        if batches:
+            connection = transaction.get_connection(using)
+            pending = {id(func) for _, func in connection.run_on_commit}
+            for key, batch in list(batches.items()):
+                if id(batch) not in pending:
+                    del batches[key]
+        return batches
+
+    def add(self, meta: ChangeMeta, using=DEFAULT_DB_ALIAS):
+        connection = transaction.get_connection(using)
+        batches = self._get_batches(using)
+        # Записи группируются по точкам сохранения, чтобы откат
+        # вложенного блока atomic отбрасывал только его записи
+        key = tuple(connection.savepoint_ids)
+        batch = batches.get(key)
+        if batch is not None:
+            batch.records.append(meta)
+            return
+        if connection.in_atomic_block:
+            batch = ChangeLogBatch(using, batches, key)
+            batches[key] = batch
+        else:
+            batch = ChangeLogBatch(using)
+        batch.records.append(meta)
+        transaction.on_commit(batch, using=using)
+
+
+changelog_writer = ChangeLogWriter()
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     name = 'main'
+
+    def ready(self):
+        from .utils.trigram import register_trigram_lookups
+        register_trigram_lookups()
@@ -1,11 +1,16 @@
 from django import forms
+from django.apps import apps
+from django.core.validators import FileExtensionValidator
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Submit
 
+from changelog.models import ACTIONS
+from changelog.mixins import ChangeLogMixin
 from .models import MovementList, Employee, MovementEntry
+from .utils import get_datetime_range
 from .widgets import ListTextWidget
 
 
@@ -109,6 +114,110 @@ class EditMovementListForm(forms.Form):
     )
 
 
+class CloneMovementListForm(forms.Form):
+
+    list_type = forms.ChoiceField(
+        label="Тип списка",
+        choices=MovementList.TYPES_OF_LIST,
+    )
+    move_date = forms.DateField(
+        widget=forms.DateInput(
+            attrs={
+                "type": "date",
+                "min": timezone.now().strftime("%Y-%m-%d")
+            }
+        ),
+        label="Дата"
+    )
+    move_time = forms.TimeField(
+        widget=forms.TimeInput(
+            attrs={
+                "placeholder": "14:30",
+                "type": "time",
+            }
+        ),
+        label="Время"
+    )
+
+
+class RescheduleMovementListsForm(forms.Form):
+    """
+    Групповой перенос списков объекта, например, при задержке
+    вертолёта или колонны. Списки выбираются по вахте и датам
+    и сдвигаются на offset минут либо переносятся на новое время
+    """
+
+    SHIFT = "shift"
+    SET_TIME = "set_time"
+    MODES = [
+        (SHIFT, "Сдвинуть на"),
+        (SET_TIME, "Перенести на время"),
+    ]
+
+    token = forms.UUIDField(widget=forms.HiddenInput())
+    list_type = forms.ChoiceField(
+        label="Тип списка",
+        choices=[("", "Все")] + MovementList.TYPES_OF_LIST,
+        required=False,
+    )
+    watch = forms.CharField(
+        label="Вахта",
+        required=False,
+    )
+    date_from = forms.DateField(
+        widget=forms.DateInput(
+            attrs={
+                "type": "date",
+            }
+        ),
+        label="С даты",
+    )
+    date_to = forms.DateField(
+        widget=forms.DateInput(
+            attrs={
+                "type": "date",
+            }
+        ),
+        label="По дату",
+    )
+    mode = forms.ChoiceField(
+        label="Перенос",
+        choices=MODES,
+        initial=SHIFT,
+    )
+    offset = forms.IntegerField(
+        label="Сдвиг, минут",
+        help_text="Отрицательный сдвиг переносит списки на более раннее время",
+        required=False,
+    )
+    move_time = forms.TimeField(
+        widget=forms.TimeInput(
+            attrs={
+                "placeholder": "14:30",
+                "type": "time",
+            }
+        ),
+        label="Новое время",
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get("date_from")
+        date_to = cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError(
+                "Начальная дата не может быть позже конечной"
+            )
+        mode = cleaned_data.get("mode")
+        if mode == self.SHIFT and not cleaned_data.get("offset"):
+            self.add_error("offset", "Укажите сдвиг")
+        elif mode == self.SET_TIME and\
+                cleaned_data.get("move_time") is None:
+            self.add_error("move_time", "Укажите новое время")
+        return cleaned_data
+
+
 class CreateMovementEntryForm(forms.Form):
 
     first_name = forms.CharField(
@@ -147,28 +256,28 @@ class CreateMovementEntryForm(forms.Form):
     ]
 
     def __init__(self, *args, **kwargs):
-        _suggestions = kwargs.pop("suggestions", None)
+        _autocomplete_urls = kwargs.pop("autocomplete_urls", {})
         _user_perms = kwargs.pop("perms", None)
         super(CreateMovementEntryForm, self).__init__(*args, **kwargs)
 
         self.fields["first_name"].widget = ListTextWidget(
             attrs={"placeholder": "Иван", "autocomplete": "off"},
-            data_list=_suggestions.get("first_name", []),
+            autocomplete_url=_autocomplete_urls.get("first_name"),
             name="first_name_sug"
         )
         self.fields["last_name"].widget = ListTextWidget(
             attrs={"placeholder": "Иванов", "autocomplete": "off"},
-            data_list=_suggestions.get("last_name", []),
+            autocomplete_url=_autocomplete_urls.get("last_name"),
             name="last_name_sug"
         )
         self.fields["patronymic"].widget = ListTextWidget(
             attrs={"placeholder": "Иванович", "autocomplete": "off"},
-            data_list=_suggestions.get("patronymic", []),
+            autocomplete_url=_autocomplete_urls.get("patronymic"),
             name="patronymic_sug"
         )
         self.fields["position"].widget = ListTextWidget(
             attrs={"placeholder": "Водитель", "autocomplete": "off"},
-            data_list=_suggestions.get("position", []),
+            autocomplete_url=_autocomplete_urls.get("position"),
             name="position_sug",
         )
 
@@ -176,6 +285,161 @@ class CreateMovementEntryForm(forms.Form):
             self.fields["is_senior"].widget = forms.HiddenInput()
 
 
+class BulkCreateMovementEntriesForm(forms.Form):
+    """
+    Форма добавления списка сотрудников, вставленного из таблицы:
+    по одному сотруднику в строке, столбцы - фамилия, имя,
+    отчество и должность, разделённые табуляцией. Строка без
+    табуляции делится по пробелам, остаток строки после отчества
+    считается должностью. Строки с другим количеством столбцов
+    отклоняются. Каждая строка проверяется правилами
+    CreateMovementEntryForm
+    """
+
+    ROSTER_FIELDS = ["last_name", "first_name", "patronymic", "position"]
+    MAX_ROWS = 500
+
+    # Пробелы не обрезаются: табуляции в конце последней строки
+    # обозначают пустые столбцы
+    roster = forms.CharField(
+        strip=False,
+        widget=forms.Textarea(
+            attrs={
+                "rows": 15,
+                "placeholder": "Иванов\tИван\tИванович\tВодитель",
+            }
+        ),
+        label="Список сотрудников",
+        help_text="Фамилия, имя, отчество и должность, "
+                  "разделённые табуляцией. Один сотрудник в строке",
+    )
+
+    def parse_line(self, line):
+        """
+        Возвращает значения столбцов строки или вызывает
+        ValidationError, если количество столбцов неверно
+        """
+        if "\t" in line:
+            values = [value.strip() for value in line.split("\t")]
+            # Пустые ячейки правее таблицы не считаются столбцами
+            while len(values) > len(self.ROSTER_FIELDS) and not values[-1]:
+                values.pop()
+        else:
+            values = line.split(None, len(self.ROSTER_FIELDS) - 1)
+        if len(values) != len(self.ROSTER_FIELDS):
+            raise forms.ValidationError(
+                "ожидается %(expected)s столбца (фамилия, имя, отчество "
+                "и должность), получено %(count)s",
+                params={
+                    "expected": len(self.ROSTER_FIELDS),
+                    "count": len(values),
+                },
+            )
+        return dict(zip(self.ROSTER_FIELDS, values))
+
+    def clean_roster(self):
+        lines = [
+            (number, line)
+            for number, line in enumerate(
+                self.cleaned_data["roster"].splitlines(), start=1
+            )
+            if line.strip()
+        ]
+        if not lines:
+            raise forms.ValidationError("Список сотрудников пуст")
+        if len(lines) > self.MAX_ROWS:
+            raise forms.ValidationError(
+                "Можно добавить не более %s сотрудников за раз" % self.MAX_ROWS
+            )
+        rows = []
+        errors = []
+        for number, line in lines:
+            try:
+                data = self.parse_line(line)
+            except forms.ValidationError as error:
+                errors.append(
+                    forms.ValidationError(
+                        "Строка %(number)s: %(errors)s",
+                        params={
+                            "number": number,
+                            "errors": " ".join(error.messages),
+                        },
+                    )
+                )
+                continue
+            row_form = CreateMovementEntryForm(data=data, perms=set())
+            if row_form.is_valid():
+                rows.append(row_form.cleaned_data)
+                continue
+            for field, field_errors in row_form.errors.items():
+                errors.append(
+                    forms.ValidationError(
+                        "Строка %(number)s, %(field)s: %(errors)s",
+                        params={
+                            "number": number,
+                            "field": row_form.fields[field].label.lower(),
+                            "errors": " ".join(field_errors),
+                        },
+                    )
+                )
+        if errors:
+            raise forms.ValidationError(errors)
+        self.cleaned_data["rows"] = rows
+        return self.cleaned_data["roster"]
+
+
+class ImportMovementEntriesForm(forms.Form):
+
+    roster_file = forms.FileField(
+        label="Файл списка сотрудников",
+        help_text="CSV или XLSX. Столбцы: фамилия, имя, отчество, "
+                  "должность. Первая строка может содержать заголовки",
+        validators=[FileExtensionValidator(["csv", "xlsx"])],
+    )
+
+
+class BulkEntriesActionForm(forms.Form):
+    """
+    Групповое действие над выбранными записями списка
+    """
+
+    DELETE = "delete"
+    RESTORE = "restore"
+    MOVE = "move"
+    ACTIONS = [
+        (DELETE, "Удалить"),
+        (RESTORE, "Восстановить"),
+        (MOVE, "Перенести в список"),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        _movement_list = kwargs.pop("movement_list")
+        super().__init__(*args, **kwargs)
+        self.fields["entries"].queryset =\
+            _movement_list.movemententry_set.all()
+        self.fields["target_list"].queryset =\
+            MovementList.objects.get_move_targets(_movement_list)
+
+    action = forms.ChoiceField(label="Действие", choices=ACTIONS)
+    entries = forms.ModelMultipleChoiceField(
+        queryset=MovementEntry.objects.none(),
+        label="Записи",
+        error_messages={"required": "Не выбрано ни одной записи"},
+    )
+    target_list = forms.ModelChoiceField(
+        queryset=MovementList.objects.none(),
+        label="Список",
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("action") == self.MOVE and\
+                not cleaned_data.get("target_list"):
+            raise forms.ValidationError("Не выбран список для переноса")
+        return cleaned_data
+
+
 class EditMovementEntryForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
@@ -191,9 +455,15 @@ class EditMovementEntryForm(forms.ModelForm):
 
 
 class SearchEntryForm(forms.Form):
+    """
+    Поиск записей списка по ФИО. Подсказки autocomplete_url
+    дополняют одно поле целиком, поэтому к запросу подключаются
+    подсказки фамилии - первого слова ФИО. После ввода следующих
+    слов подсказки не показываются
+    """
 
     def __init__(self, action, *args, **kwargs):
-        _suggestions = kwargs.pop("suggestions", None)
+        _autocomplete_url = kwargs.pop("autocomplete_url", None)
         super().__init__(*args, **kwargs)
         self.helper = FormHelper(self)
         self.helper.disable_csrf = True
@@ -205,7 +475,7 @@ class SearchEntryForm(forms.Form):
                 "placeholder": "Иван Иванов Иванович",
                 "autocomplete": "off"
             },
-            data_list=_suggestions,
+            autocomplete_url=_autocomplete_url,
             name="search_request"
         )
 
@@ -239,5 +509,140 @@ class SearchListForm(forms.Form):
                 "min": timezone.now().strftime("%Y-%m-%d")
             }
         ),
-        label="Дата"
+        label="Дата",
+        required=False,
+    )
+    date_from = forms.DateField(
+        widget=forms.DateInput(
+            attrs={
+                "type": "date",
+            }
+        ),
+        label="С даты",
+        required=False,
+    )
+    date_to = forms.DateField(
+        widget=forms.DateInput(
+            attrs={
+                "type": "date",
+            }
+        ),
+        label="По дату",
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get("date_from")
+        date_to = cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError(
+                "Начальная дата не может быть позже конечной"
+            )
+        return cleaned_data
+
+    def get_date_range(self):
+        """
+        Возвращает границы поиска (date_from, date_to) включительно.
+        Конкретная дата имеет приоритет над диапазоном
+        """
+        data = self.cleaned_data
+        if data.get("search_date"):
+            return data["search_date"], data["search_date"]
+        return data.get("date_from"), data.get("date_to")
+
+
+class SearchEmployeeForm(forms.Form):
+
+    def __init__(self, action, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper(self)
+        self.helper.disable_csrf = True
+        self.helper.form_method = "GET"
+        self.helper.form_action = action
+        self.helper.add_input(Submit("submit", "Найти"))
+
+    q = forms.CharField(
+        widget=forms.TextInput(
+            attrs={
+                "placeholder": "Иванов Иван",
+                "autocomplete": "off",
+            }
+        ),
+        min_length=3,
+        max_length=122,
+        label="ФИО сотрудника",
+    )
+
+
+class AuditLogForm(forms.Form):
+
+    def __init__(self, action, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["model"].choices = [("", "Все")] + [
+            (model._meta.label, model._meta.verbose_name.capitalize())
+            for model in apps.get_models()
+            if issubclass(model, ChangeLogMixin)
+        ]
+        self.helper = FormHelper(self)
+        self.helper.disable_csrf = True
+        self.helper.form_method = "GET"
+        self.helper.form_action = action
+        self.helper.add_input(Submit("submit", "Найти"))
+
+    actor = forms.ModelChoiceField(
+        get_user_model().objects.order_by("username"),
+        label="Пользователь",
+        required=False,
+    )
+    action = forms.ChoiceField(
+        choices=(("", "Все"),) + ACTIONS,
+        label="Действие",
+        required=False,
     )
+    model = forms.ChoiceField(label="Объект", required=False)
+    date_from = forms.DateField(
+        widget=forms.DateInput(
+            attrs={
+                "type": "date",
+            }
+        ),
+        label="С даты",
+        required=False,
+    )
+    date_to = forms.DateField(
+        widget=forms.DateInput(
+            attrs={
+                "type": "date",
+            }
+        ),
+        label="По дату",
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get("date_from")
+        date_to = cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError(
+                "Начальная дата не может быть позже конечной"
+            )
+        return cleaned_data
+
+    def get_search_kwargs(self):
+        """
+        Возвращает аргументы ChangeLog.objects.search
+        """
+        data = self.cleaned_data
+        start, end = get_datetime_range(
+            data.get("date_from"),
+            data.get("date_to"),
+        )
+        return {
+            "actor": data.get("actor"),
+            "action": data.get("action"),
+            "model": data.get("model"),
+            "start": start,
+            "end": end,
+        }
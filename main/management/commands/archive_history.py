@@ -0,0 +1,113 @@
+import datetime
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.core.management.base import BaseCommand, CommandError
+
+from changelog.archive import archive_queryset
+from changelog.mixins import ChangeLogMixin
+from changelog.models import ChangeLog, ChangeLogSnapshot
+from main.models import MovementListHistory, MovementEntryHistory
+
+
+# Архивируемые модели и поля с датой изменения
+HISTORY_MODELS = (
+    (ChangeLog, "change_datetime"),
+    (MovementListHistory, "modified_datetime"),
+    (MovementEntryHistory, "modified_datetime"),
+)
+
+
+class Command(BaseCommand):
+    help = """
+    Moves history rows older than the given number of days to
+    gzip-compressed JSON Lines files under MEDIA_ROOT/history-archive,
+    one file per model and month. Rows are archived and deleted
+    in primary key order in batches. Objects whose changes are
+    archived first get a changelog snapshot of their state at the
+    cutoff, so their state can still be reconstructed
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, required=True,
+            help="archive rows changed more than this number of days ago",
+        )
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="rows archived and deleted at once (1000 by default)",
+            default=1000
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size should be positive")
+        if kwargs["older_than"] < 1:
+            raise CommandError("Age should be positive")
+        cutoff = timezone.now() - datetime.timedelta(
+            days=kwargs["older_than"]
+        )
+        self.take_snapshots(cutoff, batch_size)
+        root = Path(settings.MEDIA_ROOT) / "history-archive"
+        for model, datetime_field in HISTORY_MODELS:
+            queryset = model._default_manager.filter(**{
+                datetime_field + "__lt": cutoff,
+            })
+            archived = archive_queryset(
+                queryset,
+                datetime_field,
+                root,
+                batch_size,
+            )
+            self.stdout.write(
+                "%s: %s rows archived" % (model._meta.label, archived)
+            )
+
+    def take_snapshots(self, cutoff, batch_size):
+        """
+        Сохраняет на момент cutoff снимки объектов, изменения которых
+        будут перенесены в архив. Объекты, у которых есть снимок
+        не позже cutoff, сделанный после их последнего архивируемого
+        изменения, пропускаются. Снимки восстанавливаются по истории,
+        поэтому состояние на любой момент после cutoff
+        остаётся доступным
+        """
+        for model in apps.get_models():
+            if not issubclass(model, ChangeLogMixin):
+                continue
+            label = model._meta.label
+            last_changes = ChangeLog.objects.filter(
+                model=label,
+                change_datetime__lt=cutoff,
+            ).values("model_pk").annotate(
+                last_change=Max("change_datetime"),
+            ).order_by("model_pk").values_list("model_pk", "last_change")
+            batch = []
+            for row in last_changes.iterator(batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self.take_batch_snapshots(label, batch, cutoff)
+                    batch = []
+            if batch:
+                self.take_batch_snapshots(label, batch, cutoff)
+
+    def take_batch_snapshots(self, label, last_changes, cutoff):
+        snapshots = {
+            snapshot.model_pk: snapshot.snapshot_datetime
+            for snapshot in ChangeLogSnapshot.objects.get_latest(
+                label,
+                [model_pk for model_pk, _ in last_changes],
+                cutoff,
+            ).only("model_pk", "snapshot_datetime")
+        }
+        model_pks = [
+            model_pk for model_pk, last_change in last_changes
+            if model_pk not in snapshots or
+            snapshots[model_pk] < last_change
+        ]
+        if model_pks:
+            ChangeLogSnapshot.objects.take_at(label, model_pks, cutoff)
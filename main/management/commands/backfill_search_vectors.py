@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Employee, update_name_search_vectors
+
+
+class Command(BaseCommand):
+    help = """
+    Fills the stored full name search vectors of employees and users.
+    Rows are processed in primary key order in batches
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="rows updated by one query (1000 by default)",
+            default=1000
+        )
+        parser.add_argument(
+            "--all", action="store_true",
+            help="recompute vectors that are already filled",
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size should be positive")
+        for model in (Employee, get_user_model()):
+            queryset = model._default_manager.all()
+            if not kwargs["all"]:
+                queryset = queryset.filter(search_vector__isnull=True)
+            updated = self.backfill(queryset, batch_size)
+            self.stdout.write(
+                "%s: %s rows updated" % (model._meta.verbose_name, updated)
+            )
+
+    def backfill(self, queryset, batch_size):
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                queryset.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                return updated
+            updated += update_name_search_vectors(
+                queryset.model._default_manager.filter(pk__in=pks)
+            )
+            last_pk = pks[-1]
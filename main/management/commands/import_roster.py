@@ -0,0 +1,78 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import MovementList
+from main.utils.roster import import_roster, RosterFormatError
+
+
+class Command(BaseCommand):
+    help = """
+    Imports employees from a CSV or XLSX file into a movement list.
+    Rows are validated and inserted in batches, rejected rows
+    are written to a report under MEDIA_ROOT/imports/. Reports contain
+    employees' names and are kept for 24 hours: older reports are
+    removed on every import and by the prune_import_reports command
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "list_id", type=int,
+            help="primary key of the movement list",
+        )
+        parser.add_argument(
+            "path", type=str,
+            help="path to the .csv or .xlsx file",
+        )
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="rows inserted by one query (1000 by default)",
+            default=1000
+        )
+        parser.add_argument(
+            "--creator", type=str,
+            help="username of the user set as the creator of the entries",
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size should be positive")
+        try:
+            movement_list = MovementList.objects.get(pk=kwargs["list_id"])
+        except MovementList.DoesNotExist:
+            raise CommandError("Movement list does not exist")
+        creator = None
+        if kwargs["creator"]:
+            try:
+                creator = get_user_model().objects.get(
+                    username=kwargs["creator"]
+                )
+            except get_user_model().DoesNotExist:
+                raise CommandError("User does not exist")
+
+        path = Path(kwargs["path"])
+        try:
+            with open(path, "rb") as roster_file:
+                imported, rejected, report = import_roster(
+                    movement_list,
+                    creator,
+                    roster_file,
+                    path.name,
+                    batch_size,
+                )
+        except OSError as e:
+            raise CommandError("Could not open the file: %s" % e)
+        except RosterFormatError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write("%s rows imported" % imported)
+        if report:
+            self.stdout.write(
+                "%s rows rejected, see %s" % (
+                    rejected,
+                    Path(settings.MEDIA_ROOT) / report,
+                )
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.utils.roster import prune_import_reports, IMPORT_REPORT_MAX_AGE
+
+
+class Command(BaseCommand):
+    help = """
+    Removes rejected row reports of roster imports under
+    MEDIA_ROOT/imports/ older than the given number of hours
+    (24 by default). Reports contain employees' names, so the
+    command should run periodically
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int,
+            default=IMPORT_REPORT_MAX_AGE // (60 * 60),
+            help="remove reports created more than this number of hours ago",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["older_than"] < 0:
+            raise CommandError("Age should not be negative")
+        removed = prune_import_reports(kwargs["older_than"] * 60 * 60)
+        self.stdout.write("%s reports removed" % removed)
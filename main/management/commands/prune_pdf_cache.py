@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.utils.pdf_cache import prune_pdf_cache
+
+
+class Command(BaseCommand):
+    help = """
+    Removes cached movement list PDFs under MEDIA_ROOT/pdf-cache
+    that were not downloaded for the given number of days, and
+    cache directories of deleted movement lists
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, default=7,
+            help="remove files not downloaded for this number of days",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["older_than"] < 0:
+            raise CommandError("Age should not be negative")
+        removed = prune_pdf_cache(kwargs["older_than"] * 24 * 60 * 60)
+        self.stdout.write("%s files removed" % removed)
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from changelog.archive import restore_archive
+
+
+class Command(BaseCommand):
+    help = """
+    Loads history rows from archives created by archive_history
+    back into their tables. Archives are read as a stream,
+    rows that already exist are skipped
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths", nargs="+",
+            help="archive files (*.jsonl.gz)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int,
+            help="rows inserted by one query (1000 by default)",
+            default=1000
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        if batch_size < 1:
+            raise CommandError("Batch size should be positive")
+        for path in kwargs["paths"]:
+            if not Path(path).is_file():
+                raise CommandError("File %s does not exist" % path)
+            restored = restore_archive(path, batch_size)
+            self.stdout.write("%s: %s rows restored" % (path, restored))
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.3 on 2026-10-17 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_auto_20201227_1604'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movemententry',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['movement_list', '-id'], name='main_mentry_not_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlist',
+            index=models.Index(fields=['facility', '-id'], name='main_mlist_facility_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlist',
+            index=models.Index(fields=['facility', 'list_type', '-id'], name='main_mlist_facility_type_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.3 on 2026-10-17 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_auto_20261018_0744'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movementlist',
+            index=models.Index(fields=['facility', 'scheduled_datetime'], name='main_mlist_facility_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.3 on 2026-10-17 19:54
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_auto_20261018_0749'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='employee',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=122),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE main_employee SET search_name = replace(
+                lower(regexp_replace(
+                    btrim(concat_ws(' ', last_name, first_name, patronymic)),
+                    '\\s+', ' ', 'g'
+                )),
+                'ё', 'е'
+            )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='main_employee_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.1.3 on 2026-10-17 19:56
+
+from django.db import migrations, models
+
+
+# Начальное заполнение подсказок значениями полей
+# всех сотрудников и пользователей
+BACKFILL_SQL = """
+INSERT INTO main_suggestion (field, value, normalized, frequency, last_used)
+SELECT field, min(value), normalized, count(*), now()
+FROM (
+    SELECT field, value,
+        replace(lower(value), 'ё', 'е') AS normalized
+    FROM (
+        SELECT field,
+            regexp_replace(btrim(value), '\\s+', ' ', 'g') AS value
+        FROM (
+            %s
+        ) AS source_values
+    ) AS cleaned_values
+    WHERE value <> ''
+) AS normalized_values
+GROUP BY field, normalized
+"""
+
+SOURCE_SQL = "SELECT '{field}' AS field, {field} AS value FROM {table}"
+
+SOURCES = [
+    SOURCE_SQL.format(field=field, table=table)
+    for field in ["first_name", "last_name", "patronymic", "position"]
+    for table in ["main_employee", "main_user"]
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_auto_20261018_0754'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Suggestion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('first_name', 'Имя'), ('last_name', 'Фамилия'), ('patronymic', 'Отчество'), ('position', 'Должность')], max_length=20, verbose_name='Поле')),
+                ('value', models.CharField(max_length=100, verbose_name='Значение')),
+                ('normalized', models.CharField(max_length=100, verbose_name='Нормализованное значение')),
+                ('frequency', models.PositiveIntegerField(default=0, verbose_name='Частота')),
+                ('last_used', models.DateTimeField(verbose_name='Последнее использование')),
+            ],
+            options={
+                'verbose_name': 'Подсказка',
+                'verbose_name_plural': 'Подсказки',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='suggestion',
+            index=models.Index(fields=['field', 'normalized'], name='main_suggestion_prefix_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='suggestion',
+            index=models.Index(fields=['field', '-frequency'], name='main_suggestion_freq_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='suggestion',
+            constraint=models.UniqueConstraint(fields=('field', 'normalized'), name='main_suggestion_unique'),
+        ),
+        migrations.RunSQL(
+            BACKFILL_SQL % "\n            UNION ALL ".join(SOURCES),
+            "DELETE FROM main_suggestion",
+        ),
+    ]
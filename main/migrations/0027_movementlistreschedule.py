@@ -0,0 +1,29 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_auto_20261018_0756'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementListReschedule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(unique=True, verbose_name='Ключ операции')),
+                ('created_datetime', models.DateTimeField(auto_now_add=True, verbose_name='Время выполнения')),
+                ('lists_count', models.PositiveIntegerField(default=0, verbose_name='Количество перенесённых списков')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Кем выполнен')),
+            ],
+            options={
+                'verbose_name': 'Перенос списков',
+                'verbose_name_plural': 'Переносы списков',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:13
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_movementlistreschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movemententryhistory',
+            name='post_delta',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные после изменения'),
+        ),
+        migrations.AddField(
+            model_name='movemententryhistory',
+            name='prev_delta',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные до изменения'),
+        ),
+        migrations.AddField(
+            model_name='movementlisthistory',
+            name='post_delta',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные после изменения'),
+        ),
+        migrations.AddField(
+            model_name='movementlisthistory',
+            name='prev_delta',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные до изменения'),
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:14
+
+import json
+from xml.etree import ElementTree
+
+from django.db import migrations, transaction
+
+
+BATCH_SIZE = 1000
+
+LIST_FIELDS = ("scheduled_datetime", "place", "watch")
+ENTRY_FIELDS = (
+    "first_name", "last_name", "patronymic", "position", "is_senior",
+)
+
+
+def parse_list_xml(data):
+    """
+    Значения полей из XML сериализатора Django без создания объектов
+    """
+    state = {}
+    if not data:
+        return state
+    for field in ElementTree.fromstring(data).iter("field"):
+        name = field.get("name")
+        if name not in LIST_FIELDS:
+            continue
+        if field.find("None") is not None:
+            state[name] = None
+        else:
+            state[name] = field.text or ""
+    return state
+
+
+def parse_entry_json(data):
+    """
+    Значения полей сотрудника из JSON сериализатора Django
+    """
+    if not data:
+        return {}
+    objects = json.loads(data)
+    if not objects:
+        return {}
+    fields = objects[0]["fields"]
+    return {name: fields[name] for name in ENTRY_FIELDS if name in fields}
+
+
+def get_delta(prev_state, post_state):
+    names = [
+        name for name, value in post_state.items()
+        if prev_state.get(name) != value
+    ]
+    return (
+        {name: prev_state.get(name) for name in names},
+        {name: post_state[name] for name in names},
+    )
+
+
+def convert_history(model, parse):
+    """
+    Переносит состояния в поля prev_delta и post_delta.
+    Строки читаются пачками по первичному ключу, каждая пачка
+    обновляется и фиксируется отдельной транзакцией
+    """
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk).order_by("pk").values_list(
+                "pk", "serialized_prev_delta", "serialized_post_delta"
+            )[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        objs = []
+        for pk, prev_data, post_data in rows:
+            prev_delta, post_delta = get_delta(
+                parse(prev_data),
+                parse(post_data),
+            )
+            objs.append(
+                model(pk=pk, prev_delta=prev_delta, post_delta=post_delta)
+            )
+        with transaction.atomic():
+            model.objects.bulk_update(objs, ["prev_delta", "post_delta"])
+        last_pk = rows[-1][0]
+
+
+def convert_history_deltas(apps, schema_editor):
+    convert_history(
+        apps.get_model("main", "MovementListHistory"),
+        parse_list_xml,
+    )
+    convert_history(
+        apps.get_model("main", "MovementEntryHistory"),
+        parse_entry_json,
+    )
+
+
+class Migration(migrations.Migration):
+
+    # Каждая пачка фиксируется отдельно, чтобы не держать
+    # блокировки всей таблицы истории до конца миграции
+    atomic = False
+
+    dependencies = [
+        ('main', '0028_auto_20261018_0813'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            convert_history_deltas,
+            migrations.RunPython.noop,
+        ),
+    ]
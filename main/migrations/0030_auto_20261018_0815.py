@@ -0,0 +1,29 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0029_auto_20261018_0814'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='movemententryhistory',
+            name='serialized_post_delta',
+        ),
+        migrations.RemoveField(
+            model_name='movemententryhistory',
+            name='serialized_prev_delta',
+        ),
+        migrations.RemoveField(
+            model_name='movementlisthistory',
+            name='serialized_post_delta',
+        ),
+        migrations.RemoveField(
+            model_name='movementlisthistory',
+            name='serialized_prev_delta',
+        ),
+    ]
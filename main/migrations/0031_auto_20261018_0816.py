@@ -0,0 +1,21 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0030_auto_20261018_0815'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movemententryhistory',
+            index=models.Index(fields=['modified_entry', '-id'], name='main_mentryhist_entry_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movementlisthistory',
+            index=models.Index(fields=['modified_list', '-id'], name='main_mlisthist_list_id_idx'),
+        ),
+    ]
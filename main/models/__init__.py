@@ -1,4 +1,5 @@
 from .person import *   # Должен импоритроваться первым
+from .suggestions import *
 from .facility import *
 from .history import *
 from .entries import *
@@ -1,27 +1,178 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
-from django.core import serializers
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
-from .person import Employee
+from .person import Employee, update_name_search_vectors
+from .suggestions import Suggestion, normalize_name
 from .lists import MovementList
 from .history import HistoryMixin
+from ..utils.permissions import get_perm_q, as_boolean
+from changelog.models import ChangeLog
+from changelog.mixins import ChangeLogMixin
+from changelog.utils import ChangeMeta
 
 
-class MovementEntryManager(models.Manager):
+class MovementEntryQuerySet(models.QuerySet):
 
-    def get_autocomplete_suggestions(self, field):
-        entries = super().all().distinct()
-        values = entries.values_list("employee__" + field, flat=True)
-        users_values = entries.values_list("creator__" + field, flat=True)
-        values = list(values) + list(users_values)
-        return values
+    def with_perms(self, user):
+        """
+        Добавляет к записям флаги can_change и can_delete,
+        вычисляемые на стороне базы данных.
+        Записи удалённого списка недоступны для изменения
+        """
+        not_deleted = models.Q(
+            is_deleted=False,
+            movement_list__is_deleted=False,
+        )
+        can_change = get_perm_q(
+            user,
+            "main.change_movemententry",
+            "main.change_owned_movemententry",
+        )
+        can_delete = get_perm_q(
+            user,
+            "main.delete_movemententry",
+            "main.delete_owned_movemententry",
+        )
+        return self.annotate(
+            can_change=as_boolean(can_change & not_deleted),
+            can_delete=as_boolean(can_delete & not_deleted),
+        )
+
+
+class MovementEntryManager(
+            models.Manager.from_queryset(MovementEntryQuerySet)
+        ):
+
+    def get_autocomplete_suggestions(self, field, prefix="", limit=100):
+        """
+        Возвращает самые частые значения поля field сотрудников
+        и пользователей из таблицы подсказок
+        """
+        return Suggestion.objects.get_values(field, prefix, limit)
 
     def get_not_deleted(self):
         return super().all().filter(is_deleted=False)
 
+    def _bulk_update(self, user, entries, action, **values):
+        """
+        Изменяет поля values записей entries одним запросом UPDATE
+        и сохраняет прежние и новые значения в историю.
+        Возвращает первичные ключи изменённых записей
+        """
+        fields = list(values)
+        with transaction.atomic():
+            rows = entries.select_for_update(of=("self",)).values_list(
+                "pk", *fields
+            )
+            changes = [
+                (row[0], dict(zip(fields, row[1:])), values)
+                for row in rows
+            ]
+            pks = [pk for pk, _, _ in changes]
+            if pks:
+                self.filter(pk__in=pks).update(
+                    last_modified=timezone.now(),
+                    **values
+                )
+                ChangeLog.objects.bulk_log(user, self.model, action, changes)
+        return pks
+
+    def bulk_delete(self, user, pks):
+        """
+        Помечает удалёнными записи с первичными ключами pks,
+        которые пользователь user вправе удалить
+        """
+        entries = self.with_perms(user).filter(
+            pk__in=pks,
+            can_delete=True,
+        )
+        return self._bulk_update(
+            user, entries, ChangeMeta.DELETE_ACTION, is_deleted=True
+        )
 
-class MovementEntry(models.Model):
+    def bulk_restore(self, user, pks):
+        """
+        Восстанавливает удалённые записи с первичными ключами pks,
+        которые пользователь user вправе удалять
+        """
+        entries = self.filter(
+            get_perm_q(
+                user,
+                "main.delete_movemententry",
+                "main.delete_owned_movemententry",
+            ),
+            pk__in=pks,
+            is_deleted=True,
+            movement_list__is_deleted=False,
+        )
+        return self._bulk_update(
+            user, entries, ChangeMeta.RESTORE_ACTION, is_deleted=False
+        )
+
+    def bulk_move(self, user, pks, movement_list):
+        """
+        Переносит в список movement_list записи с первичными ключами pks,
+        которые пользователь user вправе изменять
+        """
+        entries = self.with_perms(user).filter(
+            pk__in=pks,
+            can_change=True,
+        ).exclude(movement_list=movement_list)
+        return self._bulk_update(
+            user, entries, ChangeMeta.UPDATE_ACTION,
+            movement_list_id=movement_list.pk,
+        )
+
+    def bulk_add(self, movement_list, creator, rows, batch_size=500):
+        """
+        Создаёт сотрудников и записи списка movement_list по строкам rows
+        (словарям с полями CreateMovementEntryForm) в одной транзакции.
+        Вместо сохранения каждого объекта выполняется несколько
+        запросов INSERT на пачку строк
+        """
+        employees = [
+            Employee(
+                first_name=row["first_name"],
+                last_name=row["last_name"],
+                patronymic=row.get("patronymic", ""),
+                position=row.get("position", ""),
+                is_senior=row.get("is_senior", False),
+            )
+            for row in rows
+        ]
+        for employee in employees:
+            employee.search_name = normalize_name(employee.full_name)
+        with transaction.atomic():
+            employees = Employee.objects.bulk_create(employees, batch_size)
+            update_name_search_vectors(
+                Employee.objects.filter(
+                    pk__in=[employee.pk for employee in employees]
+                )
+            )
+            for field in Employee.suggestion_fields:
+                Suggestion.objects.record(
+                    field,
+                    [getattr(employee, field) for employee in employees],
+                )
+            entries = self.bulk_create(
+                [
+                    self.model(
+                        movement_list=movement_list,
+                        creator=creator,
+                        employee=employee,
+                    )
+                    for employee in employees
+                ],
+                batch_size,
+            )
+            Employee.log_created(employees, creator)
+            self.model.log_created(entries, creator)
+            return entries
+
+
+class MovementEntry(ChangeLogMixin, models.Model):
     """
     Запись содержащая информацию о заезде/выезде
     сотрудников на производственный объект
@@ -107,7 +258,7 @@ class MovementEntry(models.Model):
         )
 
     def is_creator(self, user):
-        return self.creator == user
+        return self.creator_id is not None and self.creator_id == user.pk
 
     def has_change_perm(self, user):
         is_creator = self.is_creator(user)
@@ -136,6 +287,15 @@ class MovementEntry(models.Model):
         verbose_name = "Запись о заезде/выезде"
         verbose_name_plural = "Записи о заездах/выездах"
 
+        indexes = [
+            # Неудалённые записи списка, новые первыми
+            models.Index(
+                fields=["movement_list", "-id"],
+                name="main_mentry_not_deleted_idx",
+                condition=models.Q(is_deleted=False),
+            ),
+        ]
+
         permissions = [
             (
                 "change_owned_movemententry",
@@ -153,24 +313,26 @@ class MovementEntryHistory(HistoryMixin):
     История изменений записи
     """
 
+    history_fields = {
+        "first_name": "Имя",
+        "last_name": "Фамилия",
+        "patronymic": "Отчество",
+        "position": "Должность",
+        "is_senior": "Старший",
+    }
+
     modified_entry = models.ForeignKey(
         MovementEntry,
         on_delete=models.CASCADE
     )
 
-    def get_change_states(self):
-        prev_state = next(
-            serializers.deserialize("json", self.serialized_prev_delta)
-        ).object
-        post_state = next(
-            serializers.deserialize("json", self.serialized_post_delta)
-        ).object
-        states = {
-            "prev_state": prev_state,
-            "post_state": post_state,
-        }
-        return states
-
     class Meta:
         verbose_name = "Состояние записи"
         verbose_name_plural = "Состояния записей"
+        indexes = [
+            # История записи, новые изменения первыми
+            models.Index(
+                fields=["modified_entry", "-id"],
+                name="main_mentryhist_entry_id_idx",
+            ),
+        ]
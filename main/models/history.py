@@ -1,8 +1,26 @@
 from django.db import models
+from django.core.cache import cache
+from django.utils.dateparse import parse_datetime
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 
+from ..utils import datetime_to_current_tz
+
+
+# Увеличивается при изменении подписей полей или форматирования значений,
+# чтобы ранее сохранённые в кэше изменения не использовались
+HISTORY_CHANGES_VERSION = 1
+
 
 class HistoryMixin(models.Model):
+    """
+    Состояние объекта: значения изменённых полей до и после изменения.
+    history_fields - отслеживаемые поля и их подписи,
+    history_datetime_fields - поля, хранящие дату и время
+    """
+
+    history_fields = {}
+    history_datetime_fields = ()
 
     modified_by = models.ForeignKey(
         get_user_model(),
@@ -10,8 +28,111 @@ class HistoryMixin(models.Model):
         null=True
     )
     modified_datetime = models.DateTimeField("Время внесения изменений")
-    serialized_prev_delta = models.TextField("Данные до изменения")
-    serialized_post_delta = models.TextField("Данные после изменения")
+    prev_delta = models.JSONField(
+        "Данные до изменения",
+        default=dict,
+        encoder=DjangoJSONEncoder,
+    )
+    post_delta = models.JSONField(
+        "Данные после изменения",
+        default=dict,
+        encoder=DjangoJSONEncoder,
+    )
+
+    @classmethod
+    def get_state(cls, obj):
+        """
+        Возвращает значения отслеживаемых полей объекта obj
+        """
+        return {name: getattr(obj, name) for name in cls.history_fields}
+
+    @staticmethod
+    def get_delta(prev_state, post_state):
+        """
+        Возвращает значения изменившихся полей до и после изменения
+        """
+        names = [
+            name for name, value in post_state.items()
+            if prev_state.get(name) != value
+        ]
+        return (
+            {name: prev_state.get(name) for name in names},
+            {name: post_state[name] for name in names},
+        )
+
+    def _parse_delta(self, delta):
+        state = dict(delta)
+        for name in self.history_datetime_fields:
+            if state.get(name):
+                state[name] = parse_datetime(state[name])
+        return state
+
+    def get_change_states(self):
+        states = {
+            "prev_state": self._parse_delta(self.prev_delta),
+            "post_state": self._parse_delta(self.post_delta),
+        }
+        return states
+
+    def _format_value(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return "да" if value else "нет"
+        if hasattr(value, "tzinfo"):
+            return datetime_to_current_tz(value).strftime("%d.%m.%Y %H:%M")
+        return value
+
+    def _compute_changes(self):
+        states = self.get_change_states()
+        return [
+            {
+                "name": name,
+                "label": label,
+                "prev": self._format_value(states["prev_state"].get(name)),
+                "post": self._format_value(states["post_state"].get(name)),
+            }
+            for name, label in self.history_fields.items()
+            if name in states["post_state"]
+        ]
+
+    def get_changes_cache_key(self):
+        return "history-changes:%s:%s:%s" % (
+            HISTORY_CHANGES_VERSION,
+            self._meta.label_lower,
+            self.pk,
+        )
+
+    @classmethod
+    def prefetch_changes(cls, objs):
+        """
+        Загружает изменения объектов objs из кэша одним запросом.
+        Отсутствующие в кэше изменения вычисляются и сохраняются
+        также одним запросом. Состояние после записи не меняется,
+        поэтому результат кэшируется без ограничения времени
+        """
+        objs = {obj.get_changes_cache_key(): obj for obj in objs}
+        cached = cache.get_many(list(objs))
+        missing = {}
+        for key, obj in objs.items():
+            if key in cached:
+                obj._changes_cache = cached[key]
+            else:
+                obj._changes_cache = missing[key] = obj._compute_changes()
+        if missing:
+            cache.set_many(missing, None)
+
+    def get_changes(self):
+        """
+        Возвращает изменённые поля в порядке history_fields
+        в виде списка словарей с именем, подписью и значениями
+        до и после изменения
+        """
+        if self.pk is None:
+            return self._compute_changes()
+        if not hasattr(self, "_changes_cache"):
+            self.prefetch_changes([self])
+        return self._changes_cache
 
     class Meta:
         abstract = True
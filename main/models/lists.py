@@ -1,13 +1,139 @@
-from django.db import models
+from datetime import datetime, timedelta
+
+from django.db import models, transaction, IntegrityError
+from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from .history import HistoryMixin
+from .person import Employee
 from .facility import FacilityObject
 from ..utils import datetime_to_current_tz
+from ..utils.permissions import get_perm_q, as_boolean
+from changelog.models import ChangeLog
+from changelog.mixins import ChangeLogMixin
+from changelog.utils import ChangeMeta
+
+
+class MovementListQuerySet(models.QuerySet):
+
+    def get_move_targets(self, movement_list, days=31):
+        """
+        Возвращает списки того же объекта, в которые можно перенести
+        записи списка movement_list: не удалённые и запланированные
+        не ранее, чем days дней назад
+        """
+        return self.filter(
+            facility_id=movement_list.facility_id,
+            is_deleted=False,
+            scheduled_datetime__gte=timezone.now() - timedelta(days=days),
+        ).exclude(pk=movement_list.pk).order_by("scheduled_datetime")
+
+    def reschedule(self, user, token, offset=None, time=None):
+        """
+        Переносит списки, которые пользователь user вправе изменять,
+        на offset (timedelta) или на время time того же дня.
+        Списки изменяются одним запросом UPDATE, записи истории
+        создаются одним запросом INSERT. Повторный вызов с тем же
+        ключом операции token ничего не изменяет и возвращает None,
+        иначе возвращает количество перенесённых списков
+        """
+        lists = self.with_perms(user).filter(can_change=True)
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    operation = MovementListReschedule.objects.create(
+                        token=token,
+                        created_by=user,
+                    )
+            except IntegrityError:
+                return None
+            rows = list(
+                lists.select_for_update(of=("self",)).values_list(
+                    "pk", "scheduled_datetime"
+                )
+            )
+            if not rows:
+                return 0
+            changes = []
+            for pk, old_datetime in rows:
+                if offset is not None:
+                    new_datetime = old_datetime + offset
+                else:
+                    new_datetime = timezone.make_aware(datetime.combine(
+                        datetime_to_current_tz(old_datetime).date(),
+                        time,
+                    ))
+                changes.append((pk, old_datetime, new_datetime))
+            if offset is not None:
+                scheduled_datetime = models.F("scheduled_datetime") + offset
+            else:
+                scheduled_datetime = models.Case(
+                    *[
+                        models.When(pk=pk, then=models.Value(new_datetime))
+                        for pk, _, new_datetime in changes
+                    ],
+                    output_field=models.DateTimeField(),
+                )
+            now = timezone.now()
+            MovementList.objects.filter(pk__in=[row[0] for row in rows])\
+                .update(
+                    scheduled_datetime=scheduled_datetime,
+                    was_modified=True,
+                    last_modified=now,
+                )
+            ChangeLog.objects.bulk_log(
+                user,
+                MovementList,
+                ChangeMeta.UPDATE_ACTION,
+                [
+                    (
+                        pk,
+                        {"scheduled_datetime": old},
+                        {"scheduled_datetime": new},
+                    )
+                    for pk, old, new in changes
+                ],
+            )
+            MovementListHistory.objects.bulk_create([
+                MovementListHistory(
+                    modified_list_id=pk,
+                    modified_by=user,
+                    modified_datetime=now,
+                    prev_delta={"scheduled_datetime": old},
+                    post_delta={"scheduled_datetime": new},
+                )
+                for pk, old, new in changes
+            ])
+            operation.lists_count = len(changes)
+            operation.save(update_fields=["lists_count"])
+        return len(changes)
+
+    def with_perms(self, user):
+        """
+        Добавляет к спискам флаги can_change и can_delete,
+        вычисляемые на стороне базы данных
+        """
+        not_deleted = models.Q(is_deleted=False)
+        can_change = get_perm_q(
+            user,
+            "main.change_movementlist",
+            "main.change_owned_movementlist",
+        )
+        can_delete = get_perm_q(
+            user,
+            "main.delete_movementlist",
+            "main.delete_owned_movementlist",
+        )
+        return self.annotate(
+            can_change=as_boolean(can_change & not_deleted),
+            can_delete=as_boolean(can_delete & not_deleted),
+        )
+
 
+class MovementList(ChangeLogMixin, models.Model):
 
-class MovementList(models.Model):
+    objects = MovementListQuerySet.as_manager()
 
     facility = models.ForeignKey(
         FacilityObject,
@@ -108,8 +234,86 @@ class MovementList(models.Model):
     def get_history_url(self):
         return reverse("movement-list-history", kwargs=self.get_url_kwargs())
 
+    def get_clone_url(self):
+        return reverse("movement-list-clone", kwargs=self.get_url_kwargs())
+
+    def clone(self, scheduled_datetime, list_type, creator):
+        """
+        Создаёт копию списка с новыми датой и типом.
+        Для не удалённых записей списка создаются новые сотрудники
+        и записи, запросы INSERT выполняются пачками
+        """
+        entries = self.movemententry_set.get_not_deleted().filter(
+            employee__isnull=False,
+        )
+        rows = entries.order_by("pk").values(
+            first_name=models.F("employee__first_name"),
+            last_name=models.F("employee__last_name"),
+            patronymic=models.F("employee__patronymic"),
+            position=models.F("employee__position"),
+            is_senior=models.F("employee__is_senior"),
+        )
+        with transaction.atomic():
+            movement_list = MovementList.objects.create(
+                facility=self.facility,
+                list_type=list_type,
+                scheduled_datetime=scheduled_datetime,
+                creator=creator,
+                place=self.place,
+                watch=self.watch,
+            )
+            movement_list.make_history(creator)
+            entries.model.objects.bulk_add(movement_list, creator, rows)
+        return movement_list
+
+    def state_at(self, moment):
+        """
+        Возвращает состояние списка на момент moment,
+        восстановленное по истории изменений
+        """
+        return ChangeLog.objects.state_at(MovementList, self.pk, moment)
+
+    def _get_moved_out_pks(self, moment):
+        """
+        Возвращает записи, перенесённые из списка после moment.
+        Запись, которая была в списке на момент moment, либо
+        находится в нём сейчас, либо была перенесена из него позже,
+        поэтому просматриваются только переносы после moment.
+        Запрос обслуживается индексом changelog_moved_from_idx
+        """
+        return ChangeLog.objects.filter(
+            model=self.movemententry_set.model._meta.label,
+            prev_change__movement_list_id=self.pk,
+            change_datetime__gt=moment,
+        ).values_list("model_pk", flat=True)
+
+    def get_entries_at(self, moment):
+        """
+        Восстанавливает по истории изменений не удалённые записи списка
+        на момент moment, например, чтобы узнать, кто был в списке
+        заезда в 09:00. Возвращает состояния записей в порядке создания,
+        состояние сотрудника записи находится по ключу 'employee'
+        """
+        entry_model = self.movemententry_set.model
+        pks = set(self.movemententry_set.values_list("pk", flat=True))
+        pks.update(self._get_moved_out_pks(moment))
+        states = ChangeLog.objects.states_at(entry_model, pks, moment)
+        entries = [
+            state for _, state in sorted(states.items())
+            if state.get("movement_list_id") == self.pk and
+            not state.get("is_deleted")
+        ]
+        employees = ChangeLog.objects.states_at(
+            Employee,
+            [entry["employee_id"] for entry in entries],
+            moment,
+        )
+        for entry in entries:
+            entry["employee"] = employees.get(entry["employee_id"])
+        return entries
+
     def is_creator(self, user):
-        return self.creator == user
+        return self.creator_id is not None and self.creator_id == user.pk
 
     def has_change_perm(self, user):
         is_creator = self.is_creator(user)
@@ -136,6 +340,24 @@ class MovementList(models.Model):
         verbose_name = "Список заездов/выездов"
         verbose_name_plural = "Списки заездов/выездов"
 
+        indexes = [
+            # Списки объекта, новые первыми
+            models.Index(
+                fields=["facility", "-id"],
+                name="main_mlist_facility_id_idx",
+            ),
+            # Списки объекта с фильтром по типу, новые первыми
+            models.Index(
+                fields=["facility", "list_type", "-id"],
+                name="main_mlist_facility_type_idx",
+            ),
+            # Поиск списков объекта по дате заезда/выезда
+            models.Index(
+                fields=["facility", "scheduled_datetime"],
+                name="main_mlist_facility_date_idx",
+            ),
+        ]
+
         permissions = [
             (
                 "change_owned_movementlist",
@@ -154,6 +376,13 @@ class MovementList(models.Model):
 
 class MovementListHistory(HistoryMixin):
 
+    history_fields = {
+        "scheduled_datetime": "Дата и время",
+        "place": "Место заезда/выезда",
+        "watch": "Вахта",
+    }
+    history_datetime_fields = ("scheduled_datetime",)
+
     modified_list = models.ForeignKey(
         MovementList,
         on_delete=models.CASCADE
@@ -162,3 +391,38 @@ class MovementListHistory(HistoryMixin):
     class Meta:
         verbose_name = "Состояние списка"
         verbose_name_plural = "Состояния списков"
+        indexes = [
+            # История списка, новые изменения первыми
+            models.Index(
+                fields=["modified_list", "-id"],
+                name="main_mlisthist_list_id_idx",
+            ),
+        ]
+
+
+class MovementListReschedule(models.Model):
+    """
+    Групповой перенос списков. Уникальный ключ операции
+    не даёт применить один и тот же перенос повторно,
+    например, при повторной отправке формы
+    """
+
+    token = models.UUIDField("Ключ операции", unique=True)
+    created_by = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name="Кем выполнен"
+    )
+    created_datetime = models.DateTimeField(
+        "Время выполнения",
+        auto_now_add=True
+    )
+    lists_count = models.PositiveIntegerField(
+        "Количество перенесённых списков",
+        default=0
+    )
+
+    class Meta:
+        verbose_name = "Перенос списков"
+        verbose_name_plural = "Переносы списков"
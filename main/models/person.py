@@ -1,6 +1,98 @@
 from django.db import models
 from django.core import serializers
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+
+from .suggestions import Suggestion, normalize_name
+from changelog.mixins import ChangeLogMixin
+
+
+# Конфигурация полнотекстового поиска по ФИО.
+# Используется 'simple', т.к. имена не нужно приводить к основе слова
+NAME_SEARCH_CONFIG = "simple"
+NAME_SEARCH_FIELDS = ("last_name", "first_name", "patronymic")
+
+
+def get_name_search_vector():
+    return SearchVector(*NAME_SEARCH_FIELDS, config=NAME_SEARCH_CONFIG)
+
+
+def update_name_search_vectors(queryset):
+    """
+    Пересчитывает сохранённые поисковые векторы ФИО
+    для всех объектов queryset одним запросом UPDATE
+    """
+    return queryset.update(search_vector=get_name_search_vector())
+
+
+class NameSearchMixin(models.Model):
+    """
+    Хранит поисковый вектор по ФИО, чтобы поиск мог
+    использовать GIN индекс вместо вычисления вектора при запросе.
+    Вектор пересчитывается при сохранении объекта
+    """
+
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and\
+                not set(update_fields) & set(NAME_SEARCH_FIELDS):
+            return
+        update_name_search_vectors(
+            type(self)._default_manager.filter(pk=self.pk)
+        )
+
+    class Meta:
+        abstract = True
+
+
+class SuggestionSourceMixin(models.Model):
+    """
+    Поддерживает частоты подсказок автодополнения:
+    при сохранении новые значения полей учитываются,
+    а заменённые ими значения - вычитаются
+    """
+
+    suggestion_fields = ("first_name", "last_name", "patronymic", "position")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._suggestion_values = instance.get_suggestion_values()
+        return instance
+
+    def get_suggestion_values(self):
+        return {
+            field: getattr(self, field)
+            for field in self.suggestion_fields
+            if field in self.__dict__
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        old_values = getattr(self, "_suggestion_values", {})
+        new_values = self.get_suggestion_values()
+        for field, value in new_values.items():
+            old_value = old_values.get(field)
+            if normalize_name(value or "") == normalize_name(old_value or ""):
+                continue
+            if old_value:
+                Suggestion.objects.discard(field, [old_value])
+            if value:
+                Suggestion.objects.record(field, [value])
+        self._suggestion_values = new_values
+
+    def delete(self, *args, **kwargs):
+        for field, value in self.get_suggestion_values().items():
+            if value:
+                Suggestion.objects.discard(field, [value])
+        return super().delete(*args, **kwargs)
+
+    class Meta:
+        abstract = True
 
 
 # Этот класс существует, т.к. планировалось, что он будет использоваться
@@ -42,12 +134,34 @@ class AbstractPerson(models.Model):
         abstract = True
 
 
-class Employee(AbstractPerson):
+class Employee(
+            SuggestionSourceMixin,
+            NameSearchMixin,
+            ChangeLogMixin,
+            AbstractPerson,
+        ):
+
+    # Производные поля поиска не нужны в истории изменений
+    changelog_exclude = ("search_vector", "search_name")
 
     is_senior = models.BooleanField(
         "Старший",
         default=False,
     )
+    # Нормализованное ФИО для нечёткого поиска по триграммам
+    search_name = models.CharField(
+        max_length=122,
+        editable=False,
+        default="",
+    )
+
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_name(self.full_name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and\
+                set(update_fields) & set(NAME_SEARCH_FIELDS):
+            kwargs["update_fields"] = set(update_fields) | {"search_name"}
+        super().save(*args, **kwargs)
 
     def toJSON(self):
         return serializers.serialize("json", [self])
@@ -55,6 +169,17 @@ class Employee(AbstractPerson):
     class Meta:
         verbose_name = "Сотрудник"
         verbose_name_plural = "Сотрудники"
+        indexes = [
+            GinIndex(
+                fields=["search_vector"],
+                name="main_employee_search_idx",
+            ),
+            GinIndex(
+                fields=["search_name"],
+                name="main_employee_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
         permissions = [
             (
                 "can_set_is_senior",
@@ -63,7 +188,7 @@ class Employee(AbstractPerson):
         ]
 
 
-class User(AbstractUser):
+class User(SuggestionSourceMixin, NameSearchMixin, AbstractUser):
 
     first_name = models.CharField("Имя", max_length=40)
     last_name = models.CharField("Фамилия", max_length=40)
@@ -92,3 +217,12 @@ class User(AbstractUser):
         if self.patronymic:
             initials = initials + self.patronymic[0] + "."
         return initials
+
+    class Meta(AbstractUser.Meta):
+        swappable = "AUTH_USER_MODEL"
+        indexes = [
+            GinIndex(
+                fields=["search_vector"],
+                name="main_user_search_idx",
+            ),
+        ]
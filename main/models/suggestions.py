@@ -0,0 +1,123 @@
+from django.db import models, connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+def normalize_name(value):
+    """
+    Приводит ФИО к виду, в котором оно хранится для нечёткого поиска:
+    нижний регистр, 'ё' заменена на 'е', одиночные пробелы
+    """
+    return " ".join(value.lower().replace("ё", "е").split())
+
+
+class SuggestionManager(models.Manager):
+
+    def _count_values(self, values):
+        counts = {}
+        for value in values:
+            value = " ".join(value.split())
+            normalized = normalize_name(value)
+            if normalized:
+                counts.setdefault(normalized, [value, 0])[1] += 1
+        return counts
+
+    def record(self, field, values):
+        """
+        Увеличивает частоту значений values поля field.
+        Отсутствующие подсказки создаются, существующие обновляются
+        одним запросом INSERT ... ON CONFLICT
+        """
+        counts = self._count_values(values)
+        if not counts:
+            return
+        now = timezone.now()
+        params = []
+        for normalized, (value, frequency) in counts.items():
+            params.extend([field, value, normalized, frequency, now])
+        placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(counts))
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO " + table +
+                " (field, value, normalized, frequency, last_used)"
+                " VALUES " + placeholders +
+                " ON CONFLICT (field, normalized) DO UPDATE SET"
+                " frequency = " + table + ".frequency + EXCLUDED.frequency,"
+                " last_used = EXCLUDED.last_used",
+                params,
+            )
+
+    def discard(self, field, values):
+        """
+        Уменьшает частоту значений values поля field
+        """
+        for normalized, (_, frequency) in self._count_values(values).items():
+            self.filter(field=field, normalized=normalized).update(
+                frequency=Greatest(F("frequency") - frequency, 0)
+            )
+
+    def get_values(self, field, prefix="", limit=100):
+        """
+        Возвращает до limit самых частых значений поля field,
+        начинающихся с prefix
+        """
+        suggestions = self.filter(field=field, frequency__gt=0)
+        prefix = normalize_name(prefix)
+        if prefix:
+            suggestions = suggestions.filter(normalized__startswith=prefix)
+        suggestions = suggestions.order_by("-frequency", "normalized")
+        return list(suggestions.values_list("value", flat=True)[:limit])
+
+
+class Suggestion(models.Model):
+    """
+    Подсказка для автодополнения полей ФИО и должности.
+    Частота значения поддерживается при сохранении
+    сотрудников и пользователей
+    """
+
+    FIELDS = [
+        ("first_name", "Имя"),
+        ("last_name", "Фамилия"),
+        ("patronymic", "Отчество"),
+        ("position", "Должность"),
+    ]
+
+    objects = SuggestionManager()
+
+    field = models.CharField("Поле", max_length=20, choices=FIELDS)
+    value = models.CharField("Значение", max_length=100)
+    normalized = models.CharField(
+        "Нормализованное значение",
+        max_length=100,
+    )
+    frequency = models.PositiveIntegerField("Частота", default=0)
+    last_used = models.DateTimeField("Последнее использование")
+
+    def __str__(self):
+        return self.value
+
+    class Meta:
+        verbose_name = "Подсказка"
+        verbose_name_plural = "Подсказки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["field", "normalized"],
+                name="main_suggestion_unique",
+            ),
+        ]
+        indexes = [
+            # Поиск по префиксу: LIKE 'префикс%' в локали, отличной от C,
+            # использует индекс только с классом операторов *_pattern_ops
+            models.Index(
+                fields=["field", "normalized"],
+                name="main_suggestion_prefix_idx",
+                opclasses=["varchar_pattern_ops", "varchar_pattern_ops"],
+            ),
+            models.Index(
+                fields=["field", "-frequency"],
+                name="main_suggestion_freq_idx",
+            ),
+        ]
@@ -1,6 +1,79 @@
-/* 
+/*
 Файл для глобальных пользовательских скриптов
 Подключается после вендорных скриптов, но перед локальными
 пользовательскими скриптами, которые были подключены расширив
 'base.html' блок 'scripts'
-*/
\ No newline at end of file
+*/
+
+/*
+Автодополнение полей с атрибутом data-autocomplete-url.
+Подсказки запрашиваются у сервера после паузы во вводе
+и подставляются в связанный с полем <datalist>
+*/
+(function () {
+  const AUTOCOMPLETE_DELAY = 250;
+
+  function fillDataList(dataList, suggestions) {
+    dataList.innerHTML = "";
+    suggestions.forEach(function (suggestion) {
+      const option = document.createElement("option");
+      option.value = suggestion;
+      dataList.appendChild(option);
+    });
+  }
+
+  function initAutocomplete(input) {
+    const dataList = document.getElementById(input.getAttribute("list"));
+    const url = input.dataset.autocompleteUrl;
+    const cache = new Map();
+    let timer = null;
+    let controller = null;
+
+    if (!dataList) {
+      return;
+    }
+
+    function load(query) {
+      if (cache.has(query)) {
+        fillDataList(dataList, cache.get(query));
+        return;
+      }
+      if (controller) {
+        controller.abort();
+      }
+      controller = new AbortController();
+      fetch(url + "?q=" + encodeURIComponent(query), {
+        signal: controller.signal,
+        headers: {"Accept": "application/json"},
+      })
+        .then(function (response) {
+          return response.ok ? response.json() : {suggestions: []};
+        })
+        .then(function (data) {
+          cache.set(query, data.suggestions);
+          if (input.value.trim() === query) {
+            fillDataList(dataList, data.suggestions);
+          }
+        })
+        .catch(function () {});
+    }
+
+    input.addEventListener("input", function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        load(input.value.trim());
+      }, AUTOCOMPLETE_DELAY);
+    });
+    input.addEventListener("focus", function () {
+      if (!dataList.options.length) {
+        load(input.value.trim());
+      }
+    });
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    document
+      .querySelectorAll("input[data-autocomplete-url]")
+      .forEach(initAutocomplete);
+  });
+})();
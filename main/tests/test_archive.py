@@ -0,0 +1,149 @@
+import datetime
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from changelog.archive import iter_archive
+from changelog.models import ChangeLog, ChangeLogSnapshot
+from changelog.utils import ChangeMeta
+from ..models import FacilityObject, MovementList, MovementListHistory
+
+
+class ArchiveHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_superuser(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+            place="Порт",
+        )
+        cls.old_datetime = timezone.now() - datetime.timedelta(days=60)
+        created = ChangeLog.objects.bulk_log(
+            cls.user,
+            MovementList,
+            ChangeMeta.CREATE_ACTION,
+            [(cls.movement_list.pk, {}, {
+                "id": cls.movement_list.pk,
+                "place": "Аэропорт",
+            })],
+        )
+        updated = ChangeLog.objects.bulk_log(
+            cls.user,
+            MovementList,
+            ChangeMeta.UPDATE_ACTION,
+            [(cls.movement_list.pk, {"place": "Аэропорт"},
+              {"place": "Порт"})] * 2,
+        )
+        ChangeLog.objects.filter(
+            pk__in=[created[0].pk, updated[0].pk],
+        ).update(change_datetime=cls.old_datetime)
+        MovementListHistory.objects.bulk_create([
+            MovementListHistory(
+                modified_list=cls.movement_list,
+                modified_by=cls.user,
+                modified_datetime=modified_datetime,
+                post_delta={"place": "Порт"},
+            )
+            for modified_datetime in (cls.old_datetime, timezone.now())
+        ])
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.root = Path(media_root.name)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def archive(self):
+        call_command(
+            "archive_history",
+            older_than=30,
+            batch_size=1,
+            stdout=StringIO(),
+        )
+        month = self.old_datetime.astimezone(datetime.timezone.utc)
+        return [
+            self.root / "history-archive" / label / month.strftime(
+                "%Y-%m.jsonl.gz"
+            )
+            for label in ("changelog.changelog", "main.movementlisthistory")
+        ]
+
+    def test_old_rows_are_archived(self):
+        changelog_path, history_path = self.archive()
+        self.assertEqual(ChangeLog.objects.count(), 1)
+        self.assertEqual(MovementListHistory.objects.count(), 1)
+        records = list(iter_archive(changelog_path))
+        self.assertEqual(len(records), 2)
+        model, fields = records[0]
+        self.assertIs(model, ChangeLog)
+        self.assertEqual(fields["actor_id"], self.user.pk)
+        self.assertEqual(fields["changed_by"], [self.user.pk])
+        self.assertEqual(len(list(iter_archive(history_path))), 1)
+
+    def test_state_survives_archive(self):
+        moment = timezone.now() - datetime.timedelta(days=10)
+        self.assertEqual(self.movement_list.state_at(moment)["place"], "Порт")
+        self.archive()
+        snapshot = ChangeLogSnapshot.objects.get(
+            model="main.MovementList",
+            model_pk=self.movement_list.pk,
+        )
+        self.assertLess(snapshot.snapshot_datetime, moment)
+        # Момент между границей архива и его созданием
+        self.assertEqual(self.movement_list.state_at(moment)["place"], "Порт")
+        state = self.movement_list.state_at(timezone.now())
+        self.assertEqual(state["place"], "Порт")
+        self.assertIsNone(
+            self.movement_list.state_at(
+                self.old_datetime - datetime.timedelta(days=1)
+            )
+        )
+
+    def test_covered_objects_are_not_snapshotted_again(self):
+        # Снимок после последнего архивируемого изменения уже покрывает
+        # все моменты до границы архива
+        ChangeLogSnapshot.objects.take_at(
+            MovementList,
+            [self.movement_list.pk],
+            self.old_datetime + datetime.timedelta(days=1),
+        )
+        self.archive()
+        self.assertEqual(ChangeLogSnapshot.objects.count(), 1)
+        moment = timezone.now() - datetime.timedelta(days=10)
+        self.assertEqual(self.movement_list.state_at(moment)["place"], "Порт")
+
+    def test_archive_is_restored(self):
+        archived = set(
+            ChangeLog.objects.filter(change_datetime=self.old_datetime)
+            .values_list("pk", flat=True)
+        )
+        paths = self.archive()
+        for _ in range(2):
+            call_command(
+                "restore_history",
+                *[str(path) for path in paths],
+                stdout=StringIO(),
+            )
+        logs = ChangeLog.objects.filter(pk__in=archived)
+        self.assertEqual(len(logs), 2)
+        for log in logs:
+            self.assertEqual(log.change_datetime, self.old_datetime)
+            self.assertEqual(log.actor_id, self.user.pk)
+            self.assertEqual(list(log.changed_by.all()), [self.user])
+        self.assertEqual(MovementListHistory.objects.count(), 2)
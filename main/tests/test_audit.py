@@ -0,0 +1,120 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from changelog.models import ChangeLog
+from changelog.utils import ChangeMeta
+from ..models import MovementList, MovementEntry
+from ..views.audit import AuditLog
+
+
+class AuditLogTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user_model = get_user_model()
+        cls.admin = user_model.objects.create_superuser(
+            username="admin",
+            password="adminpwd",
+        )
+        cls.reviewer = user_model.objects.create_user(
+            username="reviewer",
+            password="reviewerpwd",
+        )
+        cls.author = user_model.objects.create_user(
+            username="author",
+            password="authorpwd",
+        )
+        ChangeLog.objects.bulk_log(
+            cls.author,
+            MovementList,
+            ChangeMeta.UPDATE_ACTION,
+            [(pk, {}, {"place": "Порт"}) for pk in range(1, 6)],
+        )
+        ChangeLog.objects.bulk_log(
+            cls.admin,
+            MovementEntry,
+            ChangeMeta.DELETE_ACTION,
+            [(pk, {}, {"is_deleted": True}) for pk in range(1, 4)],
+        )
+        old = ChangeLog.objects.bulk_log(
+            cls.admin,
+            MovementList,
+            ChangeMeta.CREATE_ACTION,
+            [(pk, {}, {"id": pk}) for pk in range(1, 3)],
+        )
+        ChangeLog.objects.filter(pk__in=[log.pk for log in old]).update(
+            change_datetime=timezone.now() - datetime.timedelta(days=30)
+        )
+
+    def get_json(self, **params):
+        response = self.client.get(reverse("audit-log-json"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_permission_is_required(self):
+        self.client.force_login(self.reviewer)
+        response = self.client.get(reverse("audit-log-json"))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse("audit-log"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_actor_is_denormalized(self):
+        logs = ChangeLog.objects.filter(model="main.MovementEntry")
+        self.assertEqual(
+            {log.actor_id for log in logs},
+            {self.admin.pk},
+        )
+
+    def test_filters(self):
+        self.client.force_login(self.admin)
+        data = self.get_json(actor=self.author.pk)
+        self.assertEqual(len(data["results"]), 5)
+        self.assertEqual(
+            {log["actor"] for log in data["results"]},
+            {"author"},
+        )
+        data = self.get_json(action=ChangeMeta.DELETE_ACTION)
+        self.assertEqual(len(data["results"]), 3)
+        data = self.get_json(model="main.MovementList")
+        self.assertEqual(len(data["results"]), 7)
+        week_ago = timezone.localdate() - datetime.timedelta(days=7)
+        data = self.get_json(date_from=week_ago.isoformat())
+        self.assertEqual(len(data["results"]), 8)
+        data = self.get_json(date_to=week_ago.isoformat())
+        self.assertEqual(len(data["results"]), 2)
+
+    def test_invalid_filters(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse("audit-log-json"),
+            {"action": "DROP"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("action", response.json()["errors"])
+
+    @mock.patch.object(AuditLog, "paginate_by", 3)
+    def test_cursor_pagination(self):
+        self.client.force_login(self.admin)
+        url = reverse("audit-log")
+        seen = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            seen.extend(log.pk for log in page)
+            if not page.has_next():
+                break
+            response = self.client.get(url, {"cursor": page.next_cursor})
+        expected = ChangeLog.objects.order_by("-change_datetime", "-pk")
+        self.assertEqual(seen, list(expected.values_list("pk", flat=True)))
+
+    def test_page_queries(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("audit-log"))
+        with self.assertNumQueries(5):
+            self.client.get(reverse("audit-log"))
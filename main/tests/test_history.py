@@ -0,0 +1,58 @@
+import importlib
+
+from django.core import serializers
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from ..models import Employee, MovementList, MovementListHistory
+
+
+migration = importlib.import_module("main.migrations.0029_auto_20261018_0814")
+
+
+class HistoryDeltaMigrationTests(SimpleTestCase):
+
+    def test_list_xml_is_converted(self):
+        scheduled = timezone.now().replace(microsecond=0)
+        prev = serializers.serialize(
+            "xml",
+            [MovementList(pk=1, scheduled_datetime=scheduled)],
+            fields=("scheduled_datetime",),
+        )
+        post = serializers.serialize(
+            "xml",
+            [MovementList(pk=1, scheduled_datetime=scheduled, place="Порт")],
+            fields=("scheduled_datetime", "place"),
+        )
+        prev_delta, post_delta = migration.get_delta(
+            migration.parse_list_xml(prev),
+            migration.parse_list_xml(post),
+        )
+        self.assertEqual(prev_delta, {"place": None})
+        self.assertEqual(post_delta, {"place": "Порт"})
+        history = MovementListHistory(
+            prev_delta=migration.parse_list_xml(prev),
+        )
+        self.assertEqual(
+            history.get_change_states()["prev_state"]["scheduled_datetime"],
+            scheduled,
+        )
+
+    def test_entry_json_is_converted(self):
+        prev = Employee(pk=1, first_name="Пётр", last_name="Орлов").toJSON()
+        post = Employee(
+            pk=1,
+            first_name="Пётр",
+            last_name="Орлов",
+            position="Водитель",
+            is_senior=True,
+        ).toJSON()
+        prev_delta, post_delta = migration.get_delta(
+            migration.parse_entry_json(prev),
+            migration.parse_entry_json(post),
+        )
+        self.assertEqual(prev_delta, {"position": "", "is_senior": False})
+        self.assertEqual(
+            post_delta,
+            {"position": "Водитель", "is_senior": True},
+        )
@@ -2,6 +2,7 @@ from django.urls import reverse
 from django.test import TestCase
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
 
 from ..models import FacilityObject, Employee, MovementList, MovementEntry
 from ..utils import datetime_to_current_tz
@@ -345,3 +346,99 @@ class MovementEntryModelTests(TestCase):
             type(url_kwargs["entry_id"]),
             int,
         )
+
+
+class PermissionAnnotationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.owner = get_user_model().objects.create_user(
+            username="owner",
+            password="ownerpwd",
+        )
+        cls.owner.user_permissions.set(Permission.objects.filter(
+            codename__in=[
+                "change_owned_movementlist",
+                "change_owned_movemententry",
+            ]
+        ))
+        cls.manager = get_user_model().objects.create_user(
+            username="manager",
+            password="managerpwd",
+        )
+        cls.manager.user_permissions.set(Permission.objects.filter(
+            codename__in=["change_movementlist", "delete_movemententry"]
+        ))
+        cls.stranger = get_user_model().objects.create_user(
+            username="stranger",
+            password="strangerpwd",
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+            creator=cls.owner,
+        )
+        cls.deleted_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+            creator=cls.owner,
+            is_deleted=True,
+        )
+        cls.entry = MovementEntry.objects.create(
+            movement_list=cls.movement_list,
+            creator=cls.owner,
+            employee=Employee.objects.create(
+                first_name="Пётр",
+                last_name="Орлов",
+            ),
+        )
+
+    def get_list_flags(self, user, movement_list):
+        user = get_user_model().objects.get(pk=user.pk)
+        obj = MovementList.objects.with_perms(user).get(pk=movement_list.pk)
+        return obj.can_change, obj.can_delete
+
+    def get_entry_flags(self, user):
+        user = get_user_model().objects.get(pk=user.pk)
+        obj = MovementEntry.objects.with_perms(user).get(pk=self.entry.pk)
+        return obj.can_change, obj.can_delete
+
+    def test_owner_with_owned_perm_can_change_list(self):
+        flags = self.get_list_flags(self.owner, self.movement_list)
+        self.assertEqual(flags, (True, False))
+
+    def test_global_perm_applies_to_foreign_list(self):
+        flags = self.get_list_flags(self.manager, self.movement_list)
+        self.assertEqual(flags, (True, False))
+
+    def test_user_without_perms_cannot_change_list(self):
+        flags = self.get_list_flags(self.stranger, self.movement_list)
+        self.assertEqual(flags, (False, False))
+
+    def test_deleted_list_cannot_be_changed(self):
+        flags = self.get_list_flags(self.owner, self.deleted_list)
+        self.assertEqual(flags, (False, False))
+
+    def test_entry_flags(self):
+        self.assertEqual(self.get_entry_flags(self.owner), (True, False))
+        self.assertEqual(self.get_entry_flags(self.manager), (False, True))
+        self.assertEqual(self.get_entry_flags(self.stranger), (False, False))
+
+    def test_entry_of_deleted_list_cannot_be_changed(self):
+        MovementList.objects.filter(pk=self.movement_list.pk).update(
+            is_deleted=True
+        )
+        self.assertEqual(self.get_entry_flags(self.owner), (False, False))
+
+    def test_flags_do_not_load_creator(self):
+        user = get_user_model().objects.get(pk=self.owner.pk)
+        user.get_all_permissions()
+        with self.assertNumQueries(1):
+            obj = MovementList.objects.with_perms(user).get(
+                pk=self.movement_list.pk
+            )
+            self.assertTrue(obj.can_change)
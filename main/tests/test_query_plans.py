@@ -0,0 +1,135 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery
+
+from ..models import FacilityObject, Employee, MovementList, MovementEntry,\
+    Suggestion, NAME_SEARCH_CONFIG
+from ..utils import get_datetime_range
+
+
+class IndexUsageTestMixin:
+    """
+    Проверяет через EXPLAIN, что планировщик PostgreSQL
+    использует индексы для основных запросов.
+    Последовательное сканирование отключается, т.к. на небольшом
+    наборе данных оно всегда дешевле чтения индекса
+    """
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+
+class MainIndexesTests(IndexUsageTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facilities = FacilityObject.objects.bulk_create([
+            FacilityObject(name="Объект %s" % i, slug="facility-%s" % i)
+            for i in range(20)
+        ])
+        cls.facility = facilities[0]
+        creator = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+        lists = MovementList.objects.bulk_create([
+            MovementList(
+                facility=facility,
+                list_type=list_type,
+                scheduled_datetime=timezone.now() - datetime.timedelta(
+                    days=day
+                ),
+                creator=creator,
+            )
+            for facility in facilities
+            for list_type in [MovementList.ARRIVING, MovementList.LEAVING]
+            for day in range(250)
+        ])
+        cls.movement_list = lists[0]
+        employees = Employee.objects.bulk_create([
+            Employee(first_name="Пётр", last_name="Орлов")
+            for _ in range(1000)
+        ])
+        MovementEntry.objects.bulk_create([
+            MovementEntry(
+                movement_list=lists[i % 20],
+                employee=employee,
+                creator=creator,
+                is_deleted=i % 3 == 0,
+            )
+            for i, employee in enumerate(employees)
+        ])
+        Suggestion.objects.bulk_create([
+            Suggestion(
+                field=field,
+                value="Значение %s" % i,
+                normalized="значение %s" % i,
+                frequency=i,
+                last_used=timezone.now(),
+            )
+            for field in ["first_name", "last_name"]
+            for i in range(1000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE main_suggestion")
+            cursor.execute("ANALYZE main_movementlist")
+            cursor.execute("ANALYZE main_movemententry")
+
+    def test_facility_lists(self):
+        queryset = self.facility.movementlist_set.order_by("-pk")[:10]
+        self.assertUsesIndex(queryset, "main_mlist_facility_id_idx")
+
+    def test_facility_lists_by_type(self):
+        queryset = self.facility.movementlist_set.filter(
+            list_type=MovementList.LEAVING
+        ).order_by("-pk")[:10]
+        self.assertUsesIndex(queryset, "main_mlist_facility_type_idx")
+
+    def test_facility_lists_by_date(self):
+        start, end = get_datetime_range(
+            datetime.date.today(),
+            datetime.date.today(),
+        )
+        queryset = self.facility.movementlist_set.filter(
+            scheduled_datetime__gte=start,
+            scheduled_datetime__lt=end,
+        ).order_by("-pk")
+        self.assertUsesIndex(queryset, "main_mlist_facility_date_idx")
+
+    def test_employee_name_search(self):
+        queryset = Employee.objects.filter(
+            search_vector=SearchQuery("Орлов", config=NAME_SEARCH_CONFIG)
+        )
+        self.assertUsesIndex(queryset, "main_employee_search_idx")
+
+    def test_employee_trigram_search(self):
+        queryset = Employee.objects.filter(
+            search_name__trigram_word_similar="орлов"
+        )
+        self.assertUsesIndex(queryset, "main_employee_trgm_idx")
+
+    def test_suggestion_prefix(self):
+        queryset = Suggestion.objects.filter(
+            field="last_name",
+            normalized__startswith="орл",
+        )
+        self.assertUsesIndex(queryset, "main_suggestion_prefix_idx")
+
+    def test_not_deleted_entries(self):
+        queryset = self.movement_list.movemententry_set.filter(
+            is_deleted=False
+        ).order_by("-pk")
+        self.assertUsesIndex(queryset, "main_mentry_not_deleted_idx")
+
+    def test_entries_moved_out_of_list(self):
+        queryset = self.movement_list._get_moved_out_pks(
+            timezone.now() - datetime.timedelta(days=1)
+        )
+        self.assertUsesIndex(queryset, "changelog_moved_from_idx")
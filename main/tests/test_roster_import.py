@@ -0,0 +1,221 @@
+import io
+import os
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+
+from ..models import FacilityObject, MovementList
+from ..utils.roster import import_roster, RosterFormatError
+
+
+class RosterImportTestMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+            creator=cls.user,
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = Path(media_root)
+
+    def get_names(self):
+        entries = self.movement_list.movemententry_set.order_by("pk")
+        return [entry.employee.full_name for entry in entries]
+
+
+class RosterImportTests(RosterImportTestMixin, TestCase):
+
+    def import_csv(self, content, **kwargs):
+        return import_roster(
+            self.movement_list,
+            self.user,
+            io.BytesIO(content.encode("utf-8-sig")),
+            "roster.csv",
+            **kwargs
+        )
+
+    def test_csv_with_headers(self):
+        imported, rejected, report = self.import_csv(
+            "Должность;Фамилия;Имя\n"
+            "Водитель;Орлов;Пётр\n"
+            ";Соколов;Иван\n",
+        )
+        self.assertEqual((imported, rejected, report), (2, 0, None))
+        self.assertEqual(self.get_names(), ["Орлов Пётр", "Соколов Иван"])
+        self.assertEqual(
+            self.movement_list.movemententry_set.order_by("pk")[0]
+            .employee.position,
+            "Водитель",
+        )
+        self.assertFalse(any((self.media_root / "imports").iterdir()))
+
+    def test_rejected_rows_report(self):
+        rows = ["Орлов,Пётр%s" % chr(ord("а") + i) for i in range(5)]
+        rows.insert(2, "Соколов,И")
+        imported, rejected, report = self.import_csv(
+            "\n".join(rows), batch_size=2
+        )
+        self.assertEqual((imported, rejected), (5, 1))
+        self.assertEqual(len(self.get_names()), 5)
+        content = (self.media_root / report).read_text("utf-8-sig")
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('3,"Имя сотрудника:'))
+        self.assertTrue(lines[1].endswith(",Соколов,И"))
+
+    def test_old_reports_are_removed(self):
+        reports_dir = self.media_root / "imports"
+        reports_dir.mkdir()
+        old_report = reports_dir / "rejected-0-20260101-000000-000000.csv"
+        new_report = reports_dir / "rejected-0-20260102-000000-000000.csv"
+        for path in (old_report, new_report):
+            path.write_text("Соколов,И", "utf-8")
+        old_time = time.time() - 25 * 60 * 60
+        os.utime(old_report, (old_time, old_time))
+        self.import_csv("Орлов,Пётр")
+        self.assertEqual(list(reports_dir.iterdir()), [new_report])
+        out = io.StringIO()
+        call_command("prune_import_reports", older_than=0, stdout=out)
+        self.assertIn("1 reports removed", out.getvalue())
+        self.assertFalse(any(reports_dir.iterdir()))
+
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        worksheet = workbook.active
+        worksheet.append(["Орлов", "Пётр", None, "Водитель"])
+        worksheet.append([None, None, None, None])
+        worksheet.append(["Соколов", "Иван", "Ильич", None])
+        content = io.BytesIO()
+        workbook.save(content)
+        content.seek(0)
+        imported, rejected, _ = import_roster(
+            self.movement_list, self.user, content, "roster.xlsx"
+        )
+        self.assertEqual((imported, rejected), (2, 0))
+        self.assertEqual(
+            self.get_names(),
+            ["Орлов Пётр", "Соколов Иван Ильич"],
+        )
+
+    def test_unsupported_file(self):
+        with self.assertRaises(RosterFormatError):
+            import_roster(
+                self.movement_list, self.user, io.BytesIO(), "roster.txt"
+            )
+
+    def test_command(self):
+        path = self.media_root / "roster.csv"
+        path.write_text("Орлов\tПётр\nСоколов\tИван\n", "utf-8")
+        out = io.StringIO()
+        call_command(
+            "import_roster",
+            self.movement_list.pk,
+            str(path),
+            "--batch-size=1",
+            "--creator=user1",
+            stdout=out,
+        )
+        self.assertIn("2 rows imported", out.getvalue())
+        self.assertEqual(self.get_names(), ["Орлов Пётр", "Соколов Иван"])
+        self.assertEqual(
+            set(
+                self.movement_list.movemententry_set.values_list(
+                    "creator", flat=True
+                )
+            ),
+            {self.user.pk},
+        )
+
+
+class RosterImportViewTests(RosterImportTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user.user_permissions.set(
+            Permission.objects.filter(codename="add_movemententry")
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse(
+            "movement-list-entries-import",
+            kwargs=self.movement_list.get_url_kwargs(),
+        )
+
+    def test_upload_with_rejected_rows(self):
+        roster_file = SimpleUploadedFile(
+            "roster.csv",
+            "Орлов;Пётр\nСоколов;И\n".encode("utf-8"),
+        )
+        response = self.client.post(
+            self.url, {"roster_file": roster_file}, follow=True
+        )
+        self.assertEqual(self.get_names(), ["Орлов Пётр"])
+        self.assertContains(response, "Импортировано записей: 1")
+        report_url = [
+            str(message) for message in response.context["messages"]
+        ][1].split('href="')[1].split('"')[0]
+        response = self.client.get(report_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "Соколов",
+            b"".join(response.streaming_content).decode("utf-8-sig"),
+        )
+
+    def test_report_of_other_list_is_not_served(self):
+        url = reverse(
+            "movement-list-entries-import-report",
+            kwargs={
+                **self.movement_list.get_url_kwargs(),
+                "report": "rejected-0-20260101.csv",
+            },
+        )
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_expired_report_is_not_served(self):
+        reports_dir = self.media_root / "imports"
+        reports_dir.mkdir()
+        report = "rejected-%s-20260101.csv" % self.movement_list.pk
+        path = reports_dir / report
+        path.write_text("Соколов,И", "utf-8")
+        old_time = time.time() - 25 * 60 * 60
+        os.utime(path, (old_time, old_time))
+        url = reverse(
+            "movement-list-entries-import-report",
+            kwargs={**self.movement_list.get_url_kwargs(), "report": report},
+        )
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_wrong_extension(self):
+        roster_file = SimpleUploadedFile("roster.txt", b"")
+        response = self.client.post(self.url, {"roster_file": roster_file})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors["roster_file"])
@@ -0,0 +1,156 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.transaction import TransactionManagementError
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from ..models import FacilityObject, Employee, MovementList, MovementEntry
+from ..utils.trigram import set_word_similarity_threshold
+
+
+class NameSearchVectorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.creator = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+            first_name="Александр",
+            last_name="Бобров",
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+            creator=cls.creator,
+        )
+        cls.entry = MovementEntry.objects.create(
+            movement_list=cls.movement_list,
+            creator=cls.creator,
+            employee=Employee.objects.create(
+                first_name="Пётр",
+                last_name="Орлов",
+                patronymic="Ваганович",
+            ),
+        )
+
+    def search(self, search_request, predicat):
+        response = self.client.get(self.movement_list.get_absolute_url(), {
+            "search_request": search_request,
+            "predicat": predicat,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [row["obj"] for row in response.context["entries"]]
+
+    def test_vector_is_stored_on_save(self):
+        employee = Employee.objects.get(pk=self.entry.employee_id)
+        self.assertIsNotNone(employee.search_vector)
+
+    def test_vector_is_updated_on_name_change(self):
+        employee = self.entry.employee
+        employee.last_name = "Соколов"
+        employee.save()
+        self.assertEqual(self.search("Соколов", "EMPLOYEES"), [self.entry])
+        self.assertEqual(self.search("Орлов", "EMPLOYEES"), [])
+
+    def test_search_by_employee(self):
+        self.assertEqual(
+            self.search("орлов пётр", "EMPLOYEES"),
+            [self.entry],
+        )
+        self.assertEqual(self.search("Бобров", "EMPLOYEES"), [])
+
+    def test_search_by_creator(self):
+        self.assertEqual(self.search("Бобров", "USERS"), [self.entry])
+
+    def test_backfill_command(self):
+        Employee.objects.update(search_vector=None)
+        get_user_model().objects.update(search_vector=None)
+        out = StringIO()
+        call_command("backfill_search_vectors", batch_size=1, stdout=out)
+        self.assertFalse(
+            Employee.objects.filter(search_vector__isnull=True).exists()
+        )
+        self.assertFalse(
+            get_user_model().objects.filter(
+                search_vector__isnull=True
+            ).exists()
+        )
+        self.assertEqual(self.search("Орлов", "EMPLOYEES"), [self.entry])
+
+
+class EmployeeTrigramSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        other_facility = FacilityObject.objects.create(
+            name="Другой объект",
+            slug="other-facility"
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+        )
+        other_list = MovementList.objects.create(
+            facility=other_facility,
+            scheduled_datetime=timezone.now(),
+        )
+        names = [
+            (cls.movement_list, "Орлов", "Пётр", False),
+            (cls.movement_list, "Орлова", "Анна", False),
+            (cls.movement_list, "Соколов", "Иван", False),
+            (cls.movement_list, "Орлов", "Семён", True),
+            (other_list, "Орлов", "Пётр", False),
+        ]
+        cls.entries = [
+            MovementEntry.objects.create(
+                movement_list=movement_list,
+                is_deleted=is_deleted,
+                employee=Employee.objects.create(
+                    last_name=last_name,
+                    first_name=first_name,
+                ),
+            )
+            for movement_list, last_name, first_name, is_deleted in names
+        ]
+
+    def search(self, query):
+        response = self.client.get(
+            reverse("employee-search", args=[self.facility.slug]),
+            {"q": query},
+        )
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["entries"])
+
+    def test_search_name_is_normalized(self):
+        self.assertEqual(self.entries[0].employee.search_name, "орлов петр")
+
+    def test_search_tolerates_typos(self):
+        self.assertEqual(self.search("Арлов")[0], self.entries[0])
+        self.assertEqual(self.search("орлов петр")[0], self.entries[0])
+        self.assertEqual(self.search("ОРЛОВ ПЁТР")[0], self.entries[0])
+
+    def test_search_is_limited_to_facility(self):
+        entries = self.search("Орлов")
+        self.assertEqual(entries, [self.entries[0], self.entries[1]])
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(""), [])
+
+    def test_threshold_requires_transaction(self):
+        # Вне транзакции порог сбросился бы до выполнения поиска
+        with mock.patch.object(connection, "in_atomic_block", False):
+            with self.assertRaises(TransactionManagementError):
+                set_word_similarity_threshold(0.4)
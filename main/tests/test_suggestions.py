@@ -0,0 +1,128 @@
+from django.test import TestCase, SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from ..models import FacilityObject, Employee, MovementList, MovementEntry,\
+    Suggestion
+from ..widgets import ListTextWidget
+
+
+class SuggestionTests(TestCase):
+
+    def get_frequencies(self, field):
+        return dict(
+            Suggestion.objects.filter(field=field).values_list(
+                "value", "frequency"
+            )
+        )
+
+    def test_values_are_recorded_on_create(self):
+        Employee.objects.create(first_name="Пётр", last_name="Орлов")
+        Employee.objects.create(first_name="пётр", last_name="Соколов")
+        self.assertEqual(self.get_frequencies("first_name"), {"Пётр": 2})
+        self.assertEqual(
+            self.get_frequencies("last_name"),
+            {"Орлов": 1, "Соколов": 1},
+        )
+        self.assertEqual(self.get_frequencies("patronymic"), {})
+
+    def test_changed_values_are_replaced(self):
+        employee = Employee.objects.create(
+            first_name="Пётр",
+            last_name="Орлов",
+        )
+        employee = Employee.objects.get(pk=employee.pk)
+        employee.last_name = "Соколов"
+        employee.save()
+        self.assertEqual(
+            self.get_frequencies("last_name"),
+            {"Орлов": 0, "Соколов": 1},
+        )
+        self.assertEqual(self.get_frequencies("first_name"), {"Пётр": 1})
+
+    def test_user_values_are_recorded(self):
+        get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+            first_name="Александр",
+            last_name="Бобров",
+        )
+        self.assertEqual(self.get_frequencies("last_name"), {"Бобров": 1})
+
+    def test_suggestions_by_prefix_and_frequency(self):
+        for last_name in ["Орлов", "Орлова", "Орлова", "Соколов"]:
+            Employee.objects.create(first_name="Анна", last_name=last_name)
+        get_values = MovementEntry.objects.get_autocomplete_suggestions
+        self.assertEqual(
+            get_values("last_name"),
+            ["Орлова", "Орлов", "Соколов"],
+        )
+        self.assertEqual(get_values("last_name", "ОРЛ"), ["Орлова", "Орлов"])
+        self.assertEqual(get_values("last_name", limit=1), ["Орлова"])
+
+
+class SuggestionViewsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=facility,
+            scheduled_datetime=timezone.now(),
+        )
+        MovementEntry.objects.create(
+            movement_list=cls.movement_list,
+            employee=Employee.objects.create(
+                first_name="Пётр",
+                last_name="Орлов",
+            ),
+        )
+
+    def get_autocomplete(self, field, query):
+        return self.client.get(
+            reverse("autocomplete-suggestions", args=["test-facility", field]),
+            {"q": query},
+        )
+
+    def test_autocomplete_by_prefix(self):
+        response = self.get_autocomplete("last_name", "ор")
+        self.assertEqual(response.json(), {"suggestions": ["Орлов"]})
+        self.assertIn("max-age=300", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+        self.assertNotIn("public", response["Cache-Control"])
+        response = self.get_autocomplete("first_name", "ор")
+        self.assertEqual(response.json(), {"suggestions": []})
+
+    def test_autocomplete_unknown_facility(self):
+        response = self.client.get(
+            reverse("autocomplete-suggestions", args=["unknown", "last_name"]),
+            {"q": "ор"},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_autocomplete_unknown_field(self):
+        response = self.get_autocomplete("password", "")
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages_do_not_embed_suggestions(self):
+        response = self.client.get(self.movement_list.get_absolute_url())
+        self.assertContains(
+            response,
+            'data-autocomplete-url="%s"' % reverse(
+                "autocomplete-suggestions",
+                args=["test-facility", "last_name"],
+            ),
+        )
+        self.assertNotContains(response, "Пётр")
+
+
+class ListTextWidgetTests(SimpleTestCase):
+
+    def test_options_are_escaped(self):
+        widget = ListTextWidget(data_list=['"><script>'], name="test")
+        html = widget.render("test", "")
+        self.assertIn('<option value="&quot;&gt;&lt;script&gt;">', html)
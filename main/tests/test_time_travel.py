@@ -0,0 +1,157 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from changelog.models import ChangeLog, ChangeLogSnapshot
+from changelog.utils import ChangeMeta
+from changelog.tests.utils import run_commit_hooks
+from ..models import FacilityObject, Employee, MovementList, MovementEntry
+
+
+class PointInTimeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_superuser(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.movement_list, cls.other_list = [
+            MovementList.objects.create(
+                facility=cls.facility,
+                scheduled_datetime=timezone.now(),
+            )
+            for _ in range(2)
+        ]
+
+    def get_names(self, moment):
+        return [
+            entry["employee"]["last_name"]
+            for entry in self.movement_list.get_entries_at(moment)
+        ]
+
+    def fill_history(self):
+        """
+        Добавляет записи, удаляет и переносит часть из них и изменяет
+        фамилию сотрудника. Возвращает моменты после каждого шага
+        """
+        moments = [timezone.now()]
+        entries = MovementEntry.objects.bulk_add(
+            self.movement_list,
+            self.user,
+            [
+                {"first_name": "Пётр", "last_name": "Орлов"},
+                {"first_name": "Иван", "last_name": "Соколов"},
+                {"first_name": "Семён", "last_name": "Бобров"},
+            ],
+        )
+        moments.append(timezone.now())
+        MovementEntry.objects.bulk_delete(self.user, [entries[2].pk])
+        MovementEntry.objects.bulk_move(
+            self.user,
+            [entries[1].pk],
+            self.other_list,
+        )
+        moments.append(timezone.now())
+        employee = Employee.objects.get(pk=entries[0].employee_id)
+        employee.last_name = "Орлов-Петров"
+        employee.save()
+        employee.make_history(self.user, ChangeMeta.UPDATE_ACTION)
+        run_commit_hooks()
+        moments.append(timezone.now())
+        return moments
+
+    def test_entries_are_reconstructed(self):
+        before, added, changed, renamed = self.fill_history()
+        self.assertEqual(self.get_names(before), [])
+        self.assertEqual(self.get_names(added), ["Орлов", "Соколов", "Бобров"])
+        self.assertEqual(self.get_names(changed), ["Орлов"])
+        self.assertEqual(self.get_names(renamed), ["Орлов-Петров"])
+        self.assertEqual(
+            [
+                entry["employee"]["last_name"]
+                for entry in self.other_list.get_entries_at(renamed)
+            ],
+            ["Соколов"],
+        )
+
+    def test_reconstruction_starts_from_snapshot(self):
+        renamed = self.fill_history()[-1]
+        call_command("snapshot_changelog", delay=0, stdout=StringIO())
+        ChangeLogSnapshot.objects.update(snapshot_datetime=renamed)
+        # Изменения до снимка больше не нужны для восстановления
+        ChangeLog.objects.all().delete()
+        now = timezone.now()
+        self.assertEqual(self.get_names(now), ["Орлов-Петров"])
+        state = self.movement_list.state_at(now)
+        self.assertEqual(state["id"], self.movement_list.pk)
+        self.assertIsInstance(state["scheduled_datetime"], datetime.datetime)
+
+    def test_snapshot_saves_only_changed_objects(self):
+        call_command("snapshot_changelog", delay=0, stdout=StringIO())
+        initial = ChangeLogSnapshot.objects.count()
+        self.movement_list.place = "Порт"
+        self.movement_list.save()
+        self.movement_list.make_history(self.user, ChangeMeta.UPDATE_ACTION)
+        run_commit_hooks()
+        call_command("snapshot_changelog", delay=0, stdout=StringIO())
+        self.assertEqual(ChangeLogSnapshot.objects.count(), initial + 1)
+
+    def test_snapshot_includes_changes_in_flight(self):
+        self.movement_list.make_history(self.user, ChangeMeta.CREATE_ACTION)
+        run_commit_hooks()
+        ChangeLog.objects.update(
+            change_datetime=timezone.now() - datetime.timedelta(hours=2)
+        )
+        self.movement_list.place = "Порт"
+        self.movement_list.make_history(self.user, ChangeMeta.UPDATE_ACTION)
+        # Снимок читает состояние до фиксации изменения другой
+        # транзакцией, а запись журнала о нём датирована раньше снимка
+        call_command("snapshot_changelog", stdout=StringIO())
+        self.movement_list.save()
+        run_commit_hooks()
+        snapshot = ChangeLogSnapshot.objects.get(
+            model="main.MovementList",
+            model_pk=self.movement_list.pk,
+        )
+        log = ChangeLog.objects.get(action=ChangeMeta.UPDATE_ACTION)
+        self.assertLess(snapshot.snapshot_datetime, log.change_datetime)
+        self.assertEqual(snapshot.state["place"], "")
+        state = self.movement_list.state_at(timezone.now())
+        self.assertEqual(state["place"], "Порт")
+
+    def test_list_edit_is_logged(self):
+        self.client.force_login(self.user)
+        moment = timezone.now()
+        self.client.post(
+            reverse(
+                "movement-list-edit",
+                kwargs=self.movement_list.get_url_kwargs(),
+            ),
+            {
+                "move_date": "2030-03-14",
+                "move_time": "09:00",
+                "place": "Аэропорт",
+                "watch": "",
+            },
+        )
+        run_commit_hooks()
+        logs = ChangeLog.objects.get_model_changelogs(
+            MovementList,
+            self.movement_list.pk,
+        )
+        self.assertEqual(
+            [log.post_change.get("place") for log in logs],
+            ["Аэропорт"],
+        )
+        self.assertIn("scheduled_datetime", logs[0].post_change)
+        self.assertGreater(logs[0].change_datetime, moment)
@@ -0,0 +1,1228 @@
+import os
+import time
+import uuid
+import tempfile
+import datetime
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import pytz
+from django.conf import settings
+from django.db import connection
+from django.core.management import call_command
+from django.urls import reverse, resolve
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+
+from changelog.models import ChangeLog
+from changelog.utils import ChangeMeta
+from ..models import FacilityObject, Employee, MovementList, MovementEntry,\
+    MovementListHistory, MovementEntryHistory
+from ..utils import datetime_to_current_tz
+
+
+class MovementListsViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.creator = get_user_model().objects.create_user(
+            username="user1",
+            email="user1@mail.com",
+            password="user1pwd",
+        )
+        MovementList.objects.bulk_create([
+            MovementList(
+                facility=cls.facility,
+                list_type=MovementList.ARRIVING,
+                scheduled_datetime=timezone.now(),
+                creator=cls.creator,
+            )
+            for _ in range(25)
+        ])
+
+    def setUp(self):
+        self.url = reverse("movement-lists", args=[self.facility.slug])
+
+    def test_page_contains_only_page_rows(self):
+        response = self.client.get(self.url, {"page": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["movement_lists"]), 5)
+        self.assertEqual(response.context["paginator"].count, 25)
+
+    def test_rows_are_ordered_by_pk_desc(self):
+        response = self.client.get(self.url)
+        rows = response.context["movement_lists"]
+        last_pk = MovementList.objects.order_by("-pk").first().pk
+        self.assertEqual(rows[0]["obj"].pk, last_pk)
+        self.assertIn("can_change", rows[0])
+        self.assertIn("can_delete", rows[0])
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        MovementList.objects.bulk_create([
+            MovementList(
+                facility=cls.facility,
+                scheduled_datetime=timezone.now(),
+            )
+            for _ in range(25)
+        ])
+        cls.movement_list = MovementList.objects.last()
+        MovementListHistory.objects.bulk_create([
+            MovementListHistory(
+                modified_list=cls.movement_list,
+                modified_datetime=timezone.now(),
+                prev_delta={
+                    "scheduled_datetime": cls.movement_list.scheduled_datetime,
+                },
+                post_delta={
+                    "scheduled_datetime": cls.movement_list.scheduled_datetime,
+                },
+            )
+            for _ in range(12)
+        ])
+
+    def setUp(self):
+        self.url = reverse("movement-lists", args=[self.facility.slug])
+
+    def get_page(self, url, cursor=None):
+        params = {"pagination": "cursor"}
+        if cursor:
+            params["cursor"] = cursor
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["page_obj"]
+
+    def test_cursor_walk_returns_every_list_once(self):
+        pks = []
+        page = self.get_page(self.url)
+        self.assertFalse(page.has_previous())
+        while True:
+            pks.extend(row["obj"].pk for row in page)
+            if not page.has_next():
+                break
+            page = self.get_page(self.url, page.next_cursor)
+        expected = list(
+            self.facility.movementlist_set.order_by("-pk")
+            .values_list("pk", flat=True)
+        )
+        self.assertEqual(pks, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.get_page(self.url)
+        second = self.get_page(self.url, first.next_cursor)
+        previous = self.get_page(self.url, second.previous_cursor)
+        self.assertEqual(
+            [row["obj"].pk for row in previous],
+            [row["obj"].pk for row in first],
+        )
+        self.assertFalse(previous.has_previous())
+
+    def test_cursor_mode_does_not_count_rows(self):
+        with CaptureQueriesContext(connection) as context:
+            self.get_page(self.url)
+        for query in context.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+
+    def test_tampered_cursor_returns_404(self):
+        response = self.client.get(self.url, {"cursor": "tampered"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_paginator_renders_prev_next_links(self):
+        response = self.client.get(self.url, {"pagination": "cursor"})
+        self.assertContains(response, "cursor=")
+        self.assertContains(response, "Вперёд")
+        self.assertNotContains(response, "fa-chevron-left")
+
+    def test_history_cursor_pagination(self):
+        url = reverse("movement-list-history", kwargs={
+            "facility_slug": self.facility.slug,
+            "list_id": self.movement_list.pk,
+        })
+        first = self.get_page(url)
+        second = self.get_page(url, first.next_cursor)
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(second.has_next())
+
+
+class MovementListEntriesPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+        )
+        employees = Employee.objects.bulk_create([
+            Employee(first_name="Пётр", last_name="Сотрудник%03d" % i)
+            for i in range(120)
+        ])
+        MovementEntry.objects.bulk_create([
+            MovementEntry(movement_list=cls.movement_list, employee=employee)
+            for employee in employees
+        ])
+
+    def setUp(self):
+        self.url = self.movement_list.get_absolute_url()
+
+    def test_entries_are_paginated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context["entries"]), 50)
+        self.assertEqual(response.context["paginator"].num_pages, 3)
+
+    def test_page_size_is_configurable(self):
+        response = self.client.get(self.url, {"per_page": 100})
+        self.assertEqual(len(response.context["entries"]), 100)
+
+    def test_page_size_is_bounded(self):
+        response = self.client.get(self.url, {"per_page": 100000})
+        self.assertEqual(response.context["paginator"].per_page, 500)
+
+    def test_stream_renders_every_entry(self):
+        view_class = resolve(self.url).func.view_class
+        with mock.patch.object(view_class, "stream_chunk_size", 50):
+            response = self.client.get(self.url, {"stream": 1})
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        content = b"".join(chunks).decode()
+        for i in range(120):
+            self.assertIn("Сотрудник%03d" % i, content)
+        self.assertIn("<td style=\"text-align: center;\">120</td>", content)
+        # заголовок, три части таблицы и окончание страницы
+        self.assertEqual(len(chunks), 5)
+
+
+class MovementListsDateSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        tz = pytz.timezone(settings.TIME_ZONE)
+        cls.late_evening = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=tz.localize(
+                datetime.datetime(2021, 3, 14, 23, 30)
+            ),
+        )
+        cls.early_morning = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=tz.localize(
+                datetime.datetime(2021, 3, 15, 0, 30)
+            ),
+        )
+        cls.next_week = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=tz.localize(
+                datetime.datetime(2021, 3, 22, 9, 0)
+            ),
+        )
+
+    def search(self, **params):
+        url = reverse("movement-lists", args=[self.facility.slug])
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return {row["obj"] for row in response.context["movement_lists"]}
+
+    def test_search_date_uses_local_day_boundaries(self):
+        self.assertEqual(
+            self.search(search_date="2021-03-14"),
+            {self.late_evening},
+        )
+        self.assertEqual(
+            self.search(search_date="2021-03-15"),
+            {self.early_morning},
+        )
+
+    def test_date_range_includes_both_ends(self):
+        self.assertEqual(
+            self.search(date_from="2021-03-15", date_to="2021-03-22"),
+            {self.early_morning, self.next_week},
+        )
+
+    def test_open_date_range(self):
+        self.assertEqual(
+            self.search(date_to="2021-03-15"),
+            {self.late_evening, self.early_morning},
+        )
+
+    def test_invalid_range_is_ignored(self):
+        self.assertEqual(
+            self.search(date_from="2021-03-22", date_to="2021-03-14"),
+            {self.late_evening, self.early_morning, self.next_week},
+        )
+
+
+class MovementListEntriesBulkAddTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.user.user_permissions.set(
+            Permission.objects.filter(codename="add_movemententry")
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.now(),
+            creator=cls.user,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse(
+            "movement-list-entries-bulk-add",
+            kwargs=self.movement_list.get_url_kwargs(),
+        )
+
+    def get_roster(self, count):
+        return "\n".join(
+            "Орлов\tПётр%s\tВаганович\tВодитель" % chr(ord("а") + i % 32)
+            for i in range(count)
+        )
+
+    def test_roster_is_added(self):
+        response = self.client.post(self.url, {
+            "roster": "Орлов\tПётр\tВаганович\tВодитель\n"
+                      "\n"
+                      "Соколов\tИван\t\t\t\n"
+                      "Бобров Семён Ильич Старший  водитель",
+        })
+        self.assertRedirects(response, self.movement_list.get_absolute_url())
+        entries = self.movement_list.movemententry_set.order_by("pk")
+        self.assertEqual(
+            [entry.employee.full_name for entry in entries],
+            ["Орлов Пётр Ваганович", "Соколов Иван", "Бобров Семён Ильич"],
+        )
+        self.assertEqual(entries[2].employee.position, "Старший  водитель")
+        self.assertEqual(entries[0].employee.position, "Водитель")
+        self.assertEqual(entries[0].employee.search_name,
+                         "орлов петр ваганович")
+        self.assertEqual(entries[0].creator, self.user)
+
+    def test_invalid_rows_are_reported(self):
+        response = self.client.post(self.url, {
+            "roster": "Орлов\tПётр\tВаганович\tВодитель\n"
+                      "Соколов\t\t\t\n"
+                      "Бобров\tА\t\t",
+        })
+        self.assertEqual(response.status_code, 200)
+        errors = response.context["form"].errors["roster"]
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith("Строка 2, имя сотрудника"))
+        self.assertTrue(errors[1].startswith("Строка 3, имя сотрудника"))
+        self.assertFalse(self.movement_list.movemententry_set.exists())
+
+    def test_wrong_column_count_is_reported(self):
+        response = self.client.post(self.url, {
+            "roster": "Орлов\tПётр\tВаганович\tВодитель\tВахта 1\n"
+                      "Иванов Иван Водитель\n"
+                      "Соколов\tИван",
+        })
+        self.assertEqual(response.status_code, 200)
+        errors = response.context["form"].errors["roster"]
+        self.assertEqual(
+            [error.split(":")[0] for error in errors],
+            ["Строка 1", "Строка 2", "Строка 3"],
+        )
+        self.assertIn("получено 5", errors[0])
+        self.assertIn("получено 3", errors[1])
+        self.assertIn("получено 2", errors[2])
+        self.assertFalse(self.movement_list.movemententry_set.exists())
+
+    def test_query_count_does_not_depend_on_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, {"roster": self.get_roster(2)})
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, {"roster": self.get_roster(150)})
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(self.movement_list.movemententry_set.count(), 152)
+
+
+class MovementListCloneTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.user.user_permissions.set(
+            Permission.objects.filter(
+                codename__in=["add_movementlist", "add_movemententry"]
+            )
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            list_type=MovementList.ARRIVING,
+            scheduled_datetime=timezone.now(),
+            place="Аэропорт",
+        )
+        MovementEntry.objects.bulk_add(cls.movement_list, None, [
+            {"first_name": "Пётр", "last_name": "Орлов",
+             "position": "Водитель", "is_senior": True},
+            {"first_name": "Иван", "last_name": "Соколов"},
+            {"first_name": "Семён", "last_name": "Бобров"},
+        ])
+        MovementEntry.objects.filter(employee__last_name="Бобров").update(
+            is_deleted=True
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse(
+            "movement-list-clone",
+            kwargs=self.movement_list.get_url_kwargs(),
+        )
+
+    def clone(self):
+        return self.client.post(self.url, {
+            "list_type": MovementList.LEAVING,
+            "move_date": "2030-03-14",
+            "move_time": "10:30",
+        })
+
+    def test_list_is_cloned(self):
+        response = self.clone()
+        clone = MovementList.objects.latest("pk")
+        self.assertRedirects(response, clone.get_absolute_url())
+        self.assertEqual(clone.list_type, MovementList.LEAVING)
+        self.assertEqual(clone.place, "Аэропорт")
+        self.assertEqual(clone.creator, self.user)
+        self.assertEqual(
+            datetime_to_current_tz(clone.scheduled_datetime).strftime(
+                "%Y-%m-%d %H:%M"
+            ),
+            "2030-03-14 10:30",
+        )
+        entries = clone.movemententry_set.order_by("pk")
+        self.assertEqual(
+            [entry.employee.full_name for entry in entries],
+            ["Орлов Пётр", "Соколов Иван"],
+        )
+        self.assertTrue(entries[0].employee.is_senior)
+        self.assertEqual(entries[0].employee.position, "Водитель")
+        self.assertEqual(Employee.objects.count(), 5)
+
+    def test_default_list_type_is_opposite(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.context["form"].initial["list_type"],
+            MovementList.LEAVING,
+        )
+
+    def test_query_count_does_not_depend_on_entries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.clone()
+        MovementEntry.objects.bulk_add(self.movement_list, None, [
+            {"first_name": "Пётр", "last_name": "Орлов"}
+            for _ in range(100)
+        ])
+        with CaptureQueriesContext(connection) as large:
+            self.clone()
+        self.assertEqual(len(small), len(large))
+
+
+class MovementListsRescheduleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.user.user_permissions.set(
+            Permission.objects.filter(codename="change_owned_movementlist")
+        )
+        cls.scheduled = timezone.make_aware(
+            datetime.datetime(2030, 3, 14, 9, 0)
+        )
+        cls.lists = [
+            MovementList.objects.create(
+                facility=cls.facility,
+                scheduled_datetime=cls.scheduled,
+                watch=watch,
+                creator=cls.user,
+            )
+            for watch in ["Первая", "Первая", "Вторая"]
+        ]
+        cls.foreign_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=cls.scheduled,
+            watch="Первая",
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse(
+            "movement-lists-reschedule",
+            args=[self.facility.slug],
+        )
+
+    def reschedule(self, token=None, **data):
+        return self.client.post(self.url, {
+            "token": token or uuid.uuid4(),
+            "watch": "Первая",
+            "date_from": "2030-03-14",
+            "date_to": "2030-03-14",
+            "mode": "shift",
+            "offset": 90,
+            **data
+        })
+
+    def get_scheduled(self):
+        return {
+            mlist.pk: datetime_to_current_tz(mlist.scheduled_datetime)
+            .strftime("%H:%M")
+            for mlist in MovementList.objects.all()
+        }
+
+    def test_lists_are_shifted(self):
+        response = self.reschedule()
+        self.assertRedirects(response, self.facility.get_absolute_url())
+        scheduled = self.get_scheduled()
+        self.assertEqual(scheduled[self.lists[0].pk], "10:30")
+        self.assertEqual(scheduled[self.lists[1].pk], "10:30")
+        self.assertEqual(scheduled[self.lists[2].pk], "09:00")
+        self.assertEqual(scheduled[self.foreign_list.pk], "09:00")
+        self.assertTrue(MovementList.objects.get(pk=self.lists[0].pk)
+                        .was_modified)
+
+    def test_lists_are_moved_to_new_time(self):
+        self.reschedule(mode="set_time", offset="", move_time="18:15")
+        scheduled = self.get_scheduled()
+        self.assertEqual(scheduled[self.lists[0].pk], "18:15")
+        self.assertEqual(scheduled[self.lists[2].pk], "09:00")
+
+    def test_retry_is_idempotent(self):
+        token = uuid.uuid4()
+        self.reschedule(token)
+        self.reschedule(token)
+        self.assertEqual(self.get_scheduled()[self.lists[0].pk], "10:30")
+        self.assertEqual(MovementListHistory.objects.count(), 2)
+
+    def test_history_is_written(self):
+        self.reschedule()
+        response = self.client.get(self.lists[0].get_history_url())
+        history = response.context["history_entries"]
+        self.assertEqual(len(history), 1)
+        rescheduled = history[0]["rescheduled"]
+        self.assertEqual(
+            rescheduled["prev"],
+            datetime_to_current_tz(self.scheduled).strftime("%d.%m.%Y %H:%M"),
+        )
+        self.assertEqual(
+            rescheduled["post"],
+            datetime_to_current_tz(
+                self.scheduled + datetime.timedelta(minutes=90)
+            ).strftime("%d.%m.%Y %H:%M"),
+        )
+
+    def test_query_count_does_not_depend_on_lists(self):
+        with CaptureQueriesContext(connection) as small:
+            self.reschedule()
+        for _ in range(20):
+            MovementList.objects.create(
+                facility=self.facility,
+                scheduled_datetime=self.scheduled,
+                watch="Первая",
+                creator=self.user,
+            )
+        with CaptureQueriesContext(connection) as large:
+            self.reschedule()
+        self.assertEqual(len(small), len(large))
+
+
+class MovementListEntriesBulkActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.user.user_permissions.set(
+            Permission.objects.filter(
+                codename__in=[
+                    "change_owned_movemententry",
+                    "delete_owned_movemententry",
+                ]
+            )
+        )
+        cls.movement_list, cls.target_list = [
+            MovementList.objects.create(
+                facility=cls.facility,
+                list_type=MovementList.ARRIVING,
+                scheduled_datetime=timezone.now(),
+            )
+            for _ in range(2)
+        ]
+        MovementEntry.objects.bulk_add(cls.movement_list, cls.user, [
+            {"first_name": "Пётр", "last_name": "Орлов"},
+            {"first_name": "Иван", "last_name": "Соколов"},
+        ])
+        MovementEntry.objects.bulk_add(cls.movement_list, None, [
+            {"first_name": "Семён", "last_name": "Бобров"},
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse(
+            "movement-list-entries-bulk-action",
+            kwargs=self.movement_list.get_url_kwargs(),
+        )
+        self.pks = list(
+            self.movement_list.movemententry_set.values_list("pk", flat=True)
+        )
+
+    def post(self, action, pks=None, **data):
+        return self.client.post(self.url, {
+            "action": action,
+            "entries": self.pks if pks is None else pks,
+            **data
+        })
+
+    def test_only_permitted_entries_are_deleted(self):
+        response = self.post("delete")
+        self.assertRedirects(response, self.movement_list.get_absolute_url())
+        self.assertEqual(
+            set(
+                MovementEntry.objects.filter(is_deleted=True)
+                .values_list("employee__last_name", flat=True)
+            ),
+            {"Орлов", "Соколов"},
+        )
+
+    def test_deleted_entries_are_restored(self):
+        self.post("delete")
+        self.post("restore")
+        self.assertFalse(MovementEntry.objects.filter(is_deleted=True))
+
+    def test_entries_are_moved(self):
+        self.post("move", target_list=self.target_list.pk)
+        self.assertEqual(self.target_list.movemententry_set.count(), 2)
+        self.assertEqual(self.movement_list.movemententry_set.count(), 1)
+
+    def test_move_requires_target_list(self):
+        self.post("move")
+        self.assertEqual(self.target_list.movemententry_set.count(), 0)
+
+    def test_changes_are_logged(self):
+        self.post("move", target_list=self.target_list.pk)
+        changes = ChangeLog.objects.filter(
+            model=MovementEntry._meta.label,
+            action=ChangeMeta.UPDATE_ACTION,
+        )
+        self.assertEqual(changes.count(), 2)
+        for change in changes:
+            self.assertEqual(
+                change.prev_change,
+                {"movement_list_id": self.movement_list.pk},
+            )
+            self.assertEqual(
+                change.post_change,
+                {"movement_list_id": self.target_list.pk},
+            )
+            self.assertEqual(list(change.changed_by.all()), [self.user])
+
+    def test_query_count_does_not_depend_on_entries(self):
+        with CaptureQueriesContext(connection) as small:
+            self.post("delete")
+        MovementEntry.objects.bulk_add(self.movement_list, self.user, [
+            {"first_name": "Пётр", "last_name": "Орлов"}
+            for _ in range(100)
+        ])
+        MovementEntry.objects.update(is_deleted=False)
+        pks = list(
+            self.movement_list.movemententry_set.values_list("pk", flat=True)
+        )
+        with CaptureQueriesContext(connection) as large:
+            self.post("delete", pks)
+        self.assertEqual(len(small), len(large))
+
+
+class HistoryDeltaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            password="user1pwd",
+        )
+        cls.user.user_permissions.set(
+            Permission.objects.filter(
+                codename__in=["change_movementlist", "change_movemententry"]
+            )
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            scheduled_datetime=timezone.make_aware(
+                datetime.datetime(2030, 3, 14, 9, 0)
+            ),
+        )
+        MovementEntry.objects.bulk_add(cls.movement_list, cls.user, [
+            {"first_name": "Пётр", "last_name": "Орлов"},
+        ])
+        cls.entry = MovementEntry.objects.get()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_entry_history_stores_changed_fields(self):
+        self.client.post(self.entry.get_edit_url(), {
+            "first_name": "Пётр",
+            "last_name": "Орлов",
+            "patronymic": "",
+            "position": "Водитель",
+        })
+        history = MovementEntryHistory.objects.get()
+        self.assertEqual(history.prev_delta, {"position": ""})
+        self.assertEqual(history.post_delta, {"position": "Водитель"})
+        response = self.client.get(self.entry.get_history_url())
+        self.assertEqual(
+            response.context["history_entries"][0]["changes"],
+            [{
+                "name": "position",
+                "label": "Должность",
+                "prev": "",
+                "post": "Водитель",
+            }],
+        )
+
+    def test_list_history_stores_changed_fields(self):
+        self.client.post(self.movement_list.get_edit_url(), {
+            "move_date": "2030-03-14",
+            "move_time": "11:00",
+            "place": "Аэропорт",
+            "watch": "",
+        })
+        history = MovementListHistory.objects.get()
+        self.assertEqual(
+            set(history.post_delta),
+            {"scheduled_datetime", "place"},
+        )
+        response = self.client.get(self.movement_list.get_history_url())
+        row = response.context["history_entries"][0]
+        self.assertEqual(row["rescheduled"]["post"], "14.03.2030 11:00")
+        self.assertContains(response, "на 14.03.2030 11:00")
+        self.assertContains(response, "Место заезда/выезда")
+
+    def test_history_is_paginated(self):
+        MovementEntryHistory.objects.bulk_create([
+            MovementEntryHistory(
+                modified_entry=self.entry,
+                modified_datetime=timezone.now(),
+                prev_delta={"position": str(number)},
+                post_delta={"position": str(number + 1)},
+            )
+            for number in range(25)
+        ])
+        url = self.entry.get_history_url()
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["history_entries"]), 10)
+        response = self.client.get(url, {"page": 3})
+        self.assertEqual(len(response.context["history_entries"]), 5)
+        self.assertEqual(
+            response.context["history_entries"][-1]["changes"][0]["post"],
+            "1",
+        )
+
+    def test_changes_are_cached(self):
+        history = MovementEntryHistory.objects.create(
+            modified_entry=self.entry,
+            modified_datetime=timezone.now(),
+            prev_delta={"position": ""},
+            post_delta={"position": "Водитель"},
+        )
+        changes = history.get_changes()
+        history = MovementEntryHistory.objects.get(pk=history.pk)
+        with mock.patch.object(
+            MovementEntryHistory,
+            "_compute_changes",
+        ) as compute:
+            self.assertEqual(history.get_changes(), changes)
+        compute.assert_not_called()
+
+    def test_page_changes_are_fetched_at_once(self):
+        MovementEntryHistory.objects.bulk_create([
+            MovementEntryHistory(
+                modified_entry=self.entry,
+                modified_datetime=timezone.now(),
+                prev_delta={"position": str(number)},
+                post_delta={"position": str(number + 1)},
+            )
+            for number in range(15)
+        ])
+        url = self.entry.get_history_url()
+        for params in ({}, {"pagination": "cursor"}):
+            with mock.patch("main.models.history.cache") as history_cache:
+                history_cache.get_many.return_value = {}
+                response = self.client.get(url, params)
+            rows = response.context["history_entries"]
+            self.assertEqual(len(rows), 10)
+            self.assertEqual(history_cache.get_many.call_count, 1)
+            self.assertEqual(history_cache.set_many.call_count, 1)
+            history_cache.get.assert_not_called()
+
+
+class MovementListEntriesPDFCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            list_type=MovementList.ARRIVING,
+            scheduled_datetime=timezone.now(),
+        )
+        cls.entry = MovementEntry.objects.create(
+            movement_list=cls.movement_list,
+            employee=Employee.objects.create(
+                first_name="Пётр",
+                last_name="Орлов",
+            ),
+        )
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch("pdfkit.from_string", return_value=b"%PDF")
+        self.from_string = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse(
+            "movement-list-entries-print",
+            kwargs={
+                "facility_slug": self.facility.slug,
+                "list_id": self.movement_list.pk,
+            },
+        )
+
+    def get_cached_files(self):
+        cache_dir = Path(self.media_root) / "pdf-cache" /\
+            str(self.movement_list.pk)
+        return list(cache_dir.glob("*.pdf"))
+
+    def download(self, **headers):
+        """
+        Возвращает ответ и содержимое файла. Чтение содержимого
+        закрывает файл ответа
+        """
+        response = self.client.get(self.url, **headers)
+        content = b""
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        return response, content
+
+    def test_pdf_is_rendered_once(self):
+        response, content = self.download()
+        self.assertEqual(content, b"%PDF")
+        etag = response["ETag"]
+        response, content = self.download()
+        self.assertEqual(content, b"%PDF")
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.from_string.call_count, 1)
+
+    def test_not_modified(self):
+        etag = self.download()[0]["ETag"]
+        response = self.download(HTTP_IF_NONE_MATCH=etag)[0]
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_replace_cached_file(self):
+        etag = self.download()[0]["ETag"]
+        old_files = self.get_cached_files()
+        self.entry.is_deleted = True
+        self.entry.save()
+        response = self.download(HTTP_IF_NONE_MATCH=etag)[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(self.from_string.call_count, 2)
+        new_files = self.get_cached_files()
+        self.assertEqual(len(new_files), 1)
+        self.assertNotIn(new_files[0], old_files)
+
+    def test_stale_files_are_pruned(self):
+        self.download()
+        cached_file = self.get_cached_files()[0]
+        old_list = MovementList.objects.create(
+            facility=self.facility,
+            scheduled_datetime=timezone.now(),
+        )
+        cache_root = Path(self.media_root) / "pdf-cache"
+        old_file = cache_root / str(old_list.pk) / "old.pdf"
+        deleted_file = cache_root / "0" / "deleted.pdf"
+        for path in (old_file, deleted_file):
+            path.parent.mkdir()
+            path.write_bytes(b"%PDF")
+        stale_time = time.time() - 8 * 24 * 60 * 60
+        os.utime(old_file, (stale_time, stale_time))
+        call_command("prune_pdf_cache", older_than=7, stdout=StringIO())
+        self.assertEqual(self.get_cached_files(), [cached_file])
+        self.assertFalse(old_file.parent.exists())
+        # Каталог несуществующего списка удаляется независимо от возраста
+        self.assertFalse(deleted_file.parent.exists())
+
+    def test_cache_is_removed_with_list(self):
+        self.download()
+        user = get_user_model().objects.create_superuser(
+            username="user1",
+            password="user1pwd",
+        )
+        self.client.force_login(user)
+        response = self.client.post(reverse(
+            "movement-list-delete",
+            kwargs={
+                "facility_slug": self.facility.slug,
+                "list_id": self.movement_list.pk,
+            },
+        ))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_cached_files(), [])
+
+    def test_cache_is_swept_on_miss(self):
+        cache_dir = Path(self.media_root) / "pdf-cache" / "0"
+        cache_dir.mkdir(parents=True)
+        (cache_dir / "deleted.pdf").write_bytes(b"%PDF")
+        self.download()
+        self.assertFalse(cache_dir.exists())
+        self.assertEqual(len(self.get_cached_files()), 1)
+
+
+class ViewQueryCountTests(TestCase):
+    """
+    Регрессионные тесты количества запросов к базе данных
+    для каждого представления из main/urls.py
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            email="user1@mail.com",
+            password="user1pwd",
+            first_name="Александр",
+            last_name="Бобров",
+        )
+        cls.user.user_permissions.set(
+            Permission.objects.filter(content_type__app_label="main")
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            list_type=MovementList.ARRIVING,
+            scheduled_datetime=timezone.now(),
+            creator=cls.user,
+        )
+        employee = Employee.objects.create(
+            first_name="Пётр",
+            last_name="Орлов",
+            patronymic="Ваганович",
+            position="Водитель",
+        )
+        cls.entry = MovementEntry.objects.create(
+            movement_list=cls.movement_list,
+            creator=cls.user,
+            employee=employee,
+        )
+        MovementListHistory.objects.create(
+            modified_list=cls.movement_list,
+            modified_by=cls.user,
+            modified_datetime=timezone.now(),
+            prev_delta={
+                "scheduled_datetime": cls.movement_list.scheduled_datetime,
+            },
+            post_delta={
+                "scheduled_datetime": cls.movement_list.scheduled_datetime,
+            },
+        )
+        MovementEntryHistory.objects.create(
+            modified_entry=cls.entry,
+            modified_by=cls.user,
+            modified_datetime=timezone.now(),
+            prev_delta={"position": ""},
+            post_delta={"position": "Водитель"},
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.list_kwargs = {
+            "facility_slug": self.facility.slug,
+            "list_id": self.movement_list.pk,
+        }
+        self.entry_kwargs = {
+            **self.list_kwargs,
+            "entry_id": self.entry.pk,
+        }
+
+    def assertGetNumQueries(self, num, url_name, kwargs=None):
+        url = reverse(url_name, kwargs=kwargs)
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertIn(response.status_code, (200, 302))
+
+    def test_redirect_to_default_facility(self):
+        self.assertGetNumQueries(0, "redirect-to-default-facility")
+
+    def test_login(self):
+        self.client.logout()
+        self.assertGetNumQueries(0, "login")
+
+    def test_movement_lists(self):
+        self.assertGetNumQueries(
+            8, "movement-lists", {"facility_slug": self.facility.slug}
+        )
+
+    def test_movement_lists_add(self):
+        self.assertGetNumQueries(
+            6, "movement-lists-add", {"facility_slug": self.facility.slug}
+        )
+
+    def test_movement_list_edit(self):
+        self.assertGetNumQueries(6, "movement-list-edit", self.list_kwargs)
+
+    def test_movement_list_delete(self):
+        self.assertGetNumQueries(6, "movement-list-delete", self.list_kwargs)
+
+    def test_movement_list_clone(self):
+        self.assertGetNumQueries(
+            6, "movement-list-clone", self.list_kwargs
+        )
+
+    def test_movement_list_history(self):
+        self.assertGetNumQueries(
+            6, "movement-list-history", self.list_kwargs
+        )
+
+    def test_movement_list_entries(self):
+        self.assertGetNumQueries(
+            9, "movement-list-entries", self.list_kwargs
+        )
+
+    def test_movement_list_entries_print(self):
+        with mock.patch("pdfkit.from_string", return_value=b"%PDF"),\
+                tempfile.TemporaryDirectory() as media_root,\
+                self.settings(MEDIA_ROOT=media_root):
+            self.assertGetNumQueries(
+                3, "movement-list-entries-print", self.list_kwargs
+            )
+            # Сохранённый файл отдаётся без выборки записей
+            self.assertGetNumQueries(
+                2, "movement-list-entries-print", self.list_kwargs
+            )
+
+    def test_movement_list_entries_add(self):
+        self.assertGetNumQueries(
+            6, "movement-list-entries-add", self.list_kwargs
+        )
+
+    def test_movement_list_entries_bulk_add(self):
+        self.assertGetNumQueries(
+            6, "movement-list-entries-bulk-add", self.list_kwargs
+        )
+
+    def test_movement_list_entry_edit(self):
+        self.assertGetNumQueries(
+            7, "movement-list-entry-edit", self.entry_kwargs
+        )
+
+    def test_movement_list_entry_delete(self):
+        self.assertGetNumQueries(
+            7, "movement-list-entry-delete", self.entry_kwargs
+        )
+
+    def test_movement_list_entry_history(self):
+        self.assertGetNumQueries(
+            7, "movement-list-entry-history", self.entry_kwargs
+        )
+
+
+class ConstantQueryCountTests(TestCase):
+    """
+    Количество запросов к базе данных не должно зависеть
+    от количества отображаемых строк
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.facility = FacilityObject.objects.create(
+            name="Тестовый объект",
+            slug="test-facility"
+        )
+        cls.user = get_user_model().objects.create_user(
+            username="user1",
+            email="user1@mail.com",
+            password="user1pwd",
+        )
+        cls.user.user_permissions.set(
+            Permission.objects.filter(content_type__app_label="main")
+        )
+        cls.movement_list = MovementList.objects.create(
+            facility=cls.facility,
+            list_type=MovementList.ARRIVING,
+            scheduled_datetime=timezone.now(),
+            creator=cls.user,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.list_kwargs = {
+            "facility_slug": self.facility.slug,
+            "list_id": self.movement_list.pk,
+        }
+
+    def add_rows(self, count):
+        for _ in range(count):
+            creator = get_user_model().objects.create_user(
+                username="creator%s" % get_user_model().objects.count(),
+                password="pwd",
+            )
+            MovementList.objects.create(
+                facility=self.facility,
+                scheduled_datetime=timezone.now(),
+                creator=creator,
+            )
+            employee = Employee.objects.create(
+                first_name="Пётр",
+                last_name="Орлов",
+            )
+            entry = MovementEntry.objects.create(
+                movement_list=self.movement_list,
+                creator=creator,
+                employee=employee,
+            )
+            scheduled_datetime = self.movement_list.scheduled_datetime
+            MovementListHistory.objects.create(
+                modified_list=self.movement_list,
+                modified_by=creator,
+                modified_datetime=timezone.now(),
+                prev_delta={"scheduled_datetime": scheduled_datetime},
+                post_delta={"scheduled_datetime": scheduled_datetime},
+            )
+            MovementEntryHistory.objects.create(
+                modified_entry=entry,
+                modified_by=creator,
+                modified_datetime=timezone.now(),
+                prev_delta={"position": ""},
+                post_delta={"position": "Водитель"},
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertQueryCountIsConstant(self, url):
+        self.add_rows(1)
+        expected = self.count_queries(url)
+        self.add_rows(5)
+        self.assertEqual(self.count_queries(url), expected)
+
+    def test_movement_lists(self):
+        self.assertQueryCountIsConstant(
+            reverse("movement-lists", args=[self.facility.slug])
+        )
+
+    def test_movement_list_entries(self):
+        self.assertQueryCountIsConstant(
+            reverse("movement-list-entries", kwargs=self.list_kwargs)
+        )
+
+    def test_movement_list_entries_print(self):
+        with mock.patch("pdfkit.from_string", return_value=b"%PDF"),\
+                tempfile.TemporaryDirectory() as media_root,\
+                self.settings(MEDIA_ROOT=media_root):
+            self.assertQueryCountIsConstant(
+                reverse("movement-list-entries-print", kwargs=self.list_kwargs)
+            )
+
+    def test_movement_list_history(self):
+        self.assertQueryCountIsConstant(
+            reverse("movement-list-history", kwargs=self.list_kwargs)
+        )
+
+    def test_movement_list_entry_history(self):
+        entry = MovementEntry.objects.create(
+            movement_list=self.movement_list,
+            creator=self.user,
+            employee=Employee.objects.create(
+                first_name="Иван",
+                last_name="Иванов",
+            ),
+        )
+        url = reverse("movement-list-entry-history", kwargs={
+            **self.list_kwargs,
+            "entry_id": entry.pk,
+        })
+
+        def create_history():
+            MovementEntryHistory.objects.create(
+                modified_entry=entry,
+                modified_by=get_user_model().objects.create_user(
+                    username="editor%s" % get_user_model().objects.count(),
+                    password="pwd",
+                ),
+                modified_datetime=timezone.now(),
+                prev_delta={"position": ""},
+                post_delta={"position": "Водитель"},
+            )
+
+        # Пустая страница не выбирает строки из базы данных,
+        # поэтому сравниваются страницы из одной и из пяти записей
+        create_history()
+        expected = self.count_queries(url)
+        for _ in range(4):
+            create_history()
+        self.assertEqual(self.count_queries(url), expected)
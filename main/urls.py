@@ -4,10 +4,16 @@ from django.contrib.auth.decorators import login_required
 
 from .views.base import DefaultRedirect
 from .views.movement_lists import MovementLists, MovementListsAdd,\
-    MovementListEdit, MovementListDelete, MovementListHistory
+    MovementListEdit, MovementListDelete, MovementListHistory,\
+    MovementListClone, MovementListsReschedule
 from .views.movement_list_entries import MovementListEntries,\
     MovementListEntriesAdd, MovementListEntryEdit, MovementListEntryDelete,\
-    MovementListEntryHistory, movement_list_entries_PDF
+    MovementListEntryHistory, MovementListEntriesBulkAdd,\
+    MovementListEntriesImport, MovementListEntriesBulkAction,\
+    movement_list_entries_PDF, movement_list_entries_import_report
+from .views.search import EmployeeSearch
+from .views.autocomplete import autocomplete_suggestions
+from .views.audit import AuditLog, audit_log_json
 
 
 accounts_urls = [
@@ -19,6 +25,11 @@ accounts_urls = [
     path("accounts/logout/", LogoutView.as_view(), name="logout"),
 ]
 
+audit_urls = [
+    path("audit/", AuditLog.as_view(), name="audit-log"),
+    path("audit/json/", audit_log_json, name="audit-log-json"),
+]
+
 movement_list_entries_urlpatterns = [
     path(
         "entries/",
@@ -35,6 +46,26 @@ movement_list_entries_urlpatterns = [
         login_required(MovementListEntriesAdd.as_view()),
         name="movement-list-entries-add",
     ),
+    path(
+        "entries/add/bulk/",
+        login_required(MovementListEntriesBulkAdd.as_view()),
+        name="movement-list-entries-bulk-add",
+    ),
+    path(
+        "entries/import/",
+        login_required(MovementListEntriesImport.as_view()),
+        name="movement-list-entries-import",
+    ),
+    path(
+        "entries/import/reports/<str:report>/",
+        movement_list_entries_import_report,
+        name="movement-list-entries-import-report",
+    ),
+    path(
+        "entries/bulk/",
+        login_required(MovementListEntriesBulkAction.as_view()),
+        name="movement-list-entries-bulk-action",
+    ),
     path(
         "entries/<int:entry_id>/edit/",
         login_required(MovementListEntryEdit.as_view()),
@@ -67,11 +98,21 @@ movement_lists_urlpatterns = [
         login_required(MovementListsAdd.as_view()),
         name="movement-lists-add",
     ),
+    path(
+        "lists/reschedule/",
+        login_required(MovementListsReschedule.as_view()),
+        name="movement-lists-reschedule",
+    ),
     path(
         "lists/<int:list_id>/edit/",
         login_required(MovementListEdit.as_view()),
         name="movement-list-edit",
     ),
+    path(
+        "lists/<int:list_id>/clone/",
+        login_required(MovementListClone.as_view()),
+        name="movement-list-clone",
+    ),
     path(
         "lists/<int:list_id>/delete/",
         login_required(MovementListDelete.as_view()),
@@ -82,6 +123,16 @@ movement_lists_urlpatterns = [
         MovementListHistory.as_view(),
         name="movement-list-history",
     ),
+    path(
+        "search/",
+        EmployeeSearch.as_view(),
+        name="employee-search",
+    ),
+    path(
+        "autocomplete/<str:field>/",
+        autocomplete_suggestions,
+        name="autocomplete-suggestions",
+    ),
 ]
 
 urlpatterns = [
@@ -95,4 +146,4 @@ urlpatterns = [
         "facility/<slug:facility_slug>/",
         include(movement_lists_urlpatterns),
     ),
-] + accounts_urls
+] + accounts_urls + audit_urls
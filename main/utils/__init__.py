@@ -1,26 +1,48 @@
+import datetime as dt
+
 import pytz
 from django.http.request import QueryDict
 from django.conf import settings
 
 
-def get_paginator_baseurl(request):
+def get_paginator_baseurl(request, page_kwarg="page"):
     query = ""
     cur_get = request.GET.copy()
     cur_get_len = len(cur_get.dict())
     if not cur_get:
-        query = "?page="
-    elif cur_get_len == 1 and "page" in cur_get:
-        query = "?page="
-    elif cur_get_len > 1 and "page" in cur_get:
-        cur_get.pop("page")
+        query = "?%s=" % page_kwarg
+    elif cur_get_len == 1 and page_kwarg in cur_get:
+        query = "?%s=" % page_kwarg
+    elif cur_get_len > 1 and page_kwarg in cur_get:
+        cur_get.pop(page_kwarg)
         cur_get = QueryDict(cur_get.urlencode())
-        query = "?" + cur_get.urlencode() + "&page="
+        query = "?" + cur_get.urlencode() + "&%s=" % page_kwarg
     elif cur_get_len >= 1:
         cur_get = QueryDict(cur_get.urlencode())
-        query = "?" + cur_get.urlencode() + "&page="
+        query = "?" + cur_get.urlencode() + "&%s=" % page_kwarg
     return request.path + query
 
 
 def datetime_to_current_tz(datetime):
     settings_tz = pytz.timezone(settings.TIME_ZONE)
     return datetime.astimezone(settings_tz)
+
+
+def get_datetime_range(date_from=None, date_to=None):
+    """
+    Возвращает полуинтервал [начало, конец) для поиска по дате
+    в часовом поясе из настроек: от начала дня date_from
+    до начала дня, следующего за date_to.
+    Не указанная граница возвращается как None
+    """
+    settings_tz = pytz.timezone(settings.TIME_ZONE)
+    start = end = None
+    if date_from:
+        start = settings_tz.localize(
+            dt.datetime.combine(date_from, dt.time.min)
+        )
+    if date_to:
+        end = settings_tz.localize(
+            dt.datetime.combine(date_to + dt.timedelta(days=1), dt.time.min)
+        )
+    return start, end
@@ -0,0 +1,136 @@
+import json
+
+from django.core import signing
+from django.db.models import Q
+from django.http import Http404
+
+from changelog.utils import PreciseJSONEncoder
+
+
+class KeysetPage:
+    """
+    Страница пагинатора по ключу.
+    Вместо номеров страниц содержит непрозрачные курсоры
+    на следующую и предыдущую страницы
+    """
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по ключу (keyset/seek).
+    Страница выбирается условием на значения полей сортировки
+    последней показанной строки, поэтому стоимость запроса не зависит
+    от глубины страницы, а общее количество строк не вычисляется.
+    Поля сортировки должны однозначно определять порядок строк,
+    поэтому последним из них должен быть первичный ключ
+    """
+
+    is_keyset = True
+    cursor_salt = "main.keyset-cursor"
+
+    def __init__(self, queryset, per_page, ordering=("-pk",),
+                 rows_factory=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.rows_factory = rows_factory
+        self._keys = [
+            (field.lstrip("-"), field.startswith("-"))
+            for field in self.ordering
+        ]
+
+    def _get_key(self, obj):
+        return [getattr(obj, field) for field, _ in self._keys]
+
+    def encode_cursor(self, direction, obj):
+        values = json.loads(
+            json.dumps(self._get_key(obj), cls=PreciseJSONEncoder)
+        )
+        return signing.dumps([direction, values], salt=self.cursor_salt)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=self.cursor_salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise Http404("Неверный курсор страницы")
+        if direction not in ("next", "prev") or\
+                len(values) != len(self._keys):
+            raise Http404("Неверный курсор страницы")
+        return direction, values
+
+    def _get_seek_q(self, values, backwards):
+        """
+        Возвращает условие на строки, следующие за строкой
+        с ключом values в порядке сортировки (или предшествующие ей)
+        """
+        seek_q = Q()
+        equal = {}
+        for (field, descending), value in zip(self._keys, values):
+            lookup = "lt" if descending != backwards else "gt"
+            seek_q |= Q(**equal, **{"%s__%s" % (field, lookup): value})
+            equal[field] = value
+        return seek_q
+
+    def _get_reversed_ordering(self):
+        return [
+            field if descending else "-" + field
+            for field, descending in self._keys
+        ]
+
+    def get_page(self, cursor=None):
+        direction, values = "next", None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        backwards = direction == "prev"
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._get_seek_q(values, backwards))
+        if backwards:
+            queryset = queryset.order_by(*self._get_reversed_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        # Одна лишняя строка показывает, есть ли строки дальше
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if backwards:
+            objects.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = self.encode_cursor("next", objects[-1])
+        if objects and has_previous:
+            previous_cursor = self.encode_cursor("prev", objects[0])
+
+        if self.rows_factory is not None:
+            objects = self.rows_factory(objects)
+        return KeysetPage(objects, self, next_cursor, previous_cursor)
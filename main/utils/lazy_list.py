@@ -0,0 +1,45 @@
+class LazyRowList:
+    """
+    Ленивая обёртка над Queryset для пагинатора.
+    Из базы данных выбираются только строки запрошенной страницы,
+    и только к ним применяется функция row_factory.
+    Функция prefetch, если задана, вызывается со списком объектов
+    страницы до построения строк и может загрузить их данные
+    общим запросом
+    """
+
+    def __init__(self, queryset, row_factory, prefetch=None):
+        self.queryset = queryset
+        self.row_factory = row_factory
+        self.prefetch = prefetch
+        self._result_cache = None
+
+    @property
+    def ordered(self):
+        return self.queryset.ordered
+
+    def make_rows(self, objects):
+        objects = list(objects)
+        if self.prefetch is not None:
+            self.prefetch(objects)
+        return [self.row_factory(obj) for obj in objects]
+
+    def count(self):
+        return self.queryset.count()
+
+    def _fetch_all(self):
+        # Используется, только если строки выводятся без пагинатора
+        if self._result_cache is None:
+            self._result_cache = self.make_rows(self.queryset)
+        return self._result_cache
+
+    def __len__(self):
+        return len(self._fetch_all())
+
+    def __iter__(self):
+        return iter(self._fetch_all())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.make_rows(self.queryset[key])
+        return self.make_rows([self.queryset[key]])[0]
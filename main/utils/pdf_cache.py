@@ -0,0 +1,150 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+
+
+# Увеличивается при изменении шаблона печатной формы,
+# чтобы ранее сохранённые файлы не использовались
+PDF_CACHE_VERSION = 1
+# Файлы, которые не загружались дольше этого времени, удаляются
+PDF_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+# Не чаще этого интервала кэш просматривается целиком
+PDF_CACHE_SWEEP_INTERVAL = 60 * 60
+
+
+def get_pdf_cache_root():
+    return Path(settings.MEDIA_ROOT) / "pdf-cache"
+
+
+def get_pdf_cache_dir(movement_list):
+    return get_pdf_cache_root() / str(movement_list.pk)
+
+
+def remove_list_pdf_cache(movement_list):
+    """
+    Удаляет все сохранённые печатные формы списка
+    """
+    shutil.rmtree(get_pdf_cache_dir(movement_list), ignore_errors=True)
+
+
+def prune_pdf_cache(max_age=PDF_CACHE_MAX_AGE):
+    """
+    Удаляет печатные формы, которые не загружались дольше max_age
+    секунд, и каталоги удалённых списков.
+    Возвращает количество удалённых файлов
+    """
+    from ..models import MovementList
+
+    root = get_pdf_cache_root()
+    if not root.is_dir():
+        return 0
+    list_dirs = {
+        int(path.name): path for path in root.iterdir()
+        if path.is_dir() and path.name.isdigit()
+    }
+    alive = set(
+        MovementList.objects.filter(
+            pk__in=list_dirs,
+            is_deleted=False,
+        ).values_list("pk", flat=True)
+    )
+    expires = time.time() - max_age
+    removed = 0
+    for list_id, list_dir in list_dirs.items():
+        for path in list_dir.iterdir():
+            try:
+                if list_id not in alive or path.stat().st_mtime < expires:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        try:
+            list_dir.rmdir()
+        except OSError:
+            # В каталоге остались действующие файлы
+            pass
+    return removed
+
+
+def sweep_pdf_cache():
+    """
+    Запускает prune_pdf_cache, если с прошлого просмотра прошло
+    больше PDF_CACHE_SWEEP_INTERVAL. Время просмотра хранится
+    как время изменения служебного файла
+    """
+    root = get_pdf_cache_root()
+    marker = root / ".last-sweep"
+    try:
+        if time.time() - marker.stat().st_mtime < PDF_CACHE_SWEEP_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+    root.mkdir(parents=True, exist_ok=True)
+    marker.touch()
+    prune_pdf_cache()
+
+
+def get_list_pdf_version(movement_list):
+    """
+    Возвращает версию содержимого печатной формы списка: хэш времени
+    изменения списка, наибольшего времени изменения его записей
+    и количества не удалённых записей. Удаление, восстановление
+    и перенос записи меняют время её изменения или количество
+    записей, поэтому версия меняется при любом изменении формы.
+    Вычисляется одним агрегирующим запросом
+    """
+    entries = movement_list.movemententry_set.aggregate(
+        last_modified=Max("last_modified"),
+        max_pk=Max("pk"),
+        count=Count("pk", filter=Q(is_deleted=False)),
+    )
+    key = "|".join(str(value) for value in (
+        PDF_CACHE_VERSION,
+        movement_list.pk,
+        movement_list.last_modified.isoformat(),
+        movement_list.facility.name,
+        entries["last_modified"] and entries["last_modified"].isoformat(),
+        entries["max_pk"],
+        entries["count"],
+    ))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def open_cached_pdf(movement_list, version, render):
+    """
+    Открывает на чтение файл печатной формы версии version.
+    Если файла нет, он создаётся из результата render(),
+    файлы предыдущих версий формы списка удаляются,
+    а кэш других списков периодически очищается от старых файлов.
+    Время изменения файла обновляется при каждой загрузке
+    и служит временем последнего использования
+    """
+    cache_dir = get_pdf_cache_dir(movement_list)
+    path = cache_dir / ("%s.pdf" % version)
+    try:
+        pdf_file = open(path, "rb")
+    except FileNotFoundError:
+        pass
+    else:
+        os.utime(pdf_file.fileno())
+        return pdf_file
+    sweep_pdf_cache()
+    pdf = render()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Файл записывается под временным именем и переименовывается,
+    # чтобы параллельный запрос не прочитал его недописанным
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as tmp_file:
+        tmp_file.write(pdf)
+    os.replace(tmp_path, path)
+    pdf_file = open(path, "rb")
+    for stale_path in cache_dir.glob("*.pdf"):
+        if stale_path != path:
+            stale_path.unlink(missing_ok=True)
+    return pdf_file
@@ -0,0 +1,23 @@
+from django.db.models import Q, BooleanField, ExpressionWrapper
+
+
+def get_perm_q(user, perm, owned_perm, owner_field="creator"):
+    """
+    Возвращает условие Q, истинное для объектов, над которыми
+    пользователь может выполнить действие: при наличии права perm -
+    для всех объектов, при наличии права owned_perm - только для
+    объектов, созданных пользователем.
+    Права модели проверяются один раз, без обращения к строкам
+    """
+    if user.has_perm(perm):
+        return Q(pk__isnull=False)
+    if user.is_authenticated and user.has_perm(owned_perm):
+        return Q(**{owner_field: user.pk})
+    return Q(pk__isnull=True)
+
+
+def as_boolean(condition):
+    """
+    Оборачивает условие Q в выражение для аннотации Queryset
+    """
+    return ExpressionWrapper(condition, output_field=BooleanField())
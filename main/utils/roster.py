@@ -0,0 +1,251 @@
+import io
+import csv
+import time
+import itertools
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction, DatabaseError
+from django.utils import timezone
+
+from ..forms import CreateMovementEntryForm
+from ..models import MovementEntry
+
+
+ROSTER_FIELDS = ["last_name", "first_name", "patronymic", "position"]
+ROSTER_HEADERS = {
+    "фамилия": "last_name",
+    "имя": "first_name",
+    "отчество": "patronymic",
+    "должность": "position",
+}
+ROSTER_EXTENSIONS = (".csv", ".xlsx")
+# Отчёты об отклонённых строках содержат имена сотрудников
+# и удаляются по истечении этого времени
+IMPORT_REPORT_MAX_AGE = 24 * 60 * 60
+
+
+class RosterFormatError(Exception):
+    pass
+
+
+def _read_csv(file):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        yield from csv.reader(text, dialect)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise RosterFormatError("Не удалось прочитать CSV файл: %s" % e)
+    finally:
+        # Обёртка не должна закрывать файл, которым владеет вызывающий
+        text.detach()
+
+
+def _read_xlsx(file):
+    try:
+        import openpyxl
+    except ImportError:
+        raise RosterFormatError("Для импорта XLSX нужен пакет openpyxl")
+    try:
+        workbook = openpyxl.load_workbook(
+            file,
+            read_only=True,
+            data_only=True,
+        )
+    except Exception as e:
+        raise RosterFormatError("Не удалось прочитать XLSX файл: %s" % e)
+    try:
+        for values in workbook.active.iter_rows(values_only=True):
+            yield ["" if value is None else str(value) for value in values]
+    finally:
+        workbook.close()
+
+
+def read_roster(file, filename):
+    """
+    Построчно читает файл CSV или XLSX со списком сотрудников
+    и возвращает итератор (номер строки, значения, словарь полей).
+    Если первая строка содержит заголовки столбцов, порядок столбцов
+    берётся из неё, иначе столбцы считаются идущими в порядке
+    ROSTER_FIELDS. Файл целиком в память не загружается
+    """
+    if filename.lower().endswith(".xlsx"):
+        rows = _read_xlsx(file)
+    elif filename.lower().endswith(".csv"):
+        rows = _read_csv(file)
+    else:
+        raise RosterFormatError(
+            "Поддерживаются только файлы %s" % ", ".join(ROSTER_EXTENSIONS)
+        )
+    rows = enumerate(rows, start=1)
+    first = next(rows, None)
+    if first is None:
+        return
+    headers = [
+        ROSTER_HEADERS.get(value.strip().lower()) for value in first[1]
+    ]
+    if any(headers):
+        fields = headers
+    else:
+        fields = ROSTER_FIELDS
+        rows = itertools.chain([first], rows)
+    for number, values in rows:
+        values = [value.strip() for value in values]
+        if not any(values):
+            continue
+        yield number, values, {
+            field: value
+            for field, value in zip(fields, values)
+            if field is not None
+        }
+
+
+class RosterImporter:
+    """
+    Импорт списка сотрудников в список заезда/выезда.
+    Строки проверяются правилами CreateMovementEntryForm и вставляются
+    пачками по batch_size строк, каждая пачка - в своей точке
+    сохранения. Отклонённые строки с причиной записываются
+    в файл отчёта rejected_file (объект с методом write)
+    """
+
+    def __init__(self, movement_list, creator, batch_size=1000,
+                 rejected_file=None):
+        self.movement_list = movement_list
+        self.creator = creator
+        self.batch_size = batch_size
+        self.imported = 0
+        self.rejected = 0
+        self._report = None
+        if rejected_file is not None:
+            self._report = csv.writer(rejected_file)
+            self._report.writerow(["Строка", "Ошибка", "Значения"])
+
+    def reject(self, number, error, values):
+        self.rejected += 1
+        if self._report is not None:
+            self._report.writerow([number, error] + list(values))
+
+    def validate(self, data):
+        form = CreateMovementEntryForm(data=data, perms=set())
+        if form.is_valid():
+            return form.cleaned_data, None
+        errors = [
+            "%s: %s" % (form.fields[field].label, " ".join(field_errors))
+            for field, field_errors in form.errors.items()
+        ]
+        return None, "; ".join(errors)
+
+    def flush(self, batch):
+        if not batch:
+            return
+        try:
+            MovementEntry.objects.bulk_add(
+                self.movement_list,
+                self.creator,
+                [row for _, _, row in batch],
+                self.batch_size,
+            )
+        except DatabaseError as e:
+            for number, values, _ in batch:
+                self.reject(number, "Ошибка базы данных: %s" % e, values)
+        else:
+            self.imported += len(batch)
+        batch.clear()
+
+    def run(self, rows):
+        """
+        Импортирует строки rows вида (номер строки, значения,
+        словарь полей), например, полученные из read_roster.
+        Возвращает количество импортированных и отклонённых строк
+        """
+        batch = []
+        with transaction.atomic():
+            for number, values, data in rows:
+                cleaned_data, error = self.validate(data)
+                if error:
+                    self.reject(number, error, values)
+                    continue
+                batch.append((number, values, cleaned_data))
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+            self.flush(batch)
+        return self.imported, self.rejected
+
+
+def get_import_reports_dir():
+    return Path(settings.MEDIA_ROOT) / "imports"
+
+
+def get_import_report_path(report):
+    """
+    Возвращает путь к отчёту с именем report
+    или None, если отчёт не найден или устарел
+    """
+    path = get_import_reports_dir() / report
+    try:
+        modified = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    if not path.is_file() or time.time() - modified > IMPORT_REPORT_MAX_AGE:
+        return None
+    return path
+
+
+def prune_import_reports(max_age=IMPORT_REPORT_MAX_AGE):
+    """
+    Удаляет отчёты об отклонённых строках старше max_age секунд.
+    Возвращает количество удалённых отчётов
+    """
+    reports_dir = get_import_reports_dir()
+    if not reports_dir.is_dir():
+        return 0
+    expires = time.time() - max_age
+    removed = 0
+    for path in reports_dir.glob("rejected-*.csv"):
+        try:
+            if path.stat().st_mtime < expires:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def import_roster(movement_list, creator, file, filename, batch_size=1000):
+    """
+    Импортирует файл со списком сотрудников в список movement_list.
+    Отчёт об отклонённых строках сохраняется в MEDIA_ROOT/imports/
+    на IMPORT_REPORT_MAX_AGE, устаревшие отчёты удаляются при импорте.
+    Возвращает количество импортированных и отклонённых строк
+    и путь к отчёту относительно MEDIA_ROOT (None, если отчёт пуст)
+    """
+    prune_import_reports()
+    report_name = "imports/rejected-%s-%s.csv" % (
+        movement_list.pk,
+        timezone.now().strftime("%Y%m%d-%H%M%S-%f"),
+    )
+    report_path = Path(settings.MEDIA_ROOT) / report_name
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report = open(report_path, "w", encoding="utf-8-sig", newline="")
+    try:
+        with report:
+            importer = RosterImporter(
+                movement_list,
+                creator,
+                batch_size,
+                rejected_file=report,
+            )
+            imported, rejected = importer.run(read_roster(file, filename))
+    except Exception:
+        report_path.unlink()
+        raise
+    if not rejected:
+        report_path.unlink()
+        report_name = None
+    return imported, rejected, report_name
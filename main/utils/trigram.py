@@ -0,0 +1,55 @@
+from django.db import connections
+from django.db.transaction import TransactionManagementError
+from django.db.models import CharField, TextField, FloatField, Func, Value
+from django.contrib.postgres.lookups import PostgresOperatorLookup
+
+
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """
+    Строки, содержащие фрагмент, похожий на искомую строку (оператор %>).
+    Обслуживается GIN индексом с классом операторов gin_trgm_ops
+    """
+
+    lookup_name = "trigram_word_similar"
+    postgres_operator = "%%>"
+
+
+class TrigramWordSimilarity(Func):
+    """
+    Степень сходства строки string с наиболее похожим
+    фрагментом выражения expression (от 0 до 1)
+    """
+
+    function = "WORD_SIMILARITY"
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, "resolve_expression"):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
+
+
+def register_trigram_lookups():
+    CharField.register_lookup(TrigramWordSimilar)
+    TextField.register_lookup(TrigramWordSimilar)
+
+
+def set_word_similarity_threshold(threshold, using="default"):
+    """
+    Устанавливает порог сходства оператора %> до конца текущей
+    транзакции (как SET LOCAL), поэтому запросы, использующие порог,
+    должны выполняться в том же блоке atomic. Значение по умолчанию
+    (0.6) отсекает короткие фамилии с одной опечаткой
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        # Вне транзакции значение сбросилось бы сразу после запроса
+        raise TransactionManagementError(
+            "The similarity threshold requires an atomic block"
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config("
+            "'pg_trgm.word_similarity_threshold', %s, true)",
+            [str(threshold)],
+        )
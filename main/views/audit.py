@@ -0,0 +1,92 @@
+from django.http import JsonResponse
+from django.contrib.auth.decorators import permission_required
+from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.views.decorators.http import require_safe
+from django.views.generic.list import ListView
+
+from changelog.models import ChangeLog
+from .mixins import KeysetPaginationMixin
+from ..models import FacilityObject
+from ..forms import AuditLogForm
+from ..utils.keyset import KeysetPaginator
+
+
+AUDIT_PAGE_SIZE = 100
+AUDIT_ORDERING = ("-change_datetime", "-pk")
+
+
+def get_audit_queryset(form):
+    """
+    Возвращает записи журнала изменений по фильтрам формы form
+    """
+    if not form.is_valid():
+        return ChangeLog.objects.none()
+    return ChangeLog.objects.search(**form.get_search_kwargs())
+
+
+class AuditLog(PermissionRequiredMixin, KeysetPaginationMixin, ListView):
+    """
+    Поиск по журналу изменений по пользователю, действию,
+    объекту и периоду. Журнал велик, поэтому страницы всегда
+    выбираются по ключу (change_datetime, id)
+    """
+
+    permission_required = "changelog.view_changelog"
+    template_name = "main/audit/audit-log.html"
+    context_object_name = "logs"
+    paginate_by = 50
+    keyset_ordering = AUDIT_ORDERING
+    http_method_names = ["get", "head"]
+
+    def is_keyset_pagination(self):
+        return True
+
+    def get_search_form(self):
+        return AuditLogForm(self.request.path, self.request.GET)
+
+    def get_queryset(self):
+        return get_audit_queryset(self.get_search_form())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["header"] = "Журнал изменений"
+        context["facilities"] = FacilityObject.objects.all()
+        context["search_form"] = self.get_search_form()
+        return context
+
+
+def serialize_changelog(log):
+    return {
+        "id": log.pk,
+        "change_datetime": log.change_datetime,
+        "actor": log.actor.username if log.actor else None,
+        "action": log.action,
+        "model": log.model,
+        "model_pk": log.model_pk,
+        "prev_change": log.prev_change,
+        "post_change": log.post_change,
+        "comment": log.comment,
+    }
+
+
+@require_safe
+@permission_required("changelog.view_changelog", raise_exception=True)
+def audit_log_json(request):
+    """
+    Возвращает в формате JSON страницу журнала изменений
+    с фильтрами AuditLogForm и курсором следующей страницы ?cursor=
+    """
+    form = AuditLogForm(request.path, request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    paginator = KeysetPaginator(
+        get_audit_queryset(form),
+        AUDIT_PAGE_SIZE,
+        ordering=AUDIT_ORDERING,
+    )
+    page = paginator.get_page(request.GET.get("cursor"))
+    return JsonResponse({
+        "results": [serialize_changelog(log) for log in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
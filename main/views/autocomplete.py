@@ -0,0 +1,34 @@
+from django.http import JsonResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
+
+from ..models import FacilityObject, MovementEntry, Suggestion
+
+
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_MAX_AGE = 300
+
+
+@require_safe
+def autocomplete_suggestions(request, facility_slug, field):
+    """
+    Возвращает в формате JSON самые частые значения поля field,
+    начинающиеся с параметра ?q=. Словарь подсказок общий
+    для всех производственных объектов, объект facility_slug
+    только проверяется, как и в остальных представлениях объекта
+    """
+    if field not in dict(Suggestion.FIELDS):
+        raise Http404("Неизвестное поле")
+    get_object_or_404(FacilityObject, slug=facility_slug)
+    prefix = request.GET.get("q", "")[:100]
+    suggestions = MovementEntry.objects.get_autocomplete_suggestions(
+        field,
+        prefix,
+        AUTOCOMPLETE_LIMIT,
+    )
+    response = JsonResponse({"suggestions": suggestions})
+    # Подсказки меняются редко, поэтому ответ можно кэшировать в браузере,
+    # но не в общих прокси: ответ содержит ФИО сотрудников
+    patch_cache_control(response, private=True, max_age=AUTOCOMPLETE_MAX_AGE)
+    return response
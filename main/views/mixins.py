@@ -1,25 +1,102 @@
+from django.urls import reverse
+from django.utils.functional import cached_property
 from django.shortcuts import get_object_or_404, get_list_or_404
 
 from ..models import FacilityObject, MovementList
+from ..utils import get_paginator_baseurl
+from ..utils.keyset import KeysetPaginator
+from ..utils.lazy_list import LazyRowList
 
 
+# Экземпляр представления создаётся на каждый запрос, поэтому
+# cached_property хранит связанные объекты ровно в пределах запроса:
+# каждый объект загружается из базы данных не более одного раза
 class FacilityMixin:
 
-    @property
+    @cached_property
     def related_facility(self):
         return get_object_or_404(
             FacilityObject, slug=self.kwargs["facility_slug"]
         )
 
-    @property
+    @cached_property
     def all_facilities(self):
         return get_list_or_404(FacilityObject.objects.all())
 
+    def get_autocomplete_url(self, field):
+        return reverse(
+            "autocomplete-suggestions",
+            args=[self.kwargs["facility_slug"], field],
+        )
+
 
 class FacilityListMixin(FacilityMixin):
 
-    @property
+    @cached_property
+    def related_facility(self):
+        return self.related_list.facility
+
+    @cached_property
     def related_list(self):
+        queryset = MovementList.objects.select_related("facility")
         return get_object_or_404(
-            MovementList, pk=self.kwargs["list_id"]
+            queryset,
+            pk=self.kwargs["list_id"],
+            facility__slug=self.kwargs["facility_slug"],
+        )
+
+
+class FacilityListEntryMixin(FacilityListMixin):
+
+    @cached_property
+    def related_entry(self):
+        queryset = self.related_list.movemententry_set.select_related(
+            "employee"
         )
+        return get_object_or_404(queryset, pk=self.kwargs["entry_id"])
+
+
+class KeysetPaginationMixin:
+    """
+    Добавляет к ListView режим пагинации по ключу.
+    Режим включается параметром ?pagination=cursor, переходы между
+    страницами выполняются по непрозрачному курсору ?cursor=...
+    """
+
+    cursor_kwarg = "cursor"
+    keyset_ordering = ("-pk",)
+
+    def is_keyset_pagination(self):
+        get_params = self.request.GET
+        return self.cursor_kwarg in get_params\
+            or get_params.get("pagination") == "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.is_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        rows_factory = None
+        if isinstance(queryset, LazyRowList):
+            rows_factory = queryset.make_rows
+            queryset = queryset.queryset
+        paginator = KeysetPaginator(
+            queryset,
+            page_size,
+            ordering=self.keyset_ordering,
+            rows_factory=rows_factory,
+        )
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = context.get("paginator")
+        if paginator is not None:
+            if self.is_keyset_pagination():
+                page_kwarg = self.cursor_kwarg
+            else:
+                page_kwarg = self.page_kwarg
+            paginator.baseurl = get_paginator_baseurl(
+                self.request,
+                page_kwarg,
+            )
+        return context
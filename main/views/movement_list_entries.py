@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import pdfkit
 
 from django.contrib import messages
@@ -9,65 +11,152 @@ from django.views.generic.edit import FormView
 from django.views.generic.edit import DeleteView
 from django.template.loader import get_template
 from django.views.decorators.http import require_safe
-from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.http import StreamingHttpResponse, FileResponse, Http404
 from django.shortcuts import get_object_or_404
+from django.utils.html import format_html
+from django.core.exceptions import PermissionDenied
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import UserPassesTestMixin
-from django.contrib.postgres.search import SearchVector, SearchQuery
+from django.contrib.postgres.search import SearchQuery
 
-from .mixins import FacilityListMixin
-from ..models import FacilityObject, MovementList, Employee, MovementEntry,\
-    MovementEntryHistory
+from changelog.utils import ChangeMeta
+from .mixins import FacilityListMixin, FacilityListEntryMixin,\
+    KeysetPaginationMixin
+from ..models import MovementList, MovementEntry,\
+    MovementEntryHistory, NAME_SEARCH_CONFIG
 from ..forms import CreateMovementEntryForm, EditMovementEntryForm,\
-    SearchEntryForm
+    SearchEntryForm, BulkCreateMovementEntriesForm,\
+    ImportMovementEntriesForm, BulkEntriesActionForm
 from ..utils import datetime_to_current_tz
 from ..utils.link import Link
+from ..utils.pdf_cache import get_list_pdf_version, open_cached_pdf
+from ..utils.lazy_list import LazyRowList
+from ..utils.roster import import_roster, get_import_report_path,\
+    RosterFormatError
 
 
-class MovementListEntries(FacilityListMixin, ListView):
+class MovementListEntries(
+            FacilityListMixin,
+            KeysetPaginationMixin,
+            ListView,
+        ):
 
     template_name = "main/movement-list-entries/movement-list-entries.html"
+    stream_template_names = {
+        "head": "main/movement-list-entries/stream/head.html",
+        "rows": "main/movement-list-entries/stream/rows.html",
+        "tail": "main/movement-list-entries/stream/tail.html",
+    }
     context_object_name = "entries"
+    paginate_by = 50
+    max_paginate_by = 500
+    stream_chunk_size = 500
+
+    def get(self, request, *args, **kwargs):
+        if request.GET.get("stream"):
+            return self.stream_response()
+        return super().get(request, *args, **kwargs)
+
+    def get_paginate_by(self, queryset):
+        """
+        Размер страницы задаётся параметром ?per_page=,
+        но не может превышать max_paginate_by
+        """
+        try:
+            per_page = int(self.request.GET.get("per_page", ""))
+        except ValueError:
+            return self.paginate_by
+        return max(1, min(per_page, self.max_paginate_by))
+
+    def show_deleted(self):
+        return self.request.user.is_authenticated and\
+            self.request.GET.get("show") == "deleted"
 
     def get_queryset(self):
-        entries = self.related_list.movemententry_set.get_not_deleted()
+        if self.show_deleted():
+            entries = self.related_list.movemententry_set.filter(
+                is_deleted=True
+            )
+        else:
+            entries = self.related_list.movemententry_set.get_not_deleted()
+        entries = entries.select_related("employee", "creator")
         entries = entries.order_by("-pk")
         search_request = self.request.GET.get("search_request", False)
         if search_request:
+            # Поиск выполняется по сохранённым поисковым векторам,
+            # обслуживаемым GIN индексом
             predicat = self.request.GET.get("predicat")
-            search_query = SearchQuery(search_request)
+            search_query = SearchQuery(
+                search_request,
+                config=NAME_SEARCH_CONFIG,
+            )
             if predicat == "USERS":
-                search_vector = SearchVector(
-                    "creator__first_name",
-                    "creator__last_name",
-                    "creator__patronymic"
+                entries = entries.filter(
+                    creator__search_vector=search_query
                 )
             elif predicat == "EMPLOYEES":
-                search_vector = SearchVector(
-                    "employee__first_name",
-                    "employee__last_name",
-                    "employee__patronymic"
+                entries = entries.filter(
+                    employee__search_vector=search_query
                 )
-            entries = entries.annotate(
-                search=search_vector,
-            ).filter(search=search_query)
 
-        user = self.request.user
-        out = []
+        entries = entries.with_perms(self.request.user)
+        return LazyRowList(entries, self.get_row)
+
+    def get_row(self, entry):
+        """
+        Возвращает строку таблицы с правами пользователя на запись,
+        вычисленными в базе данных
+        """
+        return {
+            "obj": entry,
+            "can_change": entry.can_change,
+            "can_delete": entry.can_delete,
+        }
+
+    def stream_response(self):
+        """
+        Возвращает весь список записей без пагинации.
+        Таблица отрисовывается частями по stream_chunk_size строк,
+        записи читаются из базы данных итератором, поэтому
+        расход памяти не зависит от размера списка
+        """
+        return StreamingHttpResponse(
+            self.stream_entries(),
+            content_type="text/html; charset=utf-8",
+        )
+
+    def stream_entries(self):
+        templates = {
+            name: get_template(template_name)
+            for name, template_name in self.stream_template_names.items()
+        }
+        context = {
+            "header": self.related_facility.name,
+            "related_facility": self.related_facility,
+            "related_list": self.related_list,
+        }
+        yield templates["head"].render(context, self.request)
+
+        entries = self.get_queryset().queryset.iterator(
+            chunk_size=self.stream_chunk_size
+        )
+        chunk = []
+        counter = 0
         for entry in entries:
-            change = entry.has_change_perm(user)\
-                and not self.related_list.is_deleted\
-                and not entry.is_deleted
-            delete = entry.has_delete_perm(user)\
-                and not self.related_list.is_deleted\
-                and not entry.is_deleted
-            out.append(
-                {
-                    "obj": entry,
-                    "can_change": change,
-                    "can_delete": delete,
-                }
+            chunk.append(entry)
+            if len(chunk) == self.stream_chunk_size:
+                yield templates["rows"].render(
+                    {"entries": chunk, "start": counter}
+                )
+                counter += len(chunk)
+                chunk = []
+        if chunk:
+            yield templates["rows"].render(
+                {"entries": chunk, "start": counter}
             )
-        return out
+
+        yield templates["tail"].render(context, self.request)
 
     def get_breadcrumbs_links(self):
         return [
@@ -81,15 +170,6 @@ class MovementListEntries(FacilityListMixin, ListView):
             ),
         ]
 
-    def get_suggestions_list(self):
-        fields = ["first_name", "last_name", "patronymic"]
-        suggestions = []
-        for field in fields:
-            suggestions.extend(
-                MovementEntry.objects.get_autocomplete_suggestions(field)
-            )
-        return suggestions
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         search_action = self.related_list.get_absolute_url()
@@ -97,44 +177,76 @@ class MovementListEntries(FacilityListMixin, ListView):
         context["related_facility"] = self.related_facility
         context["facilities"] = self.all_facilities
         context["related_list"] = self.related_list
+        # Запрос начинается с фамилии, см. SearchEntryForm
         context["search_form"] = SearchEntryForm(
             search_action,
-            suggestions=self.get_suggestions_list()
+            autocomplete_url=self.get_autocomplete_url("last_name"),
         )
         context["links"] = self.get_breadcrumbs_links()
+        context["show_deleted"] = self.show_deleted()
+        if self.request.user.is_authenticated and\
+                not self.related_list.is_deleted:
+            context["bulk_form"] = BulkEntriesActionForm(
+                movement_list=self.related_list,
+            )
         return context
 
 
 @require_safe
 def movement_list_entries_PDF(request, **kwargs):
-
-    related_facility = get_object_or_404(
-        FacilityObject, slug=kwargs["facility_slug"]
-    )
+    """
+    Отдаёт печатную форму списка. Сформированные PDF файлы хранятся
+    на диске по версии содержимого списка, поэтому wkhtmltopdf
+    запускается только после изменения списка, а повторные загрузки
+    без изменений получают ответ 304 по ETag
+    """
     related_list = get_object_or_404(
-        MovementList, pk=kwargs["list_id"]
+        MovementList.objects.select_related("facility"),
+        pk=kwargs["list_id"],
+        facility__slug=kwargs["facility_slug"],
     )
+    related_facility = related_list.facility
+
+    version = get_list_pdf_version(related_list)
+    etag = '"%s"' % version
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        pdf_file = open_cached_pdf(
+            related_list,
+            version,
+            lambda: render_entries_pdf(related_list),
+        )
+        scheduled_date = datetime_to_current_tz(
+            related_list.scheduled_datetime
+        )
+        filename = related_facility.slug + "-" +\
+            scheduled_date.strftime("%d-%b-%Y") + ".pdf"
+        response = FileResponse(
+            pdf_file,
+            as_attachment=True,
+            filename=filename,
+            content_type="application/pdf",
+        )
+    response["ETag"] = etag
+    # Браузер хранит файл, но проверяет его версию при каждой загрузке
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 
+def render_entries_pdf(related_list):
     context = dict()
-    context["header"] = related_facility.name
-    context["related_facility"] = related_facility
+    context["header"] = related_list.facility.name
+    context["related_facility"] = related_list.facility
     context["related_list"] = related_list
     context["entries"] = related_list.movemententry_set.filter(
         is_deleted=False
-    ).order_by("-pk")
+    ).select_related("employee").order_by("-pk")
 
     template = get_template(
         "main/movement-list-entries/movement-list-entries-print.html"
     )
     html = template.render(context)
-    pdf = pdfkit.from_string(html, False)
-    scheduled_date = datetime_to_current_tz(related_list.scheduled_datetime)
-    filename = context["related_facility"].slug + "-" +\
-        scheduled_date.strftime("%d-%b-%Y") + ".pdf"
-
-    response = HttpResponse(pdf, content_type="application/pdf")
-    response["Content-Disposition"] = 'attachment; filename="' + filename + '"'
-    return response
+    return pdfkit.from_string(html, False)
 
 
 class MovementListEntriesAdd(UserPassesTestMixin, FacilityListMixin, FormView):
@@ -144,31 +256,18 @@ class MovementListEntriesAdd(UserPassesTestMixin, FacilityListMixin, FormView):
 
     @property
     def success_url(self):
-        context = self.get_context_data()
         return reverse(
             "movement-list-entries",
-            args=[context["related_facility"].slug, self.kwargs["list_id"]]
+            args=[self.related_facility.slug, self.kwargs["list_id"]]
         )
 
-    def get_suggestions_dict(self):
-        first_name_sug =\
-            MovementEntry.objects.get_autocomplete_suggestions("first_name")
-        last_name_sug =\
-            MovementEntry.objects.get_autocomplete_suggestions("last_name")
-        patronymic_sug =\
-            MovementEntry.objects.get_autocomplete_suggestions("patronymic")
-        position_sug =\
-            MovementEntry.objects.get_autocomplete_suggestions("position")
-        return {
-            "first_name": first_name_sug,
-            "last_name": last_name_sug,
-            "patronymic": patronymic_sug,
-            "position": position_sug,
-        }
+    def get_autocomplete_urls(self):
+        fields = ["first_name", "last_name", "patronymic", "position"]
+        return {field: self.get_autocomplete_url(field) for field in fields}
 
     def get_form_kwargs(self):
         kwargs = super(MovementListEntriesAdd, self).get_form_kwargs()
-        kwargs["suggestions"] = self.get_suggestions_dict()
+        kwargs["autocomplete_urls"] = self.get_autocomplete_urls()
         kwargs["perms"] = self.request.user.get_all_permissions()
         return kwargs
 
@@ -203,24 +302,58 @@ class MovementListEntriesAdd(UserPassesTestMixin, FacilityListMixin, FormView):
         return can_add and not self.related_list.is_deleted
 
     def form_valid(self, form):
-        data = form.cleaned_data
-        employee = Employee.objects.create(
-            first_name=data["first_name"],
-            last_name=data["last_name"],
-            patronymic=data["patronymic"],
-            position=data["position"],
-            is_senior=data["is_senior"],
-        )
-        MovementEntry.objects.create(
-            movement_list=self.related_list,
-            creator=self.request.user,
-            employee=employee,
+        MovementEntry.objects.bulk_add(
+            self.related_list,
+            self.request.user,
+            [form.cleaned_data],
         )
         messages.success(self.request, "Запись успешно добавлена")
         return super().form_valid(form)
 
 
-class MovementListEntryEdit(UserPassesTestMixin, FacilityListMixin, FormView):
+class MovementListEntriesBulkAdd(MovementListEntriesAdd):
+    """
+    Добавление в список сразу нескольких сотрудников,
+    вставленных из таблицы. Записи создаются одной транзакцией,
+    только если все строки прошли проверку
+    """
+
+    template_name =\
+        "main/movement-list-entries/movement-list-entries-bulk-add.html"
+    form_class = BulkCreateMovementEntriesForm
+
+    def get_form_kwargs(self):
+        return super(MovementListEntriesAdd, self).get_form_kwargs()
+
+    def get_breadcrumbs_links(self):
+        links = super().get_breadcrumbs_links()
+        links[-1] = Link(
+            reverse(
+                "movement-list-entries-bulk-add",
+                kwargs=self.related_list.get_url_kwargs(),
+            ),
+            "Добавление списка сотрудников",
+        )
+        return links
+
+    def form_valid(self, form):
+        entries = MovementEntry.objects.bulk_add(
+            self.related_list,
+            self.request.user,
+            form.cleaned_data["rows"],
+        )
+        messages.success(
+            self.request,
+            "Добавлено записей: %s" % len(entries),
+        )
+        return super(MovementListEntriesAdd, self).form_valid(form)
+
+
+class MovementListEntryEdit(
+            UserPassesTestMixin,
+            FacilityListEntryMixin,
+            FormView,
+        ):
 
     form_class = EditMovementEntryForm
     template_name =\
@@ -238,9 +371,7 @@ class MovementListEntryEdit(UserPassesTestMixin, FacilityListMixin, FormView):
         )
 
     def get_object(self):
-        return self.related_list.movemententry_set.get(
-            pk=self.kwargs["entry_id"]
-        )
+        return self.related_entry
 
     def get_queryset_with_object(self):
         return self.related_list.movemententry_set.filter(
@@ -299,8 +430,8 @@ class MovementListEntryEdit(UserPassesTestMixin, FacilityListMixin, FormView):
         cur_entry = self.get_object()
         cur_employee = cur_entry.employee
 
-        # Сериализируем данные до внесения изменения
-        old_data = cur_employee.toJSON()
+        # Состояние до внесения изменения
+        prev_state = MovementEntryHistory.get_state(cur_employee)
 
         # вносим изменения
         cur_employee.first_name = data["first_name"]
@@ -309,21 +440,28 @@ class MovementListEntryEdit(UserPassesTestMixin, FacilityListMixin, FormView):
         cur_employee.position = data["position"]
         cur_employee.is_senior = data["is_senior"]
         cur_employee.save()
+        cur_employee.make_history(
+            self.request.user,
+            ChangeMeta.UPDATE_ACTION,
+        )
 
         cur_entry.was_modified = True
         cur_entry.save()
+        cur_entry.make_history(self.request.user, ChangeMeta.UPDATE_ACTION)
 
-        # Сериализируем данные после внесения изменения
-        new_data = cur_employee.toJSON()
-
-        # добавляем запись в историю
-        MovementEntryHistory.objects.create(
-            modified_entry=self.get_object(),
-            modified_by=self.request.user,
-            modified_datetime=timezone.now(),
-            serialized_prev_delta=old_data,
-            serialized_post_delta=new_data,
+        # добавляем в историю только изменившиеся поля
+        prev_delta, post_delta = MovementEntryHistory.get_delta(
+            prev_state,
+            MovementEntryHistory.get_state(cur_employee),
         )
+        if post_delta:
+            MovementEntryHistory.objects.create(
+                modified_entry=cur_entry,
+                modified_by=self.request.user,
+                modified_datetime=timezone.now(),
+                prev_delta=prev_delta,
+                post_delta=post_delta,
+            )
 
         messages.success(self.request, "Запись успешно изменена")
         return super().form_valid(form)
@@ -331,7 +469,7 @@ class MovementListEntryEdit(UserPassesTestMixin, FacilityListMixin, FormView):
 
 class MovementListEntryDelete(
             UserPassesTestMixin,
-            FacilityListMixin,
+            FacilityListEntryMixin,
             DeleteView,
         ):
 
@@ -347,10 +485,7 @@ class MovementListEntryDelete(
         ])
 
     def get_object(self):
-        return get_object_or_404(
-            self.related_list.movemententry_set,
-            pk=self.kwargs["entry_id"]
-        )
+        return self.related_entry
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -372,6 +507,7 @@ class MovementListEntryDelete(
         success_url = self.get_success_url()
         obj.is_deleted = True
         obj.save()
+        obj.make_history(self.request.user, ChangeMeta.DELETE_ACTION)
         return HttpResponseRedirect(success_url)
 
     def post(self, request, *args, **kwargs):
@@ -379,32 +515,86 @@ class MovementListEntryDelete(
         return self.delete()
 
 
-class MovementListEntryHistory(FacilityListMixin, ListView):
+class MovementListEntriesBulkAction(FacilityListMixin, FormView):
+    """
+    Групповое удаление, восстановление и перенос записей списка.
+    Права проверяются условием запроса, а выбранные записи
+    изменяются одним запросом UPDATE
+    """
+
+    form_class = BulkEntriesActionForm
+    http_method_names = ["post"]
+
+    def get_success_url(self):
+        return self.related_list.get_absolute_url()
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["movement_list"] = self.related_list
+        return kwargs
+
+    def form_valid(self, form):
+        data = form.cleaned_data
+        user = self.request.user
+        pks = [entry.pk for entry in data["entries"]]
+        if self.related_list.is_deleted:
+            changed = []
+        elif data["action"] == form.DELETE:
+            changed = MovementEntry.objects.bulk_delete(user, pks)
+        elif data["action"] == form.RESTORE:
+            changed = MovementEntry.objects.bulk_restore(user, pks)
+        else:
+            changed = MovementEntry.objects.bulk_move(
+                user, pks, data["target_list"]
+            )
+        messages.success(self.request, "Изменено записей: %s" % len(changed))
+        skipped = len(pks) - len(changed)
+        if skipped:
+            messages.warning(
+                self.request,
+                "Не изменено записей: %s. Недостаточно прав "
+                "или действие к ним неприменимо" % skipped,
+            )
+        return super().form_valid(form)
+
+    def form_invalid(self, form):
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(self.request, error)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class MovementListEntryHistory(
+            FacilityListEntryMixin,
+            KeysetPaginationMixin,
+            ListView,
+        ):
 
     template_name =\
         "main/movement-list-entries/movement-list-entry-history.html"
     context_object_name = "history_entries"
+    paginate_by = 10
 
     def get_entry(self):
-        return self.related_list.movemententry_set.get(
-            pk=self.kwargs["entry_id"]
-        )
+        return self.related_entry
 
     def get_queryset(self):
         entry = self.get_entry()
-        queryset = entry.movemententryhistory_set.all()
+        queryset = entry.movemententryhistory_set.select_related(
+            "modified_by"
+        )
         queryset = queryset.order_by("-pk")
-        data = []
-
-        for obj in queryset:
-            data.append(
-                {
-                    "meta": obj,
-                    **obj.get_change_states(),
-                }
-            )
+        return LazyRowList(
+            queryset,
+            self.get_row,
+            MovementEntryHistory.prefetch_changes,
+        )
 
-        return data
+    def get_row(self, obj):
+        return {
+            "meta": obj,
+            "changes": obj.get_changes(),
+        }
 
     def get_breadcrumbs_links(self):
         return [
@@ -430,3 +620,81 @@ class MovementListEntryHistory(FacilityListMixin, ListView):
         context["related_list"] = self.related_list
         context["links"] = self.get_breadcrumbs_links()
         return context
+
+
+class MovementListEntriesImport(MovementListEntriesBulkAdd):
+    """
+    Импорт записей из файла CSV или XLSX.
+    Файл читается построчно, строки вставляются пачками, а отклонённые
+    строки сохраняются в отчёт, доступный для скачивания
+    """
+
+    template_name =\
+        "main/movement-list-entries/movement-list-entries-import.html"
+    form_class = ImportMovementEntriesForm
+    import_batch_size = 1000
+
+    def get_breadcrumbs_links(self):
+        links = super().get_breadcrumbs_links()
+        links[-1] = Link(
+            reverse(
+                "movement-list-entries-import",
+                kwargs=self.related_list.get_url_kwargs(),
+            ),
+            "Импорт списка сотрудников",
+        )
+        return links
+
+    def form_valid(self, form):
+        roster_file = form.cleaned_data["roster_file"]
+        try:
+            imported, rejected, report = import_roster(
+                self.related_list,
+                self.request.user,
+                roster_file.file,
+                roster_file.name,
+                self.import_batch_size,
+            )
+        except RosterFormatError as e:
+            form.add_error("roster_file", str(e))
+            return self.form_invalid(form)
+        messages.success(
+            self.request,
+            "Импортировано записей: %s" % imported,
+        )
+        if report:
+            report_url = reverse(
+                "movement-list-entries-import-report",
+                kwargs={
+                    **self.related_list.get_url_kwargs(),
+                    "report": Path(report).name,
+                },
+            )
+            messages.warning(
+                self.request,
+                format_html(
+                    'Отклонено строк: {}. <a href="{}">Скачать отчёт</a>',
+                    rejected,
+                    report_url,
+                ),
+            )
+        return super(MovementListEntriesAdd, self).form_valid(form)
+
+
+@require_safe
+@login_required
+def movement_list_entries_import_report(request, report, **kwargs):
+    if not request.user.has_perm("main.add_movemententry"):
+        raise PermissionDenied
+    related_list = get_object_or_404(
+        MovementList,
+        pk=kwargs["list_id"],
+        facility__slug=kwargs["facility_slug"],
+    )
+    prefix = "rejected-%s-" % related_list.pk
+    if not report.startswith(prefix) or Path(report).name != report:
+        raise Http404("Отчёт не найден")
+    path = get_import_report_path(report)
+    if path is None:
+        raise Http404("Отчёт не найден")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=report)
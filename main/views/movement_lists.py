@@ -1,8 +1,8 @@
+import uuid
 import datetime
 
 from django.contrib import messages
 from django.urls import reverse
-from django.core import serializers
 from django.utils import timezone
 from django.views.generic.list import ListView
 from django.views.generic.edit import FormView
@@ -10,16 +10,19 @@ from django.views.generic.edit import DeleteView
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.http import HttpResponseRedirect
 
-from .mixins import FacilityMixin, FacilityListMixin
+from changelog.utils import ChangeMeta
+from .mixins import FacilityMixin, FacilityListMixin, KeysetPaginationMixin
 from ..models import MovementList,\
     MovementListHistory as MovementListHistoryModel
 from ..forms import CreateMovementListForm, EditMovementListForm,\
-    SearchListForm
-from ..utils import get_paginator_baseurl, datetime_to_current_tz
+    SearchListForm, CloneMovementListForm, RescheduleMovementListsForm
+from ..utils import datetime_to_current_tz, get_datetime_range
 from ..utils.link import Link
+from ..utils.pdf_cache import remove_list_pdf_cache
+from ..utils.lazy_list import LazyRowList
 
 
-class MovementLists(FacilityMixin, ListView):
+class MovementLists(FacilityMixin, KeysetPaginationMixin, ListView):
 
     template_name = "main/movement-lists/movement-lists.html"
     paginate_by = 10
@@ -29,34 +32,46 @@ class MovementLists(FacilityMixin, ListView):
 
     def get_queryset(self):
         get_params = self.request.GET
-        movement_lists =\
-            self.related_facility.movementlist_set.all().order_by("-pk")
+        movement_lists = self.related_facility.movementlist_set\
+            .select_related("creator")\
+            .with_perms(self.request.user)\
+            .order_by("-pk")
         show = get_params.get("show", "")
         if show == "arrivals":
             movement_lists = movement_lists.filter(list_type="ARR")
         elif show == "departures":
             movement_lists = movement_lists.filter(list_type="LVN")
 
-        search_date = get_params.get("search_date", False)
-        if search_date:
-            print("request")
-            movement_lists = movement_lists.filter(
-                scheduled_datetime__contains=search_date
-            )
+        # Поиск по дате выполняется по полуинтервалу значений
+        # scheduled_datetime, чтобы запрос мог использовать индекс
+        search_form = self.get_search_form()
+        if search_form.is_valid():
+            start, end = get_datetime_range(*search_form.get_date_range())
+            if start:
+                movement_lists = movement_lists.filter(
+                    scheduled_datetime__gte=start
+                )
+            if end:
+                movement_lists = movement_lists.filter(
+                    scheduled_datetime__lt=end
+                )
+
+        return LazyRowList(movement_lists, self.get_row)
+
+    def get_row(self, mlist):
+        """
+        Возвращает строку страницы с правами пользователя на список,
+        вычисленными в базе данных
+        """
+        return {
+            "obj": mlist,
+            "can_change": mlist.can_change,
+            "can_delete": mlist.can_delete,
+        }
 
-        user = self.request.user
-        out = []
-        for mlist in movement_lists:
-            change = mlist.has_change_perm(user) and not mlist.is_deleted
-            delete = mlist.has_delete_perm(user) and not mlist.is_deleted
-            out.append(
-                {
-                    "obj": mlist,
-                    "can_change": change,
-                    "can_delete": delete,
-                }
-            )
-        return out
+    def get_search_form(self):
+        search_action = self.related_facility.get_absolute_url()
+        return SearchListForm(search_action, self.request.GET)
 
     def get_show_message(self):
         cur_get = self.request.GET
@@ -72,10 +87,12 @@ class MovementLists(FacilityMixin, ListView):
         context["header"] = self.related_facility.name
         context["related_facility"] = self.related_facility
         context["facilities"] = self.all_facilities
-        context["paginator"].baseurl = get_paginator_baseurl(self.request)
         context["show"] = self.get_show_message()
         search_action = self.related_facility.get_absolute_url()
-        context["search_form"] = SearchListForm(search_action)
+        context["search_form"] = SearchListForm(
+            search_action,
+            initial=self.request.GET.dict(),
+        )
         return context
 
 
@@ -88,7 +105,7 @@ class MovementListsAdd(UserPassesTestMixin, FacilityMixin, FormView):
     def success_url(self):
         return reverse(
             "movement-lists",
-            args=[self.get_context_data()["related_facility"].slug]
+            args=[self.related_facility.slug]
         )
 
     def get_context_data(self, **kwargs):
@@ -109,7 +126,7 @@ class MovementListsAdd(UserPassesTestMixin, FacilityMixin, FormView):
 
     def form_valid(self, form):
         data = form.cleaned_data
-        MovementList.objects.create(
+        movement_list = MovementList.objects.create(
             facility=self.related_facility,
             list_type=data["list_type"],
             scheduled_datetime=datetime.datetime.combine(
@@ -120,10 +137,148 @@ class MovementListsAdd(UserPassesTestMixin, FacilityMixin, FormView):
             watch=data["watch"],
             place=data["place"],
         )
+        movement_list.make_history(self.request.user)
         messages.success(self.request, "Список успешно добавлен")
         return super().form_valid(form)
 
 
+class MovementListsReschedule(UserPassesTestMixin, FacilityMixin, FormView):
+    """
+    Групповой перенос списков объекта, выбранных по вахте и датам.
+    Форма содержит ключ операции, поэтому повторная отправка
+    не переносит списки второй раз
+    """
+
+    template_name = "main/movement-lists/movement-lists-reschedule.html"
+    form_class = RescheduleMovementListsForm
+
+    def get_success_url(self):
+        return self.related_facility.get_absolute_url()
+
+    def get_initial(self):
+        return {"token": uuid.uuid4()}
+
+    def get_breadcrumbs_links(self):
+        return [
+            Link(
+                self.related_facility.get_absolute_url(),
+                self.related_facility,
+            ),
+            Link(
+                reverse(
+                    "movement-lists-reschedule",
+                    args=[self.related_facility.slug],
+                ),
+                "Перенос списков",
+            ),
+        ]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["header"] = self.related_facility.name
+        context["related_facility"] = self.related_facility
+        context["facilities"] = self.all_facilities
+        context["links"] = self.get_breadcrumbs_links()
+        return context
+
+    def test_func(self):
+        user = self.request.user
+        return user.has_perm("main.change_movementlist") or\
+            user.has_perm("main.change_owned_movementlist")
+
+    def form_valid(self, form):
+        data = form.cleaned_data
+        start, end = get_datetime_range(data["date_from"], data["date_to"])
+        movement_lists = self.related_facility.movementlist_set.filter(
+            is_deleted=False,
+            scheduled_datetime__gte=start,
+            scheduled_datetime__lt=end,
+        )
+        if data["list_type"]:
+            movement_lists = movement_lists.filter(
+                list_type=data["list_type"]
+            )
+        if data["watch"]:
+            movement_lists = movement_lists.filter(watch=data["watch"])
+        if data["mode"] == form.SHIFT:
+            kwargs = {"offset": datetime.timedelta(minutes=data["offset"])}
+        else:
+            kwargs = {"time": data["move_time"]}
+        count = movement_lists.reschedule(
+            self.request.user,
+            data["token"],
+            **kwargs
+        )
+        if count is None:
+            messages.info(self.request, "Перенос уже был выполнен")
+        else:
+            messages.success(self.request, "Перенесено списков: %s" % count)
+        return super().form_valid(form)
+
+
+class MovementListClone(UserPassesTestMixin, FacilityListMixin, FormView):
+    """
+    Создание нового списка с теми же сотрудниками,
+    например, списка выезда для заехавшей смены
+    """
+
+    template_name = "main/movement-lists/movement-list-clone.html"
+    form_class = CloneMovementListForm
+
+    def get_initial(self):
+        if self.related_list.list_type == MovementList.ARRIVING:
+            list_type = MovementList.LEAVING
+        else:
+            list_type = MovementList.ARRIVING
+        return {"list_type": list_type}
+
+    def get_breadcrumbs_links(self):
+        return [
+            Link(
+                self.related_facility.get_absolute_url(),
+                self.related_facility,
+            ),
+            Link(
+                self.related_list.get_absolute_url(),
+                self.related_list,
+            ),
+            Link(
+                self.related_list.get_clone_url(),
+                "Копирование",
+            ),
+        ]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["header"] = self.related_facility.name
+        context["related_facility"] = self.related_facility
+        context["related_list"] = self.related_list
+        context["facilities"] = self.all_facilities
+        context["links"] = self.get_breadcrumbs_links()
+        return context
+
+    def test_func(self):
+        user = self.request.user
+        return user.has_perm("main.add_movementlist") and\
+            user.has_perm("main.add_movemententry")
+
+    def form_valid(self, form):
+        data = form.cleaned_data
+        self.movement_list = self.related_list.clone(
+            scheduled_datetime=datetime.datetime.combine(
+                data["move_date"],
+                data["move_time"],
+            ),
+            list_type=data["list_type"],
+            creator=self.request.user,
+        )
+        messages.success(self.request, "Список успешно скопирован")
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        return self.movement_list.get_absolute_url()
+
+
 class MovementListEdit(UserPassesTestMixin, FacilityListMixin, FormView):
 
     form_class = EditMovementListForm
@@ -188,41 +343,38 @@ class MovementListEdit(UserPassesTestMixin, FacilityListMixin, FormView):
         return kwargs
 
     def form_valid(self, form):
-        xml_serializer = serializers.get_serializer("xml")()
         data = form.cleaned_data
         cur_list = self.get_object()
 
-        # Сериализируем данные до внесения изменения
-        old_data = xml_serializer.serialize(
-            [cur_list],
-            fields=("scheduled_datetime")
-        )
+        # Состояние до внесения изменения
+        prev_state = MovementListHistoryModel.get_state(cur_list)
 
         # вносим изменения
-        new_scheduled_datetime = datetime.datetime.combine(
-            data["move_date"],
-            data["move_time"],
+        cur_list.scheduled_datetime = timezone.make_aware(
+            datetime.datetime.combine(
+                data["move_date"],
+                data["move_time"],
+            )
         )
-        cur_list.scheduled_datetime = new_scheduled_datetime
         cur_list.was_modified = True
         cur_list.watch = data["watch"]
         cur_list.place = data["place"]
         cur_list.save()
+        cur_list.make_history(self.request.user, ChangeMeta.UPDATE_ACTION)
 
-        # Сериализируем данные после внесения изменения
-        new_data = xml_serializer.serialize(
-            [cur_list],
-            fields=("scheduled_datetime")
-        )
-
-        # добавляем запись в историю
-        MovementListHistoryModel.objects.create(
-            modified_list=cur_list,
-            modified_by=self.request.user,
-            modified_datetime=timezone.now(),
-            serialized_prev_delta=old_data,
-            serialized_post_delta=new_data,
+        # добавляем в историю только изменившиеся поля
+        prev_delta, post_delta = MovementListHistoryModel.get_delta(
+            prev_state,
+            MovementListHistoryModel.get_state(cur_list),
         )
+        if post_delta:
+            MovementListHistoryModel.objects.create(
+                modified_list=cur_list,
+                modified_by=self.request.user,
+                modified_datetime=timezone.now(),
+                prev_delta=prev_delta,
+                post_delta=post_delta,
+            )
 
         messages.success(self.request, "Список успешно изменён")
         return super().form_valid(form)
@@ -258,6 +410,8 @@ class MovementListDelete(UserPassesTestMixin, FacilityListMixin, DeleteView):
         obj = self.get_object()
         obj.is_deleted = True
         obj.save()
+        obj.make_history(self.request.user, ChangeMeta.DELETE_ACTION)
+        remove_list_pdf_cache(obj)
         success_url = self.get_success_url()
         return HttpResponseRedirect(success_url)
 
@@ -266,39 +420,38 @@ class MovementListDelete(UserPassesTestMixin, FacilityListMixin, DeleteView):
         return self.delete()
 
 
-class MovementListHistory(FacilityListMixin, ListView):
+class MovementListHistory(
+            FacilityListMixin,
+            KeysetPaginationMixin,
+            ListView,
+        ):
 
     template_name = "main/movement-lists/movement-list-history.html"
     context_object_name = "history_entries"
+    paginate_by = 10
 
     def get_queryset(self):
-        queryset = self.related_list.movementlisthistory_set.all()
+        queryset = self.related_list.movementlisthistory_set.select_related(
+            "modified_by"
+        )
         queryset = queryset.order_by("-pk")
-        data = []
-
-        for obj in queryset:
-            deserialized_data = []
-            for deserialized_object in serializers.deserialize(
-                "xml",
-                obj.serialized_prev_delta
-            ):
-                deserialized_data.append(deserialized_object.object)
-
-            for deserialized_object in serializers.deserialize(
-                "xml",
-                obj.serialized_post_delta
-            ):
-                deserialized_data.append(deserialized_object.object)
-
-            data.append(
-                {
-                    "entry": obj,
-                    "prev_change": deserialized_data[0],
-                    "post_change": deserialized_data[1],
-                }
-            )
+        return LazyRowList(
+            queryset,
+            self.get_row,
+            MovementListHistoryModel.prefetch_changes,
+        )
 
-        return data
+    def get_row(self, obj):
+        changes = obj.get_changes()
+        rescheduled = None
+        for change in changes:
+            if change["name"] == "scheduled_datetime":
+                rescheduled = change
+        return {
+            "entry": obj,
+            "changes": changes,
+            "rescheduled": rescheduled,
+        }
 
     def get_breadcrumbs_links(self):
         return [
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.views.generic.list import ListView
+
+from .mixins import FacilityMixin
+from ..models import MovementEntry, normalize_name
+from ..forms import SearchEmployeeForm
+from ..utils import get_paginator_baseurl
+from ..utils.link import Link
+from ..utils.trigram import TrigramWordSimilarity,\
+    set_word_similarity_threshold
+
+
+class EmployeeSearch(FacilityMixin, ListView):
+    """
+    Нечёткий поиск сотрудников по всем спискам производственного объекта.
+    Записи отбираются оператором триграммного сходства по
+    нормализованному ФИО, который обслуживается GIN индексом,
+    и упорядочиваются по убыванию сходства
+    """
+
+    template_name = "main/search/employee-search.html"
+    context_object_name = "entries"
+    paginate_by = 50
+    similarity_threshold = 0.4
+
+    def get(self, request, *args, **kwargs):
+        # Порог сходства действует только внутри транзакции, поэтому
+        # в ней выполняются и подсчёт строк, и отрисовка страницы
+        with transaction.atomic():
+            response = super().get(request, *args, **kwargs)
+            return response.render()
+
+    def get_search_form(self):
+        return SearchEmployeeForm(
+            self.request.path,
+            self.request.GET or None,
+        )
+
+    def get_queryset(self):
+        form = self.get_search_form()
+        if not form.is_valid():
+            return MovementEntry.objects.none()
+        search_name = normalize_name(form.cleaned_data["q"])
+        set_word_similarity_threshold(self.similarity_threshold)
+        entries = MovementEntry.objects.get_not_deleted().filter(
+            movement_list__facility=self.related_facility,
+            movement_list__is_deleted=False,
+            employee__search_name__trigram_word_similar=search_name,
+        )
+        entries = entries.annotate(
+            similarity=TrigramWordSimilarity(
+                search_name,
+                "employee__search_name",
+            ),
+        )
+        entries = entries.select_related(
+            "employee",
+            "movement_list__facility",
+        )
+        return entries.order_by("-similarity", "-pk")
+
+    def get_breadcrumbs_links(self):
+        return [
+            Link(
+                self.related_facility.get_absolute_url(),
+                self.related_facility,
+            ),
+            Link(self.request.path, "Поиск сотрудников"),
+        ]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = context.get("paginator")
+        if paginator is not None:
+            paginator.baseurl = get_paginator_baseurl(self.request)
+        context["header"] = self.related_facility.name
+        context["related_facility"] = self.related_facility
+        context["facilities"] = self.all_facilities
+        context["search_form"] = self.get_search_form()
+        context["links"] = self.get_breadcrumbs_links()
+        return context
@@ -1,18 +1,31 @@
 from django import forms
+from django.utils.html import format_html, format_html_join
 
 
 class ListTextWidget(forms.TextInput):
-    def __init__(self, data_list, name, *args, **kwargs):
+    """
+    Текстовое поле с подсказками из <datalist>.
+    Если указан autocomplete_url, подсказки загружаются скриптом
+    при вводе, а страница содержит пустой <datalist>
+    """
+
+    def __init__(self, data_list=(), name="", *args, **kwargs):
+        autocomplete_url = kwargs.pop("autocomplete_url", None)
         super(ListTextWidget, self).__init__(*args, **kwargs)
         self._name = name
         self._list = data_list
-        self.attrs.update({'list':'list__%s' % self._name})
+        self.attrs.update({'list': 'list__%s' % self._name})
+        if autocomplete_url:
+            self.attrs["data-autocomplete-url"] = autocomplete_url
 
     def render(self, name, value, attrs=None, renderer=None):
-        text_html = super(ListTextWidget, self).render(name, value, attrs=attrs)
-        data_list = '<datalist id="list__%s">' % self._name
-        for item in self._list:
-            data_list += '<option value="%s">' % item
-        data_list += '</datalist>'
-
-        return (text_html + data_list)
+        text_html = super(ListTextWidget, self).render(
+            name, value, attrs=attrs, renderer=renderer
+        )
+        options = format_html_join(
+            "", '<option value="{}">', ((item,) for item in self._list)
+        )
+        data_list = format_html(
+            '<datalist id="list__{}">{}</datalist>', self._name, options
+        )
+        return text_html + data_list